@@ -1,16 +1,38 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, jsonify
-import sqlite3, os, bcrypt, requests, wave, time
+from flask import (Flask, render_template, request, redirect, url_for, session, flash, send_file, jsonify,
+                   g, has_app_context)
+import sqlite3, os, bcrypt, requests, wave, time, threading
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import padding, rsa
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives import padding as sym_padding
 from reportlab.pdfgen import canvas
 import config
+from face_index import FaceIndex, FACE_THRESHOLD
+from face_ann import IVFCoarse
+from template_store import TemplateStore
+from face_pca import ProyeccionPCA
+from face_preproceso import (FACE_TEMPLATE_VERSION, VERSION_INICIAL, preprocesar_rostro,
+                             nombre_store_facial, version_activa)
+from biometric_pool import PoolBiometrico, ColaBiometricaLlena, TiempoBiometricoAgotado
+from enrollment_jobs import ColaEnrolamiento
+from face_burst import mejores_frames
+from face_shared import FaceIndexCompartido
+from face_calidad import FiltroCalidad, MOTIVOS as MOTIVOS_CALIDAD
+from face_payload import desempaquetar_recorte, RecorteInvalido
+from face_muestras import centroide, posicion_para_muestra, mejor_similitud, registrar_recortes
+from voice_engine import MotorVoz, AudioInvalido, preparar_audio, plantilla_espectral, N_FFT_ESPECTRAL
+from voice_stream import SesionesVoz, FragmentoFueraDeOrden, decidir
+from db_pool import obtener_pool
+from migraciones import aplicar as aplicar_migraciones
+from glucemia_ingesta import ingestar as ingestar_glucemia, LoteInvalido, PacienteNoAutorizado
+from glucemia_resumen import actualizar_resumenes, leer_resumen, ultimo_dia, GRANULARIDADES
+from glucemia_serie import serie as serie_glucemia, estado_periodo, etag as etag_serie, elegir_fuente, FUENTES
+from vinculos_clinicos import (VinculoInvalido, vincular_clinico, pacientes_permitidos, paciente_vinculado,
+                               generar_codigo, canjear_codigo)
 import base64
 import cv2
 import numpy as np
-import sounddevice as sd
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -112,6 +134,40 @@ os.makedirs(BIOMETRIC_FOLDER, exist_ok=True)
 
 TEMPLATES_FOLDER = os.path.join(BIOMETRIC_FOLDER, "templates")
 os.makedirs(TEMPLATES_FOLDER, exist_ok=True)
+FACE_IVF_PATH = os.path.join(TEMPLATES_FOLDER, "face_ivf.npz")
+
+# Almacenes empaquetados (un .dat mapeado en memoria por tipo de plantilla)
+# Migrar los .npy existentes con: python template_store.py migrar
+# Las plantillas faciales van en el almacén de la versión activa de preprocesado
+FACE_TEMPLATE_VERSION_ACTIVA = version_activa(TEMPLATES_FOLDER)
+FACE_STORE = TemplateStore(TEMPLATES_FOLDER, nombre_store_facial(FACE_TEMPLATE_VERSION_ACTIVA))
+if FACE_TEMPLATE_VERSION_ACTIVA != FACE_TEMPLATE_VERSION and len(FACE_STORE):
+    print(f"⚠️  Plantillas faciales {FACE_TEMPLATE_VERSION_ACTIVA} con preprocesado {FACE_TEMPLATE_VERSION}: "
+          f"ejecuta python reenrolamiento.py")
+VOICE_STORE = TemplateStore(TEMPLATES_FOLDER, "voice_templates")
+# Plantillas MFCC del motor de voz (voice_engine.py); VOICE_STORE conserva las
+# espectrales del formato anterior, usadas solo mientras no haya MFCC
+VOICE_STORE_MFCC = TemplateStore(TEMPLATES_FOLDER, "voice_templates_v2")
+VOICE_CENTRO_PATH = os.path.join(TEMPLATES_FOLDER, "voice_centro.npy")
+# Ejemplares de enrolamiento por usuario (claves "<clave>#<n>"); FACE_STORE guarda su centroide
+FACE_EJEMPLARES_MAX = getattr(config, "FACE_EJEMPLARES_MAX", 5)
+FACE_STORE_EJEMPLARES = TemplateStore(TEMPLATES_FOLDER, f"{FACE_STORE.nombre}_ejemplares")
+
+# Proyección PCA opcional (entrenar con: python face_pca.py). Las plantillas
+# proyectadas viven en un almacén propio por versión de proyección.
+FACE_PCA_PATH = os.path.join(TEMPLATES_FOLDER, "face_pca.npz")
+FACE_PCA = None
+FACE_STORE_PCA = None
+if getattr(config, "FACE_PCA_ACTIVO", False) and os.path.exists(FACE_PCA_PATH):
+    FACE_PCA = ProyeccionPCA.cargar(FACE_PCA_PATH)
+    if FACE_PCA is not None and FACE_PCA.preproceso != FACE_TEMPLATE_VERSION_ACTIVA:
+        # Proyectaría plantillas de un preprocesado para compararlas con sondas de otro
+        print(f"⚠️  PCA {FACE_PCA.version} entrenada con preprocesado {FACE_PCA.preproceso} y el activo es "
+              f"{FACE_TEMPLATE_VERSION_ACTIVA}: se ignora hasta reentrenar (python face_pca.py)")
+        FACE_PCA = None
+    if FACE_PCA is not None:
+        FACE_STORE_PCA = TemplateStore(TEMPLATES_FOLDER, FACE_PCA.nombre_store())
+        print(f"🧬 Plantillas faciales en espacio reducido: {FACE_PCA.version}")
 
 if not getattr(config, "UPLOAD_FOLDER", None):
     config.UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
@@ -120,13 +176,54 @@ os.makedirs(config.UPLOAD_FOLDER, exist_ok=True)
 # ==========================================
 # 💾 CONEXIÓN A LA BASE DE DATOS
 # ==========================================
-def conectar_db():
-    db_path = getattr(config, "DATABASE_PATH", os.path.join(DB_FOLDER, "app.db"))
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
+# Conexiones reutilizadas del pool (db_pool.py): conn.close() la devuelve.
+# Las que una petición olvide devolver se recuperan al cerrar el contexto.
+def _pool_db(db_path=None):
+    db_path = db_path or getattr(config, "DATABASE_PATH", os.path.join(DB_FOLDER, "app.db"))
+    return obtener_pool(db_path,
+                        tamano=getattr(config, "DB_POOL_TAMANO", 8),
+                        cache_kb=getattr(config, "DB_CACHE_KB", 8192),
+                        mmap_mb=getattr(config, "DB_MMAP_MB", 64),
+                        sentencias=getattr(config, "DB_SENTENCIAS_CACHE", 256),
+                        timeout_seg=getattr(config, "DB_TIMEOUT_SEG", 5.0))
+
+def _prestar(pool):
+    conn = pool.conectar()
+    if has_app_context():
+        g.setdefault("conexiones_db", []).append(conn)
     return conn
 
+def conectar_db():
+    return _prestar(_pool_db())
+
+# Base clínica (sistema_diabetes.db, esquema en migraciones.py): pacientes,
+# tratamientos y registros de glucemia. La primera conexión de cada proceso
+# aplica las migraciones pendientes, también con gunicorn o flask run.
+_CLINICAS_MIGRADAS = set()
+_LOCK_MIGRACIONES = threading.Lock()
+
+def _ruta_db_clinica():
+    return getattr(config, "DIABETES_DB_PATH", os.path.join(DB_FOLDER, "sistema_diabetes.db"))
+
+def conectar_clinica():
+    ruta = _ruta_db_clinica()
+    if ruta not in _CLINICAS_MIGRADAS:
+        with _LOCK_MIGRACIONES:
+            if ruta not in _CLINICAS_MIGRADAS:
+                os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+                conn = _pool_db(ruta).conectar()
+                try:
+                    aplicar_migraciones(conn)
+                finally:
+                    conn.close()
+                _CLINICAS_MIGRADAS.add(ruta)
+    return _prestar(_pool_db(ruta))
+
+@app.teardown_appcontext
+def devolver_conexiones_db(error=None):
+    for conn in g.pop("conexiones_db", []):
+        conn.close()
+
 # ==========================================
 # 🔧 INICIALIZAR/ACTUALIZAR ESQUEMA
 # ==========================================
@@ -276,13 +373,33 @@ def _voice_filename_for(correo, prefix="voice"):
     ts = int(time.time())
     return os.path.join(BIOMETRIC_FOLDER, f"{prefix}_{safe}_{ts}.wav")
 
+def _template_key(correo):
+    return correo.replace("@","_").replace(".","_")
+
 def _face_template_path(correo):
-    safe = correo.replace("@","_").replace(".","_")
-    return os.path.join(TEMPLATES_FOLDER, f"face_template_{safe}.npy")
+    """Ruta del formato anterior (un .npy por usuario), solo para lectura/migración"""
+    return os.path.join(TEMPLATES_FOLDER, f"face_template_{_template_key(correo)}.npy")
 
 def _voice_template_path(correo):
-    safe = correo.replace("@","_").replace(".","_")
-    return os.path.join(TEMPLATES_FOLDER, f"voice_template_{safe}.npy")
+    """Ruta del formato anterior (un .npy por usuario), solo para lectura/migración"""
+    return os.path.join(TEMPLATES_FOLDER, f"voice_template_{_template_key(correo)}.npy")
+
+def _detectar_rostros(gray, min_size=(100, 100)):
+    return FACE_CASCADE.detectMultiScale(
+        gray, 
+        scaleFactor=1.1, 
+        minNeighbors=5, 
+        minSize=min_size
+    )
+
+def _recortar_rostro(frame, face, margin=20):
+    """Recorta el rostro detectado añadiendo un margen alrededor"""
+    x, y, w, h = face
+    x = max(0, x - margin)
+    y = max(0, y - margin)
+    w = min(frame.shape[1] - x, w + 2 * margin)
+    h = min(frame.shape[0] - y, h + 2 * margin)
+    return frame[y:y+h, x:x+w]
 
 def capture_face_image(correo=None, prefix="face"):
     """Captura una imagen desde la cámara y detecta rostros - VERSIÓN MEJORADA"""
@@ -343,12 +460,7 @@ def capture_face_image(correo=None, prefix="face"):
                 
             # Detectar rostros
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = FACE_CASCADE.detectMultiScale(
-                gray, 
-                scaleFactor=1.1, 
-                minNeighbors=5, 
-                minSize=(100, 100)
-            )
+            faces = _detectar_rostros(gray)
             
             print(f"📸 Frame {i+1}: {len(faces)} rostros detectados")
             
@@ -366,12 +478,7 @@ def capture_face_image(correo=None, prefix="face"):
 
         # Procesar el mejor frame
         gray = cv2.cvtColor(best_frame, cv2.COLOR_BGR2GRAY)
-        faces = FACE_CASCADE.detectMultiScale(
-            gray, 
-            scaleFactor=1.1, 
-            minNeighbors=5, 
-            minSize=(100, 100)
-        )
+        faces = _detectar_rostros(gray)
 
         if len(faces) == 0:
             print("❌ No se detectaron rostros en la imagen")
@@ -384,15 +491,7 @@ def capture_face_image(correo=None, prefix="face"):
             out_path = os.path.join(BIOMETRIC_FOLDER, f"{prefix}_temp_{int(time.time())}.jpg")
 
         # Recortar y guardar el primer rostro detectado
-        x, y, w, h = faces[0]
-        # Añadir margen alrededor del rostro
-        margin = 20
-        x = max(0, x - margin)
-        y = max(0, y - margin)
-        w = min(best_frame.shape[1] - x, w + 2 * margin)
-        h = min(best_frame.shape[0] - y, h + 2 * margin)
-        
-        face_img = best_frame[y:y+h, x:x+w]
+        face_img = _recortar_rostro(best_frame, faces[0])
         success = cv2.imwrite(out_path, face_img)
         
         if success:
@@ -409,50 +508,106 @@ def capture_face_image(correo=None, prefix="face"):
         return None
 
 def build_face_template_from_image(path, size=(100, 100)):
-    """Construye plantilla facial a partir de imagen"""
+    """Construye plantilla facial a partir de imagen (ruta o arreglo BGR)"""
     try:
-        img = cv2.imread(path)
+        img = _leer_imagen(path)
         if img is None:
             print(f"❌ No se pudo cargar imagen: {path}")
             return None
             
-        # Convertir a escala de grises y redimensionar
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        gray = cv2.resize(gray, size)
-        
-        # Aplicar equalización de histograma para mejorar contraste
-        gray = cv2.equalizeHist(gray)
-        
-        # Convertir a vector y normalizar
-        vec = gray.astype("float32").flatten()
-        vec = (vec - np.mean(vec)) / (np.std(vec) + 1e-9)
-        vec = vec / (np.linalg.norm(vec) + 1e-9)
-        
-        return vec
+        # Mismo preprocesado que el login (ver face_preproceso.py)
+        return preprocesar_rostro(img, size)
     except Exception as e:
         print(f"❌ Error construyendo plantilla facial: {e}")
         return None
 
 def save_face_template(correo, image_path):
     """Guarda plantilla facial"""
+    return guardar_plantilla_facial(correo, build_face_template_from_image(image_path))
+
+def guardar_plantilla_facial(correo, tpl):
+    """Guarda una plantilla ya construida (sin proyectar) en los almacenes y el índice"""
     try:
-        tpl = build_face_template_from_image(image_path)
         if tpl is None:
             return False
             
-        template_path = _face_template_path(correo)
-        np.save(template_path, tpl)
-        print(f"✅ Plantilla facial guardada: {template_path}")
+        slot = FACE_STORE.agregar(_template_key(correo), tpl)
+        print(f"✅ Plantilla facial guardada: {FACE_STORE.idx_path} (slot {slot})")
+
+        tpl_indice = plantilla_para_indice(tpl)
+        if FACE_STORE_PCA is not None and tpl_indice is not None:
+            FACE_STORE_PCA.agregar(_template_key(correo), tpl_indice)
+
+        # Mantener el índice en memoria sin recargar desde disco; el compartido
+        # se actualiza siempre para que los demás workers vean la nueva generación
+        if (FACE_INDEX_CARGADO or FACE_INDICE_COMPARTIDO) and tpl_indice is not None:
+            obtener_face_index().agregar(correo, tpl_indice)
         return True
     except Exception as e:
         print(f"❌ Error guardando plantilla facial: {e}")
         return False
 
+def correo_tiene_plantilla(correo):
+    return _template_key(correo) in FACE_STORE or os.path.exists(_face_template_path(correo))
+
+def cargar_ejemplares_faciales(correo):
+    """Ejemplares guardados del usuario (vacío si solo tiene la plantilla original)"""
+    clave = _template_key(correo)
+    ejemplares = []
+    for n in range(FACE_EJEMPLARES_MAX):
+        tpl = FACE_STORE_EJEMPLARES.obtener(f"{clave}#{n}")
+        if tpl is None:
+            break
+        ejemplares.append(tpl)
+    return ejemplares
+
+def agregar_muestra_facial(correo, tpl, recortes=()):
+    """Suma una muestra a los ejemplares del usuario y recalcula su centroide
+
+    `recortes` son las rutas de las imágenes de las que salió la muestra, para
+    que reenrolamiento.py pueda regenerarla. Devuelve cuántos ejemplares
+    quedan guardados (0 si falló).
+    """
+    if tpl is None:
+        return 0
+    clave = _template_key(correo)
+    ejemplares = cargar_ejemplares_faciales(correo)
+    if not ejemplares:
+        # Usuario enrolado antes de los ejemplares: su plantilla es la primera muestra
+        anterior = load_face_template(correo) if correo_tiene_plantilla(correo) else None
+        if anterior is not None:
+            FACE_STORE_EJEMPLARES.agregar(f"{clave}#0", anterior)
+            ejemplares.append(anterior)
+            # Salió del face_path vigente (aún no se reemplaza por el de esta muestra)
+            conn = conectar_db()
+            fila = conn.execute("SELECT face_path FROM usuarios WHERE correo = ?", (correo,)).fetchone()
+            conn.close()
+            if fila and fila["face_path"]:
+                registrar_recortes(TEMPLATES_FOLDER, f"{clave}#0", [fila["face_path"]])
+
+    posicion = posicion_para_muestra(ejemplares, tpl, FACE_EJEMPLARES_MAX)
+    FACE_STORE_EJEMPLARES.agregar(f"{clave}#{posicion}", tpl)
+    if recortes:
+        registrar_recortes(TEMPLATES_FOLDER, f"{clave}#{posicion}", recortes)
+    if posicion < len(ejemplares):
+        ejemplares[posicion] = tpl
+    else:
+        ejemplares.append(tpl)
+
+    if not guardar_plantilla_facial(correo, centroide(ejemplares)):
+        return 0
+    print(f"👥 {correo}: {len(ejemplares)} ejemplares faciales, centroide actualizado")
+    return len(ejemplares)
+
 def load_face_template(correo):
     """Carga plantilla facial"""
     try:
+        tpl = FACE_STORE.obtener(_template_key(correo))
+        if tpl is not None:
+            return tpl
+        # Plantillas aún no migradas al almacén empaquetado (solo existen en v1)
         p = _face_template_path(correo)
-        if os.path.exists(p):
+        if FACE_TEMPLATE_VERSION_ACTIVA == VERSION_INICIAL and os.path.exists(p):
             return np.load(p)
         else:
             print(f"⚠️  No existe plantilla para: {correo}")
@@ -460,6 +615,186 @@ def load_face_template(correo):
         print(f"❌ Error cargando plantilla facial: {e}")
     return None
 
+def plantilla_para_indice(tpl):
+    """Lleva una plantilla sin proyectar (10.000 valores) al espacio del índice (PCA si está activa)"""
+    if tpl is None or FACE_PCA is None:
+        return tpl
+    return FACE_PCA.proyectar(tpl)
+
+def load_face_template_indice(correo):
+    """Plantilla en el espacio del índice; proyecta y guarda las aún no migradas"""
+    if FACE_PCA is None:
+        return load_face_template(correo)
+    clave = _template_key(correo)
+    tpl = FACE_STORE_PCA.obtener(clave)
+    if tpl is None:
+        tpl = plantilla_para_indice(load_face_template(correo))
+        if tpl is not None:
+            FACE_STORE_PCA.agregar(clave, tpl)
+    return tpl
+
+# ==========================================
+# ⚙️ POOL DE CÓMPUTO BIOMÉTRICO
+# ==========================================
+BIOMETRIC_POOL = PoolBiometrico(trabajadores=getattr(config, "BIOMETRIA_TRABAJADORES", 2),
+                                max_cola=getattr(config, "BIOMETRIA_MAX_COLA", 16),
+                                timeout=getattr(config, "BIOMETRIA_TIMEOUT_SEG", 10),
+                                retry_after=getattr(config, "BIOMETRIA_RETRY_AFTER_SEG", 2))
+
+# ==========================================
+# 🚦 FILTRO DE CALIDAD FACIAL (ANTES DEL POOL)
+# ==========================================
+_ESCALA_CALIDAD = getattr(config, "FACE_CALIDAD_ESCALA", 0.5)
+_MIN_CALIDAD = int(100 * _ESCALA_CALIDAD)
+FACE_CALIDAD = FiltroCalidad(lambda gray: _detectar_rostros(gray, (_MIN_CALIDAD, _MIN_CALIDAD)),
+                             escala=_ESCALA_CALIDAD,
+                             brillo_min=getattr(config, "FACE_CALIDAD_BRILLO_MIN", 40),
+                             brillo_max=getattr(config, "FACE_CALIDAD_BRILLO_MAX", 215),
+                             nitidez_min=getattr(config, "FACE_CALIDAD_NITIDEZ_MIN", 20.0))
+
+# ==========================================
+# 🧾 ENROLAMIENTO FACIAL EN SEGUNDO PLANO
+# ==========================================
+def procesar_enrolamiento(trabajo, frames, reportar):
+    """Enrolamiento facial a partir de los frames subidos por el cliente"""
+    if FACE_CASCADE is None:
+        raise RuntimeError("Clasificador de rostros no disponible")
+
+    correo = trabajo["correo"]
+    imagenes = [cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR) for datos in frames]
+    imagenes = [img for img in imagenes if img is not None]
+    if not imagenes:
+        raise ValueError("Las imágenes enviadas no son válidas")
+    reportar(20, f"Evaluando ráfaga de {len(imagenes)} frames")
+
+    # Nitidez, brillo y tamaño del rostro en lote, con detección sobre copias reducidas
+    escala = getattr(config, "FACE_RAFAGA_ESCALA_DETECCION", 0.5)
+    min_lado = int(100 * escala)
+    orden, rostros = mejores_frames(imagenes,
+                                    lambda gray: _detectar_rostros(gray, (min_lado, min_lado)),
+                                    top=getattr(config, "FACE_RAFAGA_TOP", 3),
+                                    escala=escala)
+    if not orden:
+        raise ValueError("No se detectó ningún rostro en las imágenes enviadas")
+    print(f"📸 Mejores frames de la ráfaga: {orden}")
+    reportar(60, "Generando plantilla facial")
+
+    recortes = [_recortar_rostro(imagenes[i], rostro) for i, rostro in zip(orden, rostros)]
+    face_img = recortes[0]
+    face_path = _face_filename_for(correo, "register")
+    if not cv2.imwrite(face_path, face_img):
+        raise RuntimeError("No se pudo guardar la imagen del rostro")
+    # Los demás recortes de la muestra también se guardan para poder re-enrolarla
+    rutas_recortes = [face_path]
+    for i, recorte in enumerate(recortes[1:], start=1):
+        ruta = _face_filename_for(correo, f"muestra_{trabajo['id'][:8]}_{i}")
+        if cv2.imwrite(ruta, recorte):
+            rutas_recortes.append(ruta)
+
+    # Plantilla del mejor frame o centroide normalizado de los mejores
+    plantillas = [build_face_template_from_image(r) for r in recortes]
+    plantillas = [p for p in plantillas if p is not None]
+    if not plantillas:
+        raise RuntimeError("No se pudo construir la plantilla facial")
+    tpl = np.mean(plantillas, axis=0)
+    tpl = tpl / (np.linalg.norm(tpl) + 1e-9)
+
+    reportar(80, "Guardando plantilla facial")
+    muestras = agregar_muestra_facial(correo, tpl, rutas_recortes)
+    if not muestras:
+        raise RuntimeError("No se pudo guardar la plantilla facial")
+
+    conn = conectar_db()
+    conn.execute("UPDATE usuarios SET face_path = ? WHERE id = ?", (face_path, trabajo["usuario_id"]))
+    conn.commit()
+    conn.close()
+    if muestras > 1:
+        return f"✅ Muestra facial agregada ({muestras} de {FACE_EJEMPLARES_MAX}). Tu Face ID reconocerá mejor distintas condiciones de luz"
+    return "✅ Face ID registrado. Ya puedes iniciar sesión con tu rostro"
+
+ENROLAMIENTO = ColaEnrolamiento(conectar_db, procesar_enrolamiento,
+                                trabajadores=getattr(config, "ENROLAMIENTO_TRABAJADORES", 1),
+                                abandono_seg=getattr(config, "ENROLAMIENTO_ABANDONO_SEG", 900))
+
+def _frames_de_registro():
+    """Frames JPEG enviados por el navegador (archivos face_frames o data URL face_data)"""
+    frames = [f.read() for f in request.files.getlist("face_frames") if f and f.filename]
+    face_data = request.form.get("face_data", "")
+    if face_data.startswith("data:image") and "," in face_data:
+        try:
+            frames.append(base64.b64decode(face_data.split(",", 1)[1]))
+        except Exception:
+            print("⚠️ face_data con base64 inválido")
+    return [f for f in frames if f][:getattr(config, "ENROLAMIENTO_MAX_FRAMES", 10)]
+
+def _recordar_trabajo_enrolamiento(job_id):
+    """Asocia el trabajo a la sesión que lo encoló para que pueda consultar su estado"""
+    trabajos = session.get("trabajos_enrolamiento", [])[-9:]
+    session["trabajos_enrolamiento"] = trabajos + [job_id]
+
+# ==========================================
+# 🧠 ÍNDICE FACIAL COMPARTIDO POR EL PROCESO
+# ==========================================
+# En modo compacto el puntaje grueso usa float16/int8 y los mejores
+# candidatos se re-puntúan con la plantilla float32 del almacén
+# Con FACE_INDICE_COMPARTIDO la matriz vive en un segmento mapeado que todos
+# los workers de Gunicorn/uWSGI leen; el primero en arrancar lo construye
+FACE_INDICE_COMPARTIDO = getattr(config, "FACE_INDICE_COMPARTIDO", False)
+_FACE_INDEX_OPCIONES = dict(cuantizacion=getattr(config, "FACE_CUANTIZACION", None),
+                            cargar_completa=load_face_template_indice,
+                            rerank=getattr(config, "FACE_RERANK", 10),
+                            cascada=getattr(config, "FACE_CASCADA_LADO", None),
+                            umbral_cascada=getattr(config, "FACE_CASCADA_UMBRAL", 0.3),
+                            muestreo_cascada=getattr(config, "FACE_CASCADA_MUESTREO", 0.0))
+if FACE_INDICE_COMPARTIDO:
+    if _FACE_INDEX_OPCIONES["cascada"]:
+        print("⚠️  La cascada de firmas no está disponible con el índice compartido")
+        _FACE_INDEX_OPCIONES["cascada"] = None
+    FACE_INDEX = FaceIndexCompartido(TEMPLATES_FOLDER,
+                                     nombre=f"face_index_{FACE_PCA.version if FACE_PCA else FACE_TEMPLATE_VERSION_ACTIVA}",
+                                     **_FACE_INDEX_OPCIONES)
+else:
+    FACE_INDEX = FaceIndex(**_FACE_INDEX_OPCIONES)
+FACE_INDEX_CARGADO = False
+_FACE_INDEX_LOCK = threading.Lock()
+
+def _plantillas_face_index():
+    """(correo, plantilla en el espacio del índice) de todos los usuarios con Face ID"""
+    conn = conectar_db()
+    cur = conn.cursor()
+    cur.execute("SELECT correo FROM usuarios WHERE face_path IS NOT NULL")
+    correos = [row["correo"] for row in cur.fetchall()]
+    conn.close()
+    plantillas = ((c, load_face_template_indice(c)) for c in correos)
+    return ((c, t) for c, t in plantillas if t is not None)
+
+def obtener_face_index(reconstruir=False):
+    """Carga una sola vez todas las plantillas faciales en memoria"""
+    global FACE_INDEX_CARGADO
+    if FACE_INDEX_CARGADO and not reconstruir:
+        return FACE_INDEX
+    with _FACE_INDEX_LOCK:
+        if not FACE_INDEX_CARGADO or reconstruir:
+            if FACE_INDICE_COMPARTIDO:
+                with FACE_INDEX.escritura():
+                    if reconstruir or not FACE_INDEX.adjuntar():
+                        FACE_INDEX.cargar(_plantillas_face_index())
+                    else:
+                        print(f"🤝 Segmento facial compartido adjuntado (generación {FACE_INDEX.generacion})")
+                total = len(FACE_INDEX)
+            else:
+                total = FACE_INDEX.cargar(_plantillas_face_index())
+
+            # Índice aproximado entrenado offline con: python face_ann.py
+            if os.path.exists(FACE_IVF_PATH):
+                ivf = IVFCoarse.cargar(FACE_IVF_PATH, nprobe=getattr(config, "FACE_IVF_NPROBE", None))
+                if ivf is not None:
+                    FACE_INDEX.configurar_ivf(ivf, getattr(config, "FACE_IVF_MIN_USUARIOS", 5000))
+
+            FACE_INDEX_CARGADO = True
+            print(f"🧠 Índice facial cargado: {total} plantillas")
+    return FACE_INDEX
+
 def compare_face_templates(template1, template2):
     """Compara dos plantillas faciales usando similitud coseno"""
     if template1 is None or template2 is None:
@@ -482,7 +817,7 @@ def compare_face_templates(template1, template2):
         similarity = dot_product / (norm1 * norm2)
         
         # Umbral ajustado
-        threshold = 0.6
+        threshold = FACE_THRESHOLD
         matched = similarity > threshold
         
         print(f"🔍 Similitud facial: {similarity:.4f}, Umbral: {threshold}, Coincide: {matched}")
@@ -492,7 +827,20 @@ def compare_face_templates(template1, template2):
         return 0.0, False
 
 def record_audio(duration=3, sample_rate=16000):
-    """Graba audio y lo guarda como WAV"""
+    """Graba audio con el micrófono del servidor y lo guarda como WAV (solo desarrollo)
+
+    Bloquea el hilo durante toda la grabación, así que solo está disponible
+    con VOZ_CAPTURA_LOCAL; en producción la voz llega subida desde el navegador.
+    """
+    if not getattr(config, "VOZ_CAPTURA_LOCAL", False):
+        print("⚠️  Captura de audio local desactivada (VOZ_CAPTURA_LOCAL): la voz se sube desde el navegador")
+        return None
+    try:
+        # Importación diferida: en servidores sin dispositivo de audio ni siquiera se carga
+        import sounddevice as sd
+    except Exception as e:
+        print(f"❌ sounddevice no disponible: {e}")
+        return None
     try:
         print("🎤 Iniciando grabación de audio...")
         audio_data = sd.rec(int(duration * sample_rate), 
@@ -515,13 +863,224 @@ def record_audio(duration=3, sample_rate=16000):
         print(f"❌ Error grabando audio: {e}")
         return None
 
+# ==========================================
+# 🎙️ VERIFICACIÓN DE VOZ (MOTOR VECTORIZADO)
+# ==========================================
+# Mismo índice vectorizado que el facial (una matriz normalizada, coseno por
+# producto matriz-vector y top-k). Cada usuario está en un solo índice: el
+# MFCC si tiene plantilla v2 (o un WAV en voice_path para generarla) y si no
+# el espectral, con las plantillas voice_template_*.npy del formato anterior.
+VOICE_MOTOR = MotorVoz()
+if VOICE_MOTOR.cargar_centro(VOICE_CENTRO_PATH):
+    print(f"🎯 Centro de voz cargado: {VOICE_CENTRO_PATH}")
+# Sin centro las voces quedan muy juntas y el umbral tiene que ser mucho más alto
+VOICE_UMBRAL = (getattr(config, "VOZ_UMBRAL", 0.7) if VOICE_MOTOR.centro is not None
+                else getattr(config, "VOZ_UMBRAL_SIN_CENTRO", 0.985))
+VOICE_UMBRAL_ESPECTRAL = getattr(config, "VOZ_UMBRAL_ESPECTRAL", 0.97)
+VOICE_MAX_SEG_SUBIDA = getattr(config, "VOZ_MAX_SEG_SUBIDA", 15)
+VOICE_INDEX = FaceIndex(dim=VOICE_MOTOR.dim)
+VOICE_INDEX_ESPECTRAL = FaceIndex(dim=N_FFT_ESPECTRAL // 2 + 1)
+VOICE_INDEX_CARGADO = False
+_VOICE_INDEX_LOCK = threading.Lock()
+
+def load_voice_template_espectral(correo):
+    """Plantilla de voz del formato anterior (almacén o .npy suelto)"""
+    tpl = VOICE_STORE.obtener(_template_key(correo))
+    if tpl is None and os.path.exists(_voice_template_path(correo)):
+        tpl = np.load(_voice_template_path(correo))
+    return tpl
+
+def load_voice_template(correo, voice_path=None):
+    """Plantilla MFCC; la genera y guarda desde voice_path si aún no existe"""
+    clave = _template_key(correo)
+    tpl = VOICE_STORE_MFCC.obtener(clave)
+    if tpl is None and voice_path and os.path.exists(voice_path):
+        try:
+            tpl = VOICE_MOTOR.plantilla(preparar_audio(voice_path, VOICE_MOTOR.frecuencia))
+        except AudioInvalido as e:
+            print(f"⚠️  {voice_path}: {e}")
+            return None
+        if tpl is not None:
+            VOICE_STORE_MFCC.agregar(clave, tpl)
+    return tpl
+
+def _plantillas_voice_index():
+    """(plantillas MFCC, plantillas espectrales) como listas de (correo, vector)"""
+    conn = conectar_db()
+    filas = conn.execute("SELECT correo, voice_path FROM usuarios").fetchall()
+    conn.close()
+    mfcc, espectrales = [], []
+    for fila in filas:
+        tpl = load_voice_template(fila["correo"], fila["voice_path"])
+        if tpl is not None:
+            mfcc.append((fila["correo"], VOICE_MOTOR.para_indice(tpl)))
+            continue
+        tpl = load_voice_template_espectral(fila["correo"])
+        if tpl is not None:
+            espectrales.append((fila["correo"], tpl))
+    return mfcc, espectrales
+
+def obtener_voice_index():
+    """Carga una sola vez los índices de voz en memoria"""
+    global VOICE_INDEX_CARGADO
+    if VOICE_INDEX_CARGADO:
+        return VOICE_INDEX
+    with _VOICE_INDEX_LOCK:
+        if not VOICE_INDEX_CARGADO:
+            mfcc, espectrales = _plantillas_voice_index()
+            VOICE_INDEX.cargar(mfcc)
+            VOICE_INDEX_ESPECTRAL.cargar(espectrales)
+            VOICE_INDEX_CARGADO = True
+            print(f"🧠 Índice de voz cargado: {len(VOICE_INDEX)} MFCC, {len(VOICE_INDEX_ESPECTRAL)} espectrales")
+    return VOICE_INDEX
+
+def guardar_plantilla_voz(correo, tpl):
+    """Guarda una plantilla MFCC y la pasa del índice espectral al MFCC"""
+    if tpl is None:
+        return False
+    VOICE_STORE_MFCC.agregar(_template_key(correo), tpl)
+    if VOICE_INDEX_CARGADO:
+        VOICE_INDEX_ESPECTRAL.eliminar(correo)
+        VOICE_INDEX.agregar(correo, VOICE_MOTOR.para_indice(tpl))
+    return True
+
+def comparar_plantillas_voz(tpl, espectral, correo=None):
+    """Compara una plantilla MFCC (y la espectral de la misma grabación)
+
+    Devuelve (correo candidato o None, similitud, coincide, modo, tipo de
+    plantilla). Las plantillas espectrales del formato anterior solo se
+    aceptan en 1:1: distinguen poco entre hablantes para identificar a alguien
+    entre todos.
+    """
+    vec = VOICE_MOTOR.para_indice(tpl)
+    obtener_voice_index()
+
+    if correo:
+        if correo in VOICE_INDEX:
+            similitud = float(VOICE_MOTOR.para_indice(load_voice_template(correo)) @ vec)
+            return correo, similitud, similitud > VOICE_UMBRAL, "1:1", "mfcc"
+        if correo in VOICE_INDEX_ESPECTRAL and espectral is not None:
+            guardada = load_voice_template_espectral(correo)
+            similitud = float(guardada @ espectral / (np.linalg.norm(guardada) + 1e-9))
+            return correo, similitud, similitud > VOICE_UMBRAL_ESPECTRAL, "1:1", "espectral"
+        return None, 0.0, False, "1:1", None
+
+    candidatos = VOICE_INDEX.buscar(vec, k=1)
+    if not candidatos:
+        return None, 0.0, False, "1:N", "mfcc"
+    candidato, similitud = candidatos[0]
+    return candidato, similitud, similitud > VOICE_UMBRAL, "1:N", "mfcc"
+
+def ingestar_voz(usuario_id, correo, datos):
+    """Enrola la voz de un WAV subido (cualquier frecuencia): plantilla MFCC, archivo y voice_path
+
+    Lanza AudioInvalido si el audio no sirve.
+    """
+    senal = preparar_audio(datos, VOICE_MOTOR.frecuencia, VOICE_MAX_SEG_SUBIDA)
+    tpl = BIOMETRIC_POOL.ejecutar(VOICE_MOTOR.plantilla, senal)
+    if tpl is None:
+        raise AudioInvalido("No se detectó voz en la grabación")
+
+    voice_path = _voice_filename_for(correo)
+    with open(voice_path, "wb") as f:
+        f.write(datos)
+    guardar_plantilla_voz(correo, tpl)
+    conn = conectar_db()
+    conn.execute("UPDATE usuarios SET voice_path = ? WHERE id = ?", (voice_path, usuario_id))
+    conn.commit()
+    conn.close()
+    return voice_path
+
+def comparar_voz(datos, correo=None):
+    """Decodificación + plantillas + comparación; se ejecuta dentro del pool biométrico
+
+    Devuelve (correo coincidente o None, similitud, modo, tipo de plantilla).
+    """
+    senal = preparar_audio(datos, VOICE_MOTOR.frecuencia, VOICE_MAX_SEG_SUBIDA)
+    tpl = VOICE_MOTOR.plantilla(senal)
+    if tpl is None:
+        raise AudioInvalido("No se detectó voz en la grabación")
+    candidato, similitud, coincide, modo, tipo = comparar_plantillas_voz(tpl, plantilla_espectral(senal), correo)
+    return (candidato if coincide else None), similitud, modo, tipo
+
+# ==========================================
+# 📡 VERIFICACIÓN DE VOZ POR FRAGMENTOS
+# ==========================================
+VOICE_STREAMS = SesionesVoz(VOICE_MOTOR,
+                            max_sesiones=getattr(config, "VOZ_STREAM_MAX_SESIONES", 100),
+                            inactividad_seg=getattr(config, "VOZ_STREAM_INACTIVIDAD_SEG", 30),
+                            max_segundos=getattr(config, "VOZ_STREAM_MAX_SEG", 10),
+                            retry_after=getattr(config, "BIOMETRIA_RETRY_AFTER_SEG", 2))
+VOICE_STREAM_MIN_SEG = getattr(config, "VOZ_STREAM_MIN_VOZ_SEG", 1.0)
+VOICE_STREAM_MARGEN = getattr(config, "VOZ_STREAM_MARGEN", 0.1)
+VOICE_STREAM_CONFIRMACIONES = getattr(config, "VOZ_STREAM_CONFIRMACIONES", 2)
+
+def procesar_fragmento_voz(sesion, seq, pcm, final):
+    """Agrega un fragmento PCM16 a la sesión y decide si el puntaje ya es concluyente
+
+    Devuelve (decisión, correo candidato, similitud, modo): la decisión es
+    "aceptar", "rechazar" o None mientras falte audio. Con `final` (o al
+    llenarse el buffer de la sesión) siempre se decide.
+    """
+    with sesion.lock:
+        if seq != sesion.siguiente:
+            raise FragmentoFueraDeOrden(sesion.siguiente)
+        sesion.siguiente += 1
+        extractor = sesion.extractor
+        extractor.agregar(np.frombuffer(pcm, dtype="<i2").astype("float32") / 32768.0)
+        final = final or extractor.lleno
+        # Muy poca voz no alcanza ni para decidir ni para comparar al final
+        if extractor.segundos_voz() < VOICE_STREAM_MIN_SEG:
+            return ("rechazar" if final else None), None, 0.0, "1:1" if sesion.correo else "1:N"
+        tpl = extractor.plantilla()
+
+        candidato, similitud, coincide, modo, tipo = comparar_plantillas_voz(
+            tpl, extractor.plantilla_espectral(), sesion.correo)
+        if final:
+            return ("aceptar" if coincide else "rechazar"), candidato, similitud, modo
+        umbral = VOICE_UMBRAL_ESPECTRAL if tipo == "espectral" else VOICE_UMBRAL
+        sesion.historial.append((candidato, similitud))
+        return (decidir(sesion.historial, umbral, VOICE_STREAM_MARGEN, VOICE_STREAM_CONFIRMACIONES),
+                candidato, similitud, modo)
+
 # ==========================================
 # 🎥 NUEVAS FUNCIONES PARA CAPTURA DESDE CLIENTE
 # ==========================================
 
+def _leer_imagen(origen):
+    """Acepta una ruta en disco o un arreglo BGR ya decodificado"""
+    if isinstance(origen, np.ndarray):
+        return origen
+    return cv2.imread(origen)
+
+def guardar_captura_auditoria(datos, prefix="login_audit"):
+    """Copia en disco de la captura original, solo si la auditoría está activa"""
+    nombre = f"{prefix}_{time.time_ns()}_{secrets.token_hex(4)}.jpg"
+    path = os.path.join(BIOMETRIC_FOLDER, nombre)
+    try:
+        with open(path, "wb") as f:
+            f.write(datos)
+        return path
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar captura de auditoría: {e}")
+        return None
+
 def capture_face_from_request():
-    """Captura rostro desde la solicitud HTTP (para login)"""
+    """Decodifica el rostro de la solicitud HTTP en memoria (para login)
+
+    Acepta el recorte binario en escala de grises `face_crop` (ver
+    face_payload.py) o, como respaldo, el JPEG completo `face_image`.
+    """
     try:
+        if 'face_crop' in request.files:
+            try:
+                img = desempaquetar_recorte(request.files['face_crop'].read())
+            except RecorteInvalido as e:
+                return None, f"Recorte facial inválido: {e}"
+            if getattr(config, "FACE_AUDITORIA_CAPTURAS", False):
+                guardar_captura_auditoria(cv2.imencode(".jpg", img)[1].tobytes())
+            return img, None
+
         if 'face_image' not in request.files:
             return None, "No se recibió imagen facial"
         
@@ -529,46 +1088,28 @@ def capture_face_from_request():
         if file.filename == '':
             return None, "Nombre de archivo vacío"
         
-        # Guardar imagen temporal
-        temp_path = os.path.join(BIOMETRIC_FOLDER, f"login_temp_{int(time.time())}.jpg")
-        file.save(temp_path)
-        
-        # Verificar que sea una imagen válida
-        img = cv2.imread(temp_path)
+        # Decodificar directamente desde el flujo de la petición, sin archivo temporal
+        datos = file.read()
+        img = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR) if datos else None
         if img is None:
-            os.remove(temp_path)
             return None, "Imagen no válida"
+
+        if getattr(config, "FACE_AUDITORIA_CAPTURAS", False):
+            guardar_captura_auditoria(datos)
         
-        return temp_path, None
+        return img, None
         
     except Exception as e:
         return None, f"Error procesando imagen: {str(e)}"
 
-def procesar_imagen_para_comparacion(image_path):
-    """Procesa imagen para comparación mejorada"""
+def procesar_imagen_para_comparacion(imagen):
+    """Procesa imagen (ruta o arreglo BGR) para comparación mejorada"""
     try:
-        img = cv2.imread(image_path)
+        img = _leer_imagen(imagen)
         if img is None:
             return None
             
-        # Convertir a escala de grises
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Mejorar contraste
-        gray = cv2.equalizeHist(gray)
-        
-        # Redimensionar a tamaño estándar
-        gray = cv2.resize(gray, (100, 100))
-        
-        # Aplicar filtro Gaussiano para reducir ruido
-        gray = cv2.GaussianBlur(gray, (3, 3), 0)
-        
-        # Convertir a vector y normalizar
-        vec = gray.astype("float32").flatten()
-        vec = (vec - np.mean(vec)) / (np.std(vec) + 1e-9)
-        vec = vec / (np.linalg.norm(vec) + 1e-9)
-        
-        return vec
+        return preprocesar_rostro(img)
     except Exception as e:
         print(f"❌ Error procesando imagen: {e}")
         return None
@@ -618,33 +1159,39 @@ def register():
         
         user_id = cur.lastrowid
         conn.commit()
+        conn.close()
 
-        # PROCESAR REGISTRO BIOMÉTRICO FACIAL
-        face_path = None
-        try:
-            print("📷 Iniciando registro facial...")
-            face_path = capture_face_image(correo, "register")
-            if face_path:
-                # Guardar plantilla facial
-                if save_face_template(correo, face_path):
-                    # Actualizar ruta en la base de datos
-                    cur.execute("UPDATE usuarios SET face_path = ? WHERE id = ?", 
-                               (face_path, user_id))
-                    conn.commit()
-                    print("✅ Registro facial completado exitosamente")
-                    flash("✅ Registro exitoso con Face ID. Ya puedes iniciar sesión con tu rostro", "success")
-                else:
-                    print("❌ Error guardando plantilla facial")
-                    flash("✅ Registro exitoso, pero no se pudo guardar Face ID. Usa correo y contraseña.", "success")
-            else:
-                print("❌ No se pudo capturar rostro para registro")
-                flash("✅ Registro exitoso. Usa correo y contraseña para iniciar sesión", "success")
-                
-        except Exception as e:
-            print(f"⚠️ Error en registro facial: {e}")
+        # Voz opcional subida junto con el formulario (WAV de cualquier frecuencia)
+        voz_registrada = False
+        datos_voz = _audio_de_request()
+        if datos_voz:
+            try:
+                ingestar_voz(user_id, correo, datos_voz)
+                voz_registrada = True
+            except (AudioInvalido, ColaBiometricaLlena, TiempoBiometricoAgotado) as e:
+                print(f"⚠️  Voz de registro descartada para {correo}: {e}")
+
+        # El enrolamiento facial se procesa en segundo plano
+        frames = _frames_de_registro()
+        job_id = None
+        if frames:
+            job_id = ENROLAMIENTO.encolar(user_id, correo, frames)
+            _recordar_trabajo_enrolamiento(job_id)
+
+        quiere_json = request.headers.get("X-Requested-With") == "XMLHttpRequest"
+        if quiere_json:
+            return jsonify({
+                "success": True,
+                "job_id": job_id,
+                "voz_registrada": voz_registrada,
+                "estado_url": url_for("estado_enrolamiento", job_id=job_id) if job_id else None,
+                "redirect": url_for("login")
+            }), 202 if job_id else 201
+
+        if job_id:
+            flash("✅ Registro exitoso. Tu Face ID se está procesando; mientras tanto usa correo y contraseña", "success")
+        else:
             flash("✅ Registro exitoso. Usa correo y contraseña para iniciar sesión", "success")
-
-        conn.close()
         return redirect(url_for("login"))
 
     return render_template("register.html", 
@@ -706,9 +1253,104 @@ def login():
 # ==========================================
 # 👤 RUTAS BIOMÉTRICAS PARA LOGIN CON FACE ID - VERSIÓN CORREGIDA
 # ==========================================
+def verificar_rostro_1a1(correo, plantilla):
+    """Verificación 1:1: una sola comparación contra la plantilla del correo indicado"""
+    conn = conectar_db()
+    cur = conn.cursor()
+    cur.execute("SELECT id, nombre, correo FROM usuarios WHERE correo = ? AND face_path IS NOT NULL", (correo,))
+    usuario = cur.fetchone()
+    conn.close()
+
+    if usuario is None:
+        print(f"⚠️  {correo} no tiene Face ID registrado")
+        return None, 0.0, []
+
+    stored_template = load_face_template_indice(correo)
+    similarity, matched = compare_face_templates(stored_template, plantilla_para_indice(plantilla))
+    if not matched:
+        # El centroide no alcanzó: probar los ejemplares (otras condiciones de luz)
+        similitud_ejemplar = mejor_similitud(cargar_ejemplares_faciales(correo), plantilla)
+        if similitud_ejemplar > similarity:
+            similarity, matched = similitud_ejemplar, similitud_ejemplar > FACE_THRESHOLD
+    detalles = [{
+        "usuario": usuario["nombre"],
+        "correo": usuario["correo"],
+        "similitud": f"{similarity:.4f}",
+        "coincide": matched
+    }]
+    print(f"🔍 Verificación 1:1 con {usuario['nombre']}: {similarity:.4f} - {'✅' if matched else '❌'}")
+    return (usuario if matched else None), similarity, detalles
+
+def identificar_rostro_1n(plantilla):
+    """Identificación 1:N contra el índice facial en memoria"""
+    face_index = obtener_face_index()
+
+    # Un solo producto matriz-vector + top-k (una comparación por usuario: centroides)
+    mejor, candidatos = face_index.identificar(plantilla_para_indice(plantilla))
+    if mejor is None and candidatos:
+        # Ningún centroide supera el umbral: revisar los ejemplares de los top-k
+        candidatos = sorted(((c, max(s, mejor_similitud(cargar_ejemplares_faciales(c), plantilla)))
+                             for c, s in candidatos), key=lambda c: c[1], reverse=True)
+        if candidatos[0][1] > FACE_THRESHOLD:
+            mejor = candidatos[0]
+
+    correos = [c for c, _ in candidatos]
+    usuarios = {}
+    if correos:
+        conn = conectar_db()
+        cur = conn.cursor()
+        marcadores = ",".join("?" * len(correos))
+        cur.execute(f"SELECT id, nombre, correo FROM usuarios WHERE correo IN ({marcadores}) AND face_path IS NOT NULL",
+                    correos)
+        usuarios = {u["correo"]: u for u in cur.fetchall()}
+        conn.close()
+
+    best_match = None
+    best_similarity = candidatos[0][1] if candidatos else 0.0
+    match_details = []
+
+    for correo, similarity in candidatos:
+        usuario = usuarios.get(correo)
+        if usuario is None:
+            continue
+        matched = similarity > FACE_THRESHOLD
+        match_details.append({
+            "usuario": usuario["nombre"],
+            "correo": usuario["correo"],
+            "similitud": f"{similarity:.4f}",
+            "coincide": matched
+        })
+        print(f"🔍 Comparando con {usuario['nombre']}: {similarity:.4f} - {'✅' if matched else '❌'}")
+
+    if mejor is not None and mejor[0] in usuarios:
+        best_match = usuarios[mejor[0]]
+        best_similarity = mejor[1]
+
+    print(f"📊 Resumen de comparaciones: {len(face_index)} plantillas en índice, top {len(candidatos)} evaluados")
+    return best_match, best_similarity, match_details
+
+def comparar_rostro(imagen, correo=None, permitir_1n=False):
+    """Preprocesado + comparación; se ejecuta dentro del pool biométrico"""
+    plantilla = procesar_imagen_para_comparacion(imagen)
+    if plantilla is None:
+        return None
+
+    best_match, best_similarity, match_details = None, 0.0, []
+    modo = "1:1" if correo else "1:N"
+    if correo:
+        best_match, best_similarity, match_details = verificar_rostro_1a1(correo, plantilla)
+    if best_match is None and (not correo or permitir_1n):
+        modo = "1:N"
+        best_match, best_similarity, match_details = identificar_rostro_1n(plantilla)
+    return best_match, best_similarity, match_details, modo
+
 @app.route("/verificar_rostro", methods=["POST"])
 def verificar_rostro():
-    """Verificación facial para login con Face ID - USA IMAGEN DEL CLIENTE"""
+    """Verificación facial para login con Face ID - USA IMAGEN DEL CLIENTE
+
+    Con `correo` en el formulario se hace verificación 1:1; solo se recurre a
+    la identificación 1:N si además se envía `fallback_1n=1`.
+    """
     try:
         print("🔍 Iniciando verificación facial para login...")
         
@@ -718,74 +1360,49 @@ def verificar_rostro():
                 "success": False, 
                 "error": "❌ Sistema de reconocimiento facial no disponible"
             })
+
+        correo = request.form.get("correo", "").strip()
+        permitir_1n = request.form.get("fallback_1n", "").strip().lower() in ("1", "true", "si", "sí")
         
-        # Capturar rostro desde la solicitud del cliente
-        current_face_path, error_msg = capture_face_from_request()
+        # Decodificar rostro en memoria desde la solicitud del cliente
+        current_face, error_msg = capture_face_from_request()
         if error_msg:
             return jsonify({
                 "success": False, 
                 "error": f"❌ {error_msg}"
             })
 
-        # Buscar todos los usuarios registrados con Face ID
-        conn = conectar_db()
-        cur = conn.cursor()
-        cur.execute("SELECT id, nombre, correo, face_path FROM usuarios WHERE face_path IS NOT NULL")
-        usuarios = cur.fetchall()
-        conn.close()
+        # Rechazo temprano de frames oscuros, borrosos o sin rostro
+        if getattr(config, "FACE_CALIDAD_ACTIVA", True):
+            # Un recorte del navegador llega en gris (2D) y ya viene centrado en el rostro
+            motivo = FACE_CALIDAD.evaluar(current_face, recorte=current_face.ndim == 2)
+            if motivo:
+                print(f"🚦 Frame rechazado antes de comparar: {motivo}")
+                return jsonify({
+                    "success": False,
+                    "retomar": True,
+                    "motivo": motivo,
+                    "error": MOTIVOS_CALIDAD[motivo]
+                })
 
-        if not usuarios:
-            # Limpiar archivo temporal
-            try:
-                os.remove(current_face_path)
-            except:
-                pass
+        if not correo and len(obtener_face_index()) == 0:
             return jsonify({
                 "success": False, 
                 "error": "❌ No hay usuarios registrados con Face ID. Regístrate primero."
             })
 
-        # Procesar imagen actual para comparación
-        current_template = procesar_imagen_para_comparacion(current_face_path)
-        
-        # Limpiar archivo temporal inmediatamente después de procesar
-        try:
-            os.remove(current_face_path)
-        except Exception as e:
-            print(f"⚠️ No se pudo eliminar archivo temporal: {e}")
+        # Preprocesado y comparación fuera del hilo de la petición
+        resultado = BIOMETRIC_POOL.ejecutar(comparar_rostro, current_face, correo, permitir_1n)
 
-        if current_template is None:
+        if resultado is None:
             return jsonify({
                 "success": False, 
                 "error": "❌ No se pudo procesar la imagen del rostro. Intenta nuevamente."
             })
 
-        # Comparar con cada usuario registrado
-        best_match = None
-        best_similarity = 0.0
-        match_details = []
-        
-        for usuario in usuarios:
-            stored_template = load_face_template(usuario["correo"])
-            
-            if stored_template is not None:
-                similarity, matched = compare_face_templates(stored_template, current_template)
-                
-                match_details.append({
-                    "usuario": usuario["nombre"],
-                    "correo": usuario["correo"],
-                    "similitud": f"{similarity:.4f}",
-                    "coincide": matched
-                })
-                
-                print(f"🔍 Comparando con {usuario['nombre']}: {similarity:.4f} - {'✅' if matched else '❌'}")
-                
-                if matched and similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = usuario
+        best_match, best_similarity, match_details, modo = resultado
 
-        print(f"📊 Resumen de comparaciones: {len(match_details)} usuarios comparados")
-        print(f"🏆 Mejor coincidencia: {best_match['nombre'] if best_match else 'Ninguna'} - Similitud: {best_similarity:.4f}")
+        print(f"🏆 Mejor coincidencia ({modo}): {best_match['nombre'] if best_match else 'Ninguna'} - Similitud: {best_similarity:.4f}")
 
         if best_match:
             # Iniciar sesión exitosa
@@ -801,27 +1418,26 @@ def verificar_rostro():
                 "message": f"✅ ¡Bienvenido/a {best_match['nombre']}! Face ID verificado correctamente",
                 "similarity": f"{best_similarity:.4f}",
                 "usuario": best_match["nombre"],
+                "modo": modo,
                 "redirect": url_for("dashboard")
             })
         else:
+            error = ("❌ El rostro no coincide con la cuenta indicada." if modo == "1:1"
+                     else "❌ Rostro no reconocido. Regístrate primero o usa correo/contraseña.")
             return jsonify({
                 "success": False, 
-                "error": "❌ Rostro no reconocido. Regístrate primero o usa correo/contraseña.",
+                "error": error,
                 "similarity": f"{best_similarity:.4f}",
+                "modo": modo,
                 "detalles": match_details
             })
 
+    except (ColaBiometricaLlena, TiempoBiometricoAgotado):
+        raise
     except Exception as e:
         print(f"❌ Error en verificación facial: {e}")
         import traceback
         traceback.print_exc()
-        
-        # Limpiar archivo temporal en caso de error
-        try:
-            if 'current_face_path' in locals() and current_face_path and os.path.exists(current_face_path):
-                os.remove(current_face_path)
-        except:
-            pass
             
         return jsonify({
             "success": False, 
@@ -833,6 +1449,207 @@ def login_faceid():
     """Endpoint alternativo para login con Face ID"""
     return verificar_rostro()
 
+# ==========================================
+# 🎙️ RUTAS BIOMÉTRICAS DE VOZ
+# ==========================================
+def _audio_de_request():
+    """Bytes del WAV enviado en `voice_audio` (None si no llegó)"""
+    archivo = request.files.get("voice_audio")
+    datos = archivo.read() if archivo else b""
+    return datos or None
+
+def _respuesta_login_voz(coincide, similitud, modo, **extra):
+    """Inicia la sesión del usuario reconocido por voz o explica el rechazo"""
+    if coincide is None:
+        error = ("❌ La voz no coincide con la cuenta indicada." if modo == "1:1"
+                 else "❌ Voz no reconocida. Usa correo/contraseña o Face ID.")
+        return jsonify({"success": False, "error": error, "similarity": f"{similitud:.4f}", "modo": modo, **extra})
+
+    conn = conectar_db()
+    usuario = conn.execute("SELECT id, nombre, correo FROM usuarios WHERE correo = ?", (coincide,)).fetchone()
+    conn.close()
+    if usuario is None:
+        return jsonify({"success": False, "error": "❌ Usuario no encontrado"})
+
+    session["usuario_id"] = usuario["id"]
+    session["usuario_nombre"] = usuario["nombre"]
+    session["usuario_correo"] = usuario["correo"]
+    session["clave_aes_cifrada"] = cifrar_clave_aes_rsa(generar_clave_aes())
+    return jsonify({
+        "success": True,
+        "message": f"✅ ¡Bienvenido/a {usuario['nombre']}! Voz verificada correctamente",
+        "similarity": f"{similitud:.4f}",
+        "usuario": usuario["nombre"],
+        "modo": modo,
+        "redirect": url_for("dashboard"),
+        **extra
+    })
+
+@app.route("/verificar_voz", methods=["POST"])
+def verificar_voz():
+    """Verificación de voz para login a partir de un WAV PCM subido (se remuestrea a 16 kHz)
+
+    Con `correo` en el formulario se hace verificación 1:1; sin él,
+    identificación 1:N contra las plantillas MFCC.
+    """
+    try:
+        correo = request.form.get("correo", "").strip()
+        datos = _audio_de_request()
+        if datos is None:
+            return jsonify({"success": False, "error": "❌ No se recibió audio"})
+
+        try:
+            coincide, similitud, modo, tipo = BIOMETRIC_POOL.ejecutar(comparar_voz, datos, correo or None)
+        except AudioInvalido as e:
+            return jsonify({"success": False, "retomar": True, "error": f"🎤 {e}. Vuelve a grabar la frase."})
+
+        print(f"🏆 Voz ({modo}, {tipo}): {coincide or 'Ninguna'} - Similitud: {similitud:.4f}")
+        return _respuesta_login_voz(coincide, similitud, modo)
+
+    except (ColaBiometricaLlena, TiempoBiometricoAgotado):
+        raise
+    except Exception as e:
+        print(f"❌ Error en verificación de voz: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": f"❌ Error del servidor: {str(e)}"})
+
+@app.route("/verificar_voz/stream", methods=["POST"])
+def iniciar_voz_stream():
+    """Abre una sesión de verificación de voz por fragmentos
+
+    Después, cada fragmento se envía a /verificar_voz/stream/<id>?seq=N como
+    cuerpo PCM16 little-endian mono a la frecuencia indicada; el último lleva
+    además final=1. La respuesta de cualquier fragmento puede traer ya la
+    decisión si el puntaje parcial es concluyente.
+    """
+    correo = (request.get_json(silent=True) or request.form).get("correo", "").strip()
+    sesion = VOICE_STREAMS.crear(correo or None)
+    return jsonify({
+        "success": True,
+        "stream_id": sesion.id,
+        "frecuencia": VOICE_MOTOR.frecuencia,
+        "max_segundos": VOICE_STREAMS.max_segundos,
+        "max_fragmento_bytes": getattr(config, "VOZ_STREAM_MAX_FRAGMENTO_BYTES", 65536)
+    }), 201
+
+@app.route("/verificar_voz/stream/<stream_id>", methods=["POST", "DELETE"])
+def fragmento_voz_stream(stream_id):
+    """Recibe un fragmento de la sesión de voz (o la cancela con DELETE)"""
+    if request.method == "DELETE":
+        VOICE_STREAMS.cerrar(stream_id)
+        return jsonify({"success": True})
+
+    sesion = VOICE_STREAMS.obtener(stream_id)
+    if sesion is None:
+        return jsonify({"success": False, "error": "⌛ La sesión de voz expiró. Vuelve a grabar."}), 404
+
+    pcm = request.get_data(cache=False)
+    if len(pcm) > getattr(config, "VOZ_STREAM_MAX_FRAGMENTO_BYTES", 65536):
+        return jsonify({"success": False, "error": "❌ Fragmento demasiado grande"}), 413
+    if len(pcm) % 2:
+        return jsonify({"success": False, "error": "❌ El audio debe ser PCM de 16 bits"}), 400
+    final = request.args.get("final", "").strip().lower() in ("1", "true", "si", "sí")
+
+    try:
+        decision, candidato, similitud, modo = BIOMETRIC_POOL.ejecutar(
+            procesar_fragmento_voz, sesion, request.args.get("seq", type=int), pcm, final)
+    except FragmentoFueraDeOrden as e:
+        return jsonify({"success": False, "error": "❌ Fragmento fuera de orden", "esperado": e.esperado}), 409
+    segundos = round(sesion.extractor.segundos, 2)
+    if decision is None:
+        return jsonify({"success": True, "pendiente": True, "segundos": segundos,
+                        "similitud_parcial": f"{similitud:.4f}"})
+
+    temprana = not (final or sesion.extractor.lleno)
+    VOICE_STREAMS.cerrar(stream_id, "temprana" if temprana else "final")
+    print(f"🏆 Voz por fragmentos ({modo}, {'temprana' if temprana else 'final'} a {segundos}s): "
+          f"{candidato if decision == 'aceptar' else 'Ninguna'} - Similitud: {similitud:.4f}")
+    return _respuesta_login_voz(candidato if decision == "aceptar" else None, similitud, modo,
+                                pendiente=False, decision_temprana=temprana, segundos=segundos)
+
+@app.route("/voz/muestra", methods=["POST"])
+def registrar_muestra_voz():
+    """Enrola (o reemplaza) la plantilla de voz MFCC del usuario en sesión"""
+    if "usuario_correo" not in session:
+        return jsonify({"success": False, "error": "⚠️ Debes iniciar sesión primero"}), 401
+
+    datos = _audio_de_request()
+    if datos is None:
+        return jsonify({"success": False, "error": "❌ No se recibió audio"}), 400
+    try:
+        ingestar_voz(session["usuario_id"], session["usuario_correo"], datos)
+    except AudioInvalido as e:
+        return jsonify({"success": False, "error": f"🎤 {e}"}), 400
+    return jsonify({"success": True, "message": "✅ Voz registrada. Ya puedes iniciar sesión con tu voz"})
+
+# ==========================================
+# ⚙️ POOL BIOMÉTRICO: CONTRAPRESIÓN Y MONITOREO
+# ==========================================
+@app.errorhandler(ColaBiometricaLlena)
+@app.errorhandler(TiempoBiometricoAgotado)
+def biometria_saturada(e):
+    """503 inmediato con Retry-After cuando el pool biométrico está saturado"""
+    mensaje = ("⏳ Servicio biométrico ocupado, intenta de nuevo en unos segundos"
+               if isinstance(e, ColaBiometricaLlena)
+               else "⏳ La verificación tardó demasiado, intenta de nuevo")
+    respuesta = jsonify({"success": False, "error": mensaje})
+    respuesta.status_code = 503
+    respuesta.headers["Retry-After"] = str(e.retry_after)
+    return respuesta
+
+@app.route("/biometria/estado")
+def biometria_estado():
+    """Profundidad de cola y tiempos de espera del pool biométrico"""
+    datos = BIOMETRIC_POOL.estadisticas()
+    if FACE_INDICE_COMPARTIDO and FACE_INDEX_CARGADO:
+        datos["indice_facial"] = {"plantillas": len(FACE_INDEX), "generacion": FACE_INDEX.generacion}
+    if FACE_INDEX.cascada:
+        datos["cascada_facial"] = FACE_INDEX.estadisticas_cascada()
+    datos["calidad_facial"] = FACE_CALIDAD.estadisticas()
+    if VOICE_INDEX_CARGADO:
+        datos["indice_voz"] = {"mfcc": len(VOICE_INDEX), "espectral": len(VOICE_INDEX_ESPECTRAL),
+                               "centro": VOICE_MOTOR.centro is not None}
+    datos["voz_stream"] = VOICE_STREAMS.estadisticas()
+    datos["db"] = _pool_db().estadisticas()
+    return jsonify(datos)
+
+@app.route("/face_id/muestras", methods=["POST"])
+def agregar_muestras_face_id():
+    """Agrega una muestra de enrolamiento (ráfaga de frames) al Face ID del usuario en sesión"""
+    if "usuario_correo" not in session:
+        return jsonify({"success": False, "error": "⚠️ Debes iniciar sesión primero"}), 401
+
+    frames = _frames_de_registro()
+    if not frames:
+        return jsonify({"success": False, "error": "❌ No se recibieron imágenes del rostro"}), 400
+
+    job_id = ENROLAMIENTO.encolar(session["usuario_id"], session["usuario_correo"], frames)
+    _recordar_trabajo_enrolamiento(job_id)
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "estado_url": url_for("estado_enrolamiento", job_id=job_id)
+    }), 202
+
+@app.route("/registro/estado/<job_id>")
+def estado_enrolamiento(job_id):
+    """Progreso de un trabajo de enrolamiento facial (consultado por register.html)"""
+    trabajo = ENROLAMIENTO.estado(job_id)
+    # Solo la sesión que lo encoló o el usuario al que pertenece; a los demás
+    # se les responde igual que si no existiera
+    propio = trabajo is not None and (
+        job_id in session.get("trabajos_enrolamiento", []) or
+        ("usuario_id" in session and trabajo["usuario_id"] == session["usuario_id"]))
+    if not propio:
+        return jsonify({"success": False, "error": "❌ Trabajo no encontrado"}), 404
+    return jsonify({
+        "success": True,
+        "estado": trabajo["estado"],
+        "progreso": trabajo["progreso"],
+        "mensaje": trabajo["mensaje"]
+    })
+
 # ==========================================
 # 🔐 RUTAS DE RECUPERACIÓN
 # ==========================================
@@ -953,6 +1770,15 @@ def dashboard():
     
     conn.close()
 
+    # Paciente del sistema clínico vinculado a la cuenta: sus lecturas alimentan las gráficas
+    conn = conectar_clinica()
+    try:
+        paciente_id = paciente_vinculado(conn, session["usuario_id"])
+    except sqlite3.Error as e:
+        print(f"⚠️ Sin datos clínicos para las gráficas: {e}")
+        paciente_id = None
+    conn.close()
+
     try:
         clave_aes = descifrar_clave_aes_rsa(session["clave_aes_cifrada"])
         texto = "Datos seguros de la sesión"
@@ -966,9 +1792,212 @@ def dashboard():
     return render_template("dashboard.html",
                          usuario=usuario,
                          medicamentos=medicamentos,
+                         paciente_id=paciente_id,
                          datos_cifrados=cifrado.hex()[:60] + "..." if isinstance(cifrado, bytes) else str(cifrado)[:60] + "...",
                          datos_descifrados=descifrado)
 
+# ==========================================
+# 🔗 VÍNCULOS CON LA BASE CLÍNICA
+# ==========================================
+# El correo de la sesión no identifica a nadie en la base clínica: el acceso
+# a lecturas sale solo de vínculos explícitos (ver vinculos_clinicos.py)
+def _datos_vinculo():
+    return request.get_json(silent=True) or request.form
+
+@app.route("/api/clinica/vincular", methods=["POST"])
+def vincular_cuenta_clinica():
+    """Vincula la cuenta al personal clínico con sus credenciales de la base clínica"""
+    if "usuario_correo" not in session:
+        return jsonify({"success": False, "error": "⚠️ Debes iniciar sesión primero"}), 401
+    datos = _datos_vinculo()
+    correo, password = datos.get("correo", "").strip(), datos.get("password", "")
+    if not correo or not password:
+        return jsonify({"success": False, "error": "❌ Correo y contraseña clínicos requeridos"}), 400
+    conn = conectar_clinica()
+    try:
+        clinico = vincular_clinico(conn, session["usuario_id"], correo, password,
+                                   max_intentos=getattr(config, "CLINICA_MAX_INTENTOS_VINCULO", 5))
+    except VinculoInvalido as e:
+        return jsonify({"success": False, "error": f"❌ {e}"}), 403
+    finally:
+        conn.close()
+    print(f"🔗 Cuenta {session['usuario_correo']} vinculada al usuario clínico {clinico['id']} ({clinico['rol']})")
+    return jsonify({"success": True, "nombre": clinico["nombre"], "rol": clinico["rol"]})
+
+@app.route("/api/clinica/pacientes/<int:paciente_id>/codigo", methods=["POST"])
+def codigo_vinculo_paciente(paciente_id):
+    """Código de un solo uso para que el paciente vincule su cuenta (lo pide su médico)"""
+    if "usuario_correo" not in session:
+        return jsonify({"success": False, "error": "⚠️ Debes iniciar sesión primero"}), 401
+    vigencia = getattr(config, "CLINICA_CODIGO_VIGENCIA_SEG", 86400)
+    conn = conectar_clinica()
+    try:
+        codigo = generar_codigo(conn, session["usuario_id"], paciente_id, vigencia)
+    except VinculoInvalido as e:
+        return jsonify({"success": False, "error": f"❌ {e}"}), 403
+    finally:
+        conn.close()
+    return jsonify({"success": True, "paciente_id": paciente_id, "codigo": codigo, "vigencia_seg": vigencia}), 201
+
+@app.route("/api/clinica/vincular-paciente", methods=["POST"])
+def vincular_cuenta_paciente():
+    """Vincula la cuenta al paciente del código entregado por su médico"""
+    if "usuario_correo" not in session:
+        return jsonify({"success": False, "error": "⚠️ Debes iniciar sesión primero"}), 401
+    codigo = _datos_vinculo().get("codigo", "").strip()
+    if not codigo:
+        return jsonify({"success": False, "error": "❌ Código de vinculación requerido"}), 400
+    conn = conectar_clinica()
+    try:
+        paciente_id = canjear_codigo(conn, session["usuario_id"], codigo)
+    except VinculoInvalido as e:
+        return jsonify({"success": False, "error": f"❌ {e}"}), 400
+    finally:
+        conn.close()
+    return jsonify({"success": True, "paciente_id": paciente_id})
+
+# ==========================================
+# 📈 GLUCEMIA: INGESTA DE SENSORES (CGM)
+# ==========================================
+def _pacientes_permitidos(conn, ids):
+    """Subconjunto de ids cuyas lecturas puede cargar o consultar la sesión"""
+    return pacientes_permitidos(conn, session["usuario_id"], ids)
+
+def _sin_permiso_paciente(conn, paciente_id):
+    """Respuesta 403 si la sesión no puede consultar al paciente (None si puede)"""
+    if paciente_id in _pacientes_permitidos(conn, [paciente_id]):
+        return None
+    return jsonify({"success": False, "error": "❌ Sin permiso para ver las lecturas de este paciente"}), 403
+
+@app.route("/api/glucemia/lote", methods=["POST"])
+def ingestar_lote_glucemia():
+    """Recibe un lote NDJSON o CSV de lecturas de glucosa (ver glucemia_ingesta.py)"""
+    if "usuario_correo" not in session:
+        return jsonify({"success": False, "error": "⚠️ Debes iniciar sesión primero"}), 401
+
+    max_bytes = getattr(config, "GLUCEMIA_LOTE_MAX_BYTES", 16 * 1024 * 1024)
+    if (request.content_length or 0) > max_bytes:
+        return jsonify({"success": False, "error": f"❌ Lote mayor a {max_bytes // (1024 * 1024)} MB"}), 413
+    datos = request.get_data(cache=False)
+    if not datos:
+        return jsonify({"success": False, "error": "❌ Lote vacío"}), 400
+    formato = request.args.get("formato") or ("csv" if request.mimetype in ("text/csv", "application/csv")
+                                              else "ndjson")
+    if formato not in ("csv", "ndjson"):
+        return jsonify({"success": False, "error": "❌ Formato no soportado (csv o ndjson)"}), 400
+
+    conn = conectar_clinica()
+    try:
+        resumen = ingestar_glucemia(conn, datos, formato,
+                                    max_filas=getattr(config, "GLUCEMIA_LOTE_MAX_FILAS", 200000),
+                                    minimo=getattr(config, "GLUCEMIA_MIN_MGDL", 20),
+                                    maximo=getattr(config, "GLUCEMIA_MAX_MGDL", 600),
+                                    al_insertar=actualizar_resumenes,
+                                    autorizar=lambda ids: _pacientes_permitidos(conn, ids))
+    except PacienteNoAutorizado as e:
+        return jsonify({"success": False, "error": f"❌ {e}"}), 403
+    except LoteInvalido as e:
+        return jsonify({"success": False, "error": f"❌ {e}"}), 400
+    finally:
+        conn.close()
+    print(f"📥 Lote de glucemia ({formato}): {resumen['insertadas']} nuevas, "
+          f"{resumen['duplicadas']} duplicadas, {resumen['invalidas']} inválidas")
+    return jsonify({"success": True, **resumen})
+
+def _periodo_glucemia(conn, paciente_id):
+    """(desde, hasta) de ?dias=N&hasta=AAAA-MM-DD; sin hasta, el último día con lecturas"""
+    dias = min(max(request.args.get("dias", 7, type=int), 1), 366)
+    hasta = request.args.get("hasta")
+    try:
+        fin = np.datetime64(hasta, "D") + 1 if hasta else None
+    except ValueError:
+        return None
+    if fin is None:
+        ultimo = ultimo_dia(conn, paciente_id)
+        fin = (np.datetime64(ultimo[:10], "D") if ultimo else np.datetime64("today", "D")) + 1
+    return f"{fin - dias} 00:00:00", f"{fin} 00:00:00"
+
+@app.route("/api/glucemia/<int:paciente_id>/resumen")
+def resumen_glucemia(paciente_id):
+    """Estadísticas por hora o día desde las tablas de resumen (no lee registros_glucemia)"""
+    if "usuario_correo" not in session:
+        return jsonify({"success": False, "error": "⚠️ Debes iniciar sesión primero"}), 401
+    granularidad = request.args.get("granularidad", "dia")
+    if granularidad not in GRANULARIDADES:
+        return jsonify({"success": False, "error": "❌ granularidad debe ser hora o dia"}), 400
+
+    conn = conectar_clinica()
+    negado = _sin_permiso_paciente(conn, paciente_id)
+    if negado:
+        conn.close()
+        return negado
+    periodo = _periodo_glucemia(conn, paciente_id)
+    if periodo is None:
+        conn.close()
+        return jsonify({"success": False, "error": "❌ hasta debe tener formato AAAA-MM-DD"}), 400
+    datos = leer_resumen(conn, paciente_id, *periodo, granularidad=granularidad)
+    conn.close()
+    campos = ("media", "desviacion", "minimo", "maximo", "tiempo_bajo", "tiempo_en_rango", "tiempo_alto")
+    return jsonify({
+        "success": True,
+        "paciente_id": paciente_id,
+        "granularidad": granularidad,
+        "desde": periodo[0],
+        "hasta": periodo[1],
+        "intervalos": [dict(inicio=inicio, n=n, **{c: round(float(datos[c][i]), 3) for c in campos})
+                       for i, (inicio, n) in enumerate(zip(datos["inicio"], datos["n"].tolist()))],
+        "total": {k: (round(v, 3) if isinstance(v, float) else v) for k, v in datos["total"].items()},
+    })
+
+@app.route("/api/glucemia/<int:paciente_id>/serie")
+def serie_glucemia_paciente(paciente_id):
+    """Serie para las gráficas reducida con LTTB a ?puntos= (ver glucemia_serie.py)
+
+    El ETag sale de los resúmenes diarios del periodo, así que un 304 no lee
+    registros_glucemia; cualquier lote nuevo en el periodo lo invalida.
+    """
+    if "usuario_correo" not in session:
+        return jsonify({"success": False, "error": "⚠️ Debes iniciar sesión primero"}), 401
+    fuente = request.args.get("fuente", "auto")
+    if fuente not in FUENTES:
+        return jsonify({"success": False, "error": f"❌ fuente debe ser una de: {', '.join(FUENTES)}"}), 400
+    maximo = getattr(config, "GLUCEMIA_SERIE_MAX_PUNTOS", 2000)
+    puntos = min(max(request.args.get("puntos", getattr(config, "GLUCEMIA_SERIE_PUNTOS", 300), type=int), 3), maximo)
+
+    conn = conectar_clinica()
+    negado = _sin_permiso_paciente(conn, paciente_id)
+    if negado:
+        conn.close()
+        return negado
+    periodo = _periodo_glucemia(conn, paciente_id)
+    if periodo is None:
+        conn.close()
+        return jsonify({"success": False, "error": "❌ hasta debe tener formato AAAA-MM-DD"}), 400
+    estado = estado_periodo(conn, paciente_id, *periodo)
+    fuente = elegir_fuente(fuente, estado[0], getattr(config, "GLUCEMIA_SERIE_MAX_LECTURAS", 50000))
+    version = etag_serie(paciente_id, *periodo, puntos, fuente, estado)
+    if version in request.if_none_match:
+        conn.close()
+        resp = app.response_class(status=304)
+    else:
+        datos = serie_glucemia(conn, paciente_id, *periodo, puntos, fuente)
+        conn.close()
+        resp = jsonify({
+            "success": True,
+            "paciente_id": paciente_id,
+            "fuente": fuente,
+            "desde": periodo[0],
+            "hasta": periodo[1],
+            "lecturas": datos["originales"],
+            "puntos": len(datos["valores"]),
+            "fechas": datos["fechas"],
+            "valores": datos["valores"],
+        })
+    resp.set_etag(version)
+    # El navegador guarda la serie pero revalida siempre con If-None-Match
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
 # ==========================================
 # 📤 UPLOAD (simplificado)
 # ==========================================
@@ -1007,6 +2036,10 @@ def get_local_ip():
 if __name__ == "__main__":
     # Inicializar base de datos
     inicializar_bd()
+    conectar_clinica().close()  # aplica las migraciones pendientes de la base clínica
+
+    # Reanudar trabajos de enrolamiento pendientes
+    ENROLAMIENTO.iniciar()
     
     # Configuración del servidor
     local_ip = get_local_ip()
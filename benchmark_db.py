@@ -0,0 +1,140 @@
+# benchmark_db.py
+# Throughput de POST /login y GET /dashboard con el cliente de pruebas de
+# Flask sobre una base temporal, abriendo una conexión sqlite3 por consulta
+# (comportamiento anterior, modo "directo") y con el pool WAL de db_pool.py.
+# El usuario de prueba usa bcrypt con 4 rondas para que el hash no tape el
+# costo de la base de datos.
+#
+#   python benchmark_db.py --json benchmarks/db.json
+#   python benchmark_db.py --peticiones 2000 --hilos 1,4,8
+import os
+import json
+import time
+import sqlite3
+import argparse
+import platform
+import tempfile
+import threading
+import numpy as np
+import bcrypt
+
+import config
+
+CORREO = "benchmark@example.com"
+PASSWORD = "benchmark"
+
+
+def conectar_directo():
+    """Conexión nueva por llamada, como antes del pool"""
+    db_path = config.DATABASE_PATH
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def preparar_app(carpeta):
+    config.DATABASE_PATH = os.path.join(carpeta, "benchmark.db")
+    config.RECAPTCHA_SECRET_KEY = None
+    import app as modulo
+    modulo.app.config["SESSION_COOKIE_SECURE"] = False
+    # Esquema creado sin el pool: la base queda en modo rollback (journal_mode=DELETE)
+    # hasta que el pool abre su primera conexión y la pasa a WAL
+    conectar_pool, modulo.conectar_db = modulo.conectar_db, conectar_directo
+    modulo.inicializar_bd()
+    modulo.conectar_db = conectar_pool
+    conn = conectar_directo()
+    conn.execute("INSERT OR REPLACE INTO usuarios (nombre, correo, password) VALUES (?, ?, ?)",
+                 ("Benchmark", CORREO, bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=4))))
+    conn.commit()
+    conn.close()
+    return modulo
+
+
+def _login(cliente):
+    r = cliente.post("/login", data={"correo": CORREO, "password": PASSWORD})
+    if r.status_code != 302 or "dashboard" not in r.headers.get("Location", ""):
+        raise SystemExit(f"❌ Login inesperado: {r.status_code}")
+
+
+def _dashboard(cliente):
+    r = cliente.get("/dashboard")
+    if r.status_code != 200:
+        raise SystemExit(f"❌ Dashboard inesperado: {r.status_code}")
+
+
+def medir_ruta(modulo, ruta, peticiones, hilos):
+    """Peticiones por segundo y latencias repartiendo `peticiones` entre `hilos` clientes"""
+    por_hilo = max(1, peticiones // hilos)
+    tiempos = [[] for _ in range(hilos)]
+    clientes = [modulo.app.test_client() for _ in range(hilos)]
+    for cliente in clientes:
+        _login(cliente)   # el dashboard necesita una sesión iniciada
+
+    def trabajar(i):
+        cliente, lista = clientes[i], tiempos[i]
+        for _ in range(por_hilo):
+            inicio = time.perf_counter()
+            ruta(cliente)
+            lista.append((time.perf_counter() - inicio) * 1000)
+
+    hilos_activos = [threading.Thread(target=trabajar, args=(i,)) for i in range(hilos)]
+    inicio = time.perf_counter()
+    for h in hilos_activos:
+        h.start()
+    for h in hilos_activos:
+        h.join()
+    duracion = time.perf_counter() - inicio
+    v = np.concatenate([np.asarray(t) for t in tiempos])
+    return {
+        "peticiones_s": round(len(v) / duracion, 1),
+        "p50": round(float(np.percentile(v, 50)), 3),
+        "p95": round(float(np.percentile(v, 95)), 3),
+        "p99": round(float(np.percentile(v, 99)), 3),
+    }
+
+
+def medir(args):
+    carpeta = tempfile.mkdtemp(prefix="benchmark_db_")
+    modulo = preparar_app(carpeta)
+    conectar_pool = modulo.conectar_db
+    resultado = {}
+    for modo, conectar in (("directo", conectar_directo), ("pool", conectar_pool)):
+        # Las rutas resuelven conectar_db en el módulo en cada llamada
+        modulo.conectar_db = conectar
+        conn = conectar()
+        journal = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.close()
+        resultado[modo] = {"journal_mode": journal, "hilos": {}}
+        for hilos in args.hilos:
+            resultado[modo]["hilos"][str(hilos)] = {
+                nombre: medir_ruta(modulo, ruta, args.peticiones, hilos)
+                for nombre, ruta in (("login", _login), ("dashboard", _dashboard))
+            }
+    modulo.conectar_db = conectar_pool
+    resultado["pool_estadisticas"] = modulo._pool_db().estadisticas()
+    return resultado
+
+
+def imprimir(resultado):
+    for modo in ("directo", "pool"):
+        for hilos, rutas in resultado[modo]["hilos"].items():
+            for nombre, p in rutas.items():
+                print(f"  {modo:<8} {resultado[modo]['journal_mode']:<7} {hilos:>2} hilos  {nombre:<10} {p['peticiones_s']:>8.1f} pet/s  "
+                      f"p50 {p['p50']:>7.3f}  p95 {p['p95']:>7.3f}  p99 {p['p99']:>7.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput de login y dashboard con y sin pool SQLite")
+    parser.add_argument("--peticiones", type=int, default=1000, help="Peticiones por ruta y modo")
+    parser.add_argument("--hilos", default="1,4", type=lambda v: [int(x) for x in v.split(",") if x])
+    parser.add_argument("--json", help="Guardar el resultado en este archivo")
+    args = parser.parse_args()
+
+    resultado = medir(args)
+    imprimir(resultado)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"plataforma": platform.platform(), "sqlite": sqlite3.sqlite_version, **resultado}, f, indent=2)
+        print(f"💾 Resultado guardado en {args.json}")
@@ -0,0 +1,275 @@
+# benchmark_face.py
+# Benchmark de identificación facial 1:N con galerías sintéticas. Mide la ruta
+# de /verificar_rostro de punta a punta: decodificación del JPEG, preprocesado,
+# comparación contra el índice y top-1 (sin HTTP ni la consulta final a SQLite).
+#
+#   python benchmark_face.py --json benchmarks/face.json
+#   python benchmark_face.py --galerias 1000,10000 --comparar benchmarks/face.json
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2
+
+try:
+    import resource
+except ImportError:  # Windows: sin medición de RSS pico
+    resource = None
+
+import config
+
+GALERIAS = (1_000, 10_000, 100_000, 1_000_000)
+DIM_V1 = 100 * 100
+
+
+# ==========================================
+# 🧪 DATOS SINTÉTICOS
+# ==========================================
+def normalizar_v1(bloque):
+    """Mismo formato que build_face_template_from_image: z-score por fila y norma 1"""
+    bloque = bloque - bloque.mean(axis=1, keepdims=True)
+    bloque /= bloque.std(axis=1, keepdims=True) + 1e-9
+    bloque /= np.linalg.norm(bloque, axis=1, keepdims=True) + 1e-9
+    return bloque.astype("float32")
+
+
+def rostros_sinteticos(n, rng, alto=300, ancho=400):
+    """Imágenes BGR suaves y distintas entre sí, del tamaño del canvas del login"""
+    rostros = []
+    for _ in range(n):
+        base = (rng.random((alto // 10, ancho // 10, 3)) * 255).astype("uint8")
+        rostros.append(cv2.resize(base, (ancho, alto), interpolation=cv2.INTER_CUBIC))
+    return rostros
+
+
+def captura_jpeg(rostro, rng, ruido=12.0):
+    """Nueva "captura" del mismo rostro: ruido de sensor, brillo y compresión JPEG"""
+    img = rostro.astype("float32") + rng.normal(0, ruido, rostro.shape) + rng.uniform(-15, 15)
+    ok, buf = cv2.imencode(".jpg", np.clip(img, 0, 255).astype("uint8"), [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return buf.tobytes()
+
+
+def _percentiles(valores_ms):
+    v = np.asarray(valores_ms, dtype="float64")
+    return {
+        "p50": round(float(np.percentile(v, 50)), 3),
+        "p95": round(float(np.percentile(v, 95)), 3),
+        "p99": round(float(np.percentile(v, 99)), 3),
+        "media": round(float(v.mean()), 3),
+    }
+
+
+def _rss_pico_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KiB, macOS bytes
+    return round(pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024, 1)
+
+
+# ==========================================
+# 📏 MEDICIÓN DE UNA GALERÍA (en un proceso propio)
+# ==========================================
+def medir_galeria(n, opciones):
+    """Construye una galería de n plantillas y mide las consultas de login"""
+    import app
+
+    rng = np.random.default_rng(opciones["semilla"] + n)
+    pca = app.FACE_PCA
+    cuantizacion = app.FACE_INDEX.cuantizacion
+    bloque = opciones["bloque"]
+
+    # Identidades "reales": sus plantillas salen de build_face_template_from_image
+    n_identidades = min(opciones["identidades"], n)
+    rostros = rostros_sinteticos(n_identidades, rng)
+    filas_identidad = rng.choice(n, n_identidades, replace=False)
+    plantillas_identidad = np.stack([app.build_face_template_from_image(r) for r in rostros])
+    if pca is not None:
+        plantillas_identidad = pca.proyectar_lote(plantillas_identidad)
+    por_fila = dict(zip(filas_identidad.tolist(), plantillas_identidad))
+
+    # Con cuantización el re-ranqueo necesita la plantilla completa: va a un memmap en disco
+    dim = plantillas_identidad.shape[1]
+    completas = None
+    if cuantizacion:
+        tmp = tempfile.NamedTemporaryFile(prefix="bench_face_", suffix=".f32", delete=False)
+        tmp.close()
+        completas = np.memmap(tmp.name, dtype="float32", mode="w+", shape=(n, dim))
+
+    def galeria():
+        for inicio in range(0, n, bloque):
+            fin = min(n, inicio + bloque)
+            filas = normalizar_v1(rng.standard_normal((fin - inicio, DIM_V1), dtype="float32"))
+            if pca is not None:
+                filas = pca.proyectar_lote(filas)
+            for i in range(inicio, fin):
+                tpl = por_fila.get(i)
+                if tpl is not None:
+                    filas[i - inicio] = tpl
+            if completas is not None:
+                completas[inicio:fin] = filas
+            for i in range(inicio, fin):
+                yield f"u{i}", filas[i - inicio]
+
+    indice = app.FaceIndex(cuantizacion=cuantizacion, rerank=app.FACE_INDEX.rerank,
+                           cargar_completa=(lambda c: completas[int(c[1:])]) if completas is not None else None,
+                           cascada=opciones["cascada"] or None, umbral_cascada=opciones["umbral_cascada"])
+    inicio = time.perf_counter()
+    indice.cargar(galeria())
+    tiempo_carga = time.perf_counter() - inicio
+
+    if opciones["ivf_listas"]:
+        from face_ann import IVFCoarse
+        ivf = IVFCoarse.entrenar(indice._filas_float32(0, len(indice)), n_listas=opciones["ivf_listas"],
+                                 nprobe=opciones["nprobe"])
+        indice.configurar_ivf(ivf, 0)
+
+    # Consultas: capturas nuevas de las identidades inscritas
+    elegidas = rng.integers(0, n_identidades, opciones["consultas"] + opciones["calentamiento"])
+    consultas = [(f"u{filas_identidad[j]}", captura_jpeg(rostros[j], rng)) for j in elegidas]
+
+    def consultar(esperado_y_datos):
+        esperado, datos = esperado_y_datos
+        t0 = time.perf_counter()
+        img = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR)
+        t1 = time.perf_counter()
+        plantilla = app.plantilla_para_indice(app.procesar_imagen_para_comparacion(img))
+        t2 = time.perf_counter()
+        _, candidatos = indice.identificar(plantilla)
+        t3 = time.perf_counter()
+        top1 = candidatos[0][0] if candidatos else None
+        return (t1 - t0, t2 - t1, t3 - t2, t3 - t0), top1 == esperado
+
+    for q in consultas[:opciones["calentamiento"]]:
+        consultar(q)
+    medidas = consultas[opciones["calentamiento"]:]
+
+    inicio = time.perf_counter()
+    if opciones["concurrencia"] > 1:
+        with ThreadPoolExecutor(max_workers=opciones["concurrencia"]) as pool:
+            resultados = list(pool.map(consultar, medidas))
+    else:
+        resultados = [consultar(q) for q in medidas]
+    duracion = time.perf_counter() - inicio
+
+    tiempos = np.array([t for t, _ in resultados]) * 1000
+    if completas is not None:
+        os.remove(completas.filename)
+    return {
+        "galeria": n,
+        "dim": dim,
+        "dtype": indice.dtype,
+        "ivf_listas": opciones["ivf_listas"],
+        "cascada": indice.estadisticas_cascada() if indice.cascada else None,
+        "bytes_indice": int(n * indice.bytes_por_plantilla),
+        "tiempo_carga_s": round(tiempo_carga, 3),
+        "consultas": len(medidas),
+        "concurrencia": opciones["concurrencia"],
+        "latencia_ms": _percentiles(tiempos[:, 3]),
+        "etapas_ms": {
+            "decodificar": _percentiles(tiempos[:, 0]),
+            "preprocesar": _percentiles(tiempos[:, 1]),
+            "comparar_top1": _percentiles(tiempos[:, 2]),
+        },
+        "throughput_qps": round(len(medidas) / duracion, 2),
+        "top1_correcto": round(float(np.mean([ok for _, ok in resultados])), 4),
+        "rss_pico_mb": _rss_pico_mb(),
+    }
+
+
+# ==========================================
+# 📊 REPORTE
+# ==========================================
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def comparar(resultados, path_base):
+    """Diferencia de p50/p95 y throughput contra un reporte guardado en otro commit"""
+    with open(path_base, encoding="utf-8") as f:
+        base = json.load(f)
+    previos = {r["galeria"]: r for r in base.get("resultados", []) if "latencia_ms" in r}
+    print(f"\n📈 Comparación contra {path_base} (commit {base.get('commit')})")
+    for r in resultados:
+        previo = previos.get(r["galeria"])
+        if previo is None or "latencia_ms" not in r:
+            continue
+        cambios = []
+        for clave in ("p50", "p95"):
+            antes, ahora = previo["latencia_ms"][clave], r["latencia_ms"][clave]
+            cambios.append(f"{clave} {antes:.2f} → {ahora:.2f} ms ({(ahora - antes) / antes:+.1%})")
+        antes, ahora = previo["throughput_qps"], r["throughput_qps"]
+        cambios.append(f"qps {antes:.1f} → {ahora:.1f} ({(ahora - antes) / antes:+.1%})")
+        print(f"  {r['galeria']:>9}: " + " | ".join(cambios))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de identificación facial 1:N")
+    parser.add_argument("--galerias", default=",".join(str(g) for g in GALERIAS),
+                        help="Tamaños de galería separados por comas")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--calentamiento", type=int, default=10)
+    parser.add_argument("--identidades", type=int, default=50, help="Rostros inscritos que se consultan")
+    parser.add_argument("--concurrencia", type=int, default=1, help="Hilos consultando en paralelo")
+    parser.add_argument("--ivf-listas", type=int, default=0, help="Entrenar un IVF con N listas (0 = exhaustivo)")
+    parser.add_argument("--cascada", type=int, default=getattr(config, "FACE_CASCADA_LADO", None) or 0,
+                        help="Lado de la firma gruesa (0 = sin cascada)")
+    parser.add_argument("--umbral-cascada", type=float, default=getattr(config, "FACE_CASCADA_UMBRAL", 0.3))
+    parser.add_argument("--nprobe", type=int, default=getattr(config, "FACE_IVF_NPROBE", 8))
+    parser.add_argument("--bloque", type=int, default=10_000, help="Plantillas generadas por bloque")
+    parser.add_argument("--max-gb", type=float, default=8.0, help="Omitir galerías cuyo índice supere este tamaño")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--json", help="Ruta donde guardar los resultados")
+    parser.add_argument("--comparar", help="Reporte JSON previo contra el que comparar")
+    args = parser.parse_args()
+    opciones = vars(args)
+
+    import app
+    dim = app.FACE_PCA.n_componentes if app.FACE_PCA is not None else DIM_V1
+    bytes_fila = dim * np.dtype(app.FACE_INDEX.dtype).itemsize
+    print(f"📋 Índice {app.FACE_INDEX.dtype}, {dim} dimensiones, {args.consultas} consultas por galería")
+
+    # Cada galería en un proceso nuevo: el RSS pico no se arrastra entre tamaños
+    contexto = mp.get_context("spawn")
+    resultados = []
+    for n in (int(g) for g in args.galerias.split(",") if g.strip()):
+        necesario_gb = n * bytes_fila / 1024 ** 3
+        if necesario_gb > args.max_gb:
+            print(f"  {n:>9}: omitida (índice de {necesario_gb:.1f} GB > --max-gb {args.max_gb})")
+            resultados.append({"galeria": n, "omitida": f"índice de {necesario_gb:.1f} GB"})
+            continue
+        with contexto.Pool(1) as pool:
+            r = pool.apply(medir_galeria, (n, opciones))
+        resultados.append(r)
+        lat = r["latencia_ms"]
+        print(f"  {n:>9}: p50 {lat['p50']:.2f} ms | p95 {lat['p95']:.2f} ms | p99 {lat['p99']:.2f} ms | "
+              f"{r['throughput_qps']:.1f} qps | RSS pico {r['rss_pico_mb']} MB | top-1 {r['top1_correcto']:.1%}"
+              + (f" | poda {r['cascada']['tasa_poda']:.1%}" if r["cascada"] else ""))
+
+    reporte = {
+        "commit": _commit_actual(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "plataforma": {"python": platform.python_version(), "numpy": np.__version__,
+                       "opencv": cv2.__version__, "cpu": platform.processor() or platform.machine(),
+                       "nucleos": os.cpu_count()},
+        "parametros": opciones,
+        "resultados": resultados,
+    }
+    if args.comparar:
+        comparar(resultados, args.comparar)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+        print(f"✅ Resultados guardados en {args.json}")
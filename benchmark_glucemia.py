@@ -0,0 +1,180 @@
+# benchmark_glucemia.py
+# Throughput de la ingesta por lotes de glucemia (glucemia_ingesta.py) sobre
+# una base temporal migrada: lectura NDJSON/CSV, validación vectorizada,
+# escritura con executemany y reenvío del mismo lote (todo duplicado). Con
+# --referencia mide también INSERT fila por fila con commit, como crear-db.py.
+# Al final compara las consultas de las gráficas sobre los resúmenes por
+# día/hora (glucemia_resumen.py) con la misma agregación sobre las lecturas,
+# y la serie reducida con LTTB (glucemia_serie.py) que pinta el historial.
+#
+#   python benchmark_glucemia.py --json benchmarks/glucemia.json
+#   python benchmark_glucemia.py --pacientes 10 --dias 90 --referencia 2000
+import os
+import json
+import time
+import sqlite3
+import argparse
+import platform
+import tempfile
+import numpy as np
+
+from db_pool import PoolSQLite
+from migraciones import aplicar as aplicar_migraciones
+from glucemia_ingesta import leer_ndjson, leer_csv, validar, guardar
+from glucemia_resumen import actualizar_resumenes, leer_resumen
+from glucemia_serie import serie
+
+
+def generar_lecturas(pacientes, dias, semilla):
+    """Lecturas CGM sintéticas cada 5 minutos: (paciente_id, fecha, nivel)"""
+    rng = np.random.default_rng(semilla)
+    por_paciente = dias * 288
+    inicio = np.datetime64("2024-01-01T00:00:00", "s")
+    fechas = inicio + np.arange(por_paciente) * np.timedelta64(300, "s")
+    filas = []
+    for pid in range(1, pacientes + 1):
+        # Ciclo diario más ruido acotado al rango del sensor
+        t = np.arange(por_paciente)
+        nivel = 130 + 40 * np.sin(2 * np.pi * t / 288) + rng.normal(0, 15, por_paciente)
+        nivel = np.clip(nivel, 40, 400).round(1)
+        filas.extend(zip([pid] * por_paciente, np.datetime_as_string(fechas).tolist(), nivel.tolist()))
+    return filas
+
+
+def como_ndjson(filas):
+    return "\n".join(json.dumps({"paciente_id": p, "fecha_medicion": f, "nivel_glucosa": n})
+                     for p, f, n in filas).encode("utf-8")
+
+
+def como_csv(filas):
+    return ("paciente_id,fecha_medicion,nivel_glucosa\n" +
+            "\n".join(f"{p},{f},{n}" for p, f, n in filas)).encode("utf-8")
+
+
+def base_temporal(carpeta, nombre, pacientes, pool=True):
+    ruta = os.path.join(carpeta, nombre)
+    conn = PoolSQLite(ruta).conectar() if pool else sqlite3.connect(ruta)
+    aplicar_migraciones(conn)
+    conn.executemany("INSERT INTO pacientes (id, nombre) VALUES (?, ?)",
+                     [(i, f"Paciente {i}") for i in range(1, pacientes + 1)])
+    conn.commit()
+    return conn
+
+
+def _por_segundo(n, segundos):
+    return round(n / segundos, 1) if segundos else None
+
+
+def _ms(fn, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return round(float(np.median(tiempos)), 3)
+
+
+def medir_consultas(conn, dias, repeticiones):
+    """Mediana en ms de las consultas de las gráficas: resumen vs lecturas crudas"""
+    desde, hasta = "2024-01-01 00:00:00", str(np.datetime64("2024-01-01", "D") + dias) + " 00:00:00"
+    semana = str(np.datetime64("2024-01-01", "D") + 7) + " 00:00:00"
+    crudo = ("SELECT substr(fecha_medicion, 1, 10), COUNT(*), AVG(nivel_glucosa), MIN(nivel_glucosa), "
+             "MAX(nivel_glucosa), SUM(nivel_glucosa < 70), SUM(nivel_glucosa > 180) FROM registros_glucemia "
+             "WHERE paciente_id = ? AND fecha_medicion >= ? AND fecha_medicion < ? GROUP BY 1")
+    return {
+        "dias": dias,
+        "resumen_dia_ms": _ms(lambda: leer_resumen(conn, 1, desde, hasta, "dia"), repeticiones),
+        "crudo_dia_ms": _ms(lambda: conn.execute(crudo, (1, desde, hasta)).fetchall(), repeticiones),
+        "resumen_hora_7d_ms": _ms(lambda: leer_resumen(conn, 1, desde, semana, "hora"), repeticiones),
+        "serie_lttb_puntos": len(serie(conn, 1, desde, hasta, 300)["valores"]),
+        "serie_lttb_ms": _ms(lambda: serie(conn, 1, desde, hasta, 300), repeticiones),
+    }
+
+
+def medir(args):
+    carpeta = tempfile.mkdtemp(prefix="benchmark_glucemia_")
+    filas = generar_lecturas(args.pacientes, args.dias, args.semilla)
+    n = len(filas)
+    print(f"📈 {n:,} lecturas ({args.pacientes} pacientes x {args.dias} días)")
+    cuerpos = {"ndjson": como_ndjson(filas), "csv": como_csv(filas)}
+    resultado = {"lecturas": n}
+
+    for formato, lector in (("ndjson", leer_ndjson), ("csv", leer_csv)):
+        conn = base_temporal(carpeta, f"{formato}.db", args.pacientes)
+        t0 = time.perf_counter()
+        columnas, total, ilegibles = lector(cuerpos[formato])
+        t1 = time.perf_counter()
+        lote, errores, _ = validar(columnas, total, ilegibles)
+        t2 = time.perf_counter()
+        insertadas, _, _, _ = guardar(conn, lote, actualizar_resumenes)
+        t3 = time.perf_counter()
+        # Reenvío del mismo lote: todo se descarta como duplicado
+        columnas, total, ilegibles = lector(cuerpos[formato])
+        lote, _, _ = validar(columnas, total, ilegibles)
+        repetidas, existentes, _, _ = guardar(conn, lote, actualizar_resumenes)
+        t5 = time.perf_counter()
+        if formato == "ndjson":
+            resultado["consultas"] = medir_consultas(conn, args.dias, args.repeticiones)
+        conn.close()
+        if insertadas != n or errores or repetidas or existentes != n:
+            raise SystemExit(f"❌ Resultado inesperado en {formato}: {insertadas} insertadas, "
+                             f"{len(errores)} errores, {repetidas} repetidas")
+        resultado[formato] = {
+            "megabytes": round(len(cuerpos[formato]) / 1e6, 2),
+            "leer_s": round(t1 - t0, 3),
+            "validar_s": round(t2 - t1, 3),
+            "guardar_s": round(t3 - t2, 3),
+            "lecturas_s": _por_segundo(n, t3 - t0),
+            "reenvio_lecturas_s": _por_segundo(n, t5 - t3),
+        }
+
+    if args.referencia:
+        # Conexión sqlite3 por defecto y un INSERT con commit por lectura, sin validar ni deduplicar
+        conn = base_temporal(carpeta, "referencia.db", args.pacientes, pool=False)
+        muestra = filas[:args.referencia]
+        inicio = time.perf_counter()
+        for p, f, nivel in muestra:
+            conn.execute("INSERT INTO registros_glucemia (paciente_id, nivel_glucosa, fecha_medicion) "
+                         "VALUES (?, ?, ?)", (p, nivel, f.replace("T", " ")))
+            conn.commit()
+        resultado["referencia_fila_a_fila"] = {"lecturas": len(muestra),
+                                               "lecturas_s": _por_segundo(len(muestra), time.perf_counter() - inicio)}
+        conn.close()
+    return resultado
+
+
+def imprimir(resultado):
+    for formato in ("ndjson", "csv"):
+        r = resultado[formato]
+        print(f"  {formato:<7} {r['megabytes']:>6.2f} MB  leer {r['leer_s']:.3f}s  validar {r['validar_s']:.3f}s  "
+              f"guardar {r['guardar_s']:.3f}s  → {r['lecturas_s']:>10,.0f} lecturas/s  "
+              f"(reenvío {r['reenvio_lecturas_s']:,.0f}/s)")
+    c = resultado["consultas"]
+    print(f"  gráfica {c['dias']} días: resumen diario {c['resumen_dia_ms']:.3f} ms, "
+          f"agregando lecturas {c['crudo_dia_ms']:.3f} ms; resumen por hora 7 días {c['resumen_hora_7d_ms']:.3f} ms")
+    print(f"  serie LTTB {c['dias']} días: {c['dias'] * 288:,} lecturas → {c['serie_lttb_puntos']} puntos "
+          f"en {c['serie_lttb_ms']:.3f} ms")
+    if "referencia_fila_a_fila" in resultado:
+        r = resultado["referencia_fila_a_fila"]
+        print(f"  fila a fila ({r['lecturas']} lecturas)         → {r['lecturas_s']:>10,.0f} lecturas/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput de la ingesta de glucemia por lotes")
+    parser.add_argument("--pacientes", type=int, default=10)
+    parser.add_argument("--dias", type=int, default=30, help="Días de sensor por paciente (288 lecturas/día)")
+    parser.add_argument("--referencia", type=int, default=0,
+                        help="Lecturas a insertar fila por fila como referencia (0 = no medir)")
+    parser.add_argument("--repeticiones", type=int, default=50, help="Repeticiones de cada consulta")
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--json", help="Guardar el resultado en este archivo")
+    args = parser.parse_args()
+
+    resultado = medir(args)
+    imprimir(resultado)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"plataforma": platform.platform(), "sqlite": sqlite3.sqlite_version,
+                       "numpy": np.__version__, **resultado}, f, indent=2)
+        print(f"💾 Resultado guardado en {args.json}")
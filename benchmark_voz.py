@@ -0,0 +1,166 @@
+# benchmark_voz.py
+# Benchmark de verificación de voz con los WAV de static/biometric_data. Mide
+# cada etapa de /verificar_voz (decodificación con remuestreo y normalización,
+# plantilla MFCC, plantilla
+# espectral del formato anterior y búsqueda en el índice) y, con
+# --referencia, la misma extracción hecha trama por trama en Python.
+#
+#   python benchmark_voz.py --json benchmarks/voz.json
+#   python benchmark_voz.py --galerias 1000,100000 --referencia
+import os
+import glob
+import json
+import time
+import argparse
+import platform
+import numpy as np
+
+from face_index import FaceIndex
+from voice_engine import MotorVoz, AudioInvalido, preparar_audio, plantilla_espectral
+
+CARPETA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "biometric_data")
+
+
+def _percentiles(valores_ms):
+    v = np.asarray(valores_ms, dtype="float64")
+    return {
+        "p50": round(float(np.percentile(v, 50)), 3),
+        "p95": round(float(np.percentile(v, 95)), 3),
+        "p99": round(float(np.percentile(v, 99)), 3),
+        "media": round(float(v.mean()), 3),
+    }
+
+
+def _medir(fn, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return _percentiles(tiempos)
+
+
+def cargar_wavs(carpeta, frecuencia):
+    """(nombre, bytes, señal) de los WAV utilizables; informa los que se omiten"""
+    wavs = []
+    for path in sorted(glob.glob(os.path.join(carpeta, "*.wav"))):
+        nombre = os.path.basename(path)
+        with open(path, "rb") as f:
+            datos = f.read()
+        try:
+            senal = preparar_audio(datos, frecuencia)
+        except AudioInvalido as e:
+            print(f"  ⏭️  {nombre}: {e}")
+            continue
+        wavs.append((nombre, datos, senal))
+    return wavs
+
+
+# ==========================================
+# 🐢 REFERENCIA TRAMA POR TRAMA (solo para comparar)
+# ==========================================
+def plantilla_referencia(motor, senal):
+    """Misma plantilla que MotorVoz.plantilla con un bucle de Python por trama"""
+    senal = np.asarray(senal, dtype="float64")
+    enfatizada = np.append(senal[0], senal[1:] - motor.preenfasis * senal[:-1])
+    coefs, energias = [], []
+    for inicio in range(0, len(enfatizada) - motor.largo + 1, motor.salto):
+        trama = enfatizada[inicio:inicio + motor.largo] * motor._ventana
+        potencia = np.abs(np.fft.rfft(trama, motor.n_fft)) ** 2
+        log_mel = np.log(potencia.astype("float32") @ motor._mel + 1e-10)
+        coefs.append((log_mel @ motor._dct)[1:] * motor._lifter)
+        energias.append(log_mel.max())
+    energias = np.array(energias)
+    voz = energias >= energias.max() - motor.umbral_voz_db / (10 / np.log(10))
+    coefs = np.array(coefs)[voz]
+    vec = np.hstack([coefs.mean(axis=0), coefs.std(axis=0)])
+    return (vec / np.linalg.norm(vec)).astype("float32")
+
+
+# ==========================================
+# 📏 MEDICIÓN
+# ==========================================
+def medir(args):
+    motor = MotorVoz()
+    print(f"🎙️ WAV de {args.carpeta}")
+    wavs = cargar_wavs(args.carpeta, motor.frecuencia)
+    if not wavs:
+        raise SystemExit("❌ No hay WAV utilizables")
+    senales = [s for _, _, s in wavs]
+    duracion = float(np.mean([len(s) for s in senales])) / motor.frecuencia
+    print(f"  {len(wavs)} grabaciones, {duracion:.2f} s de media")
+
+    r = args.repeticiones
+    resultado = {
+        "wavs": len(wavs),
+        "duracion_media_s": round(duracion, 3),
+        "decodificar_ms": _medir(lambda: [preparar_audio(d, motor.frecuencia) for _, d, _ in wavs], r),
+        "mfcc_ms": _medir(lambda: [motor.plantilla(s) for s in senales], r),
+        "mfcc_lote_ms": _medir(lambda: motor.plantillas(senales), r),
+        "espectral_ms": _medir(lambda: [plantilla_espectral(s) for s in senales], r),
+    }
+    # Las etapas por grabación se reportan por WAV
+    for etapa in ("decodificar_ms", "mfcc_ms", "mfcc_lote_ms", "espectral_ms"):
+        resultado[etapa] = {k: round(v / len(wavs), 3) for k, v in resultado[etapa].items()}
+
+    plantillas = motor.plantillas(senales)
+    if args.referencia:
+        resultado["mfcc_referencia_ms"] = {
+            k: round(v / len(wavs), 3)
+            for k, v in _medir(lambda: [plantilla_referencia(motor, s) for s in senales], max(1, r // 10)).items()
+        }
+        diferencia = max(float(np.abs(plantilla_referencia(motor, s) - p).max()) for s, p in zip(senales, plantillas))
+        resultado["diferencia_maxima_referencia"] = diferencia
+
+    rng = np.random.default_rng(args.semilla)
+    resultado["indice"] = {}
+    for n in args.galerias:
+        # Galería sintética alrededor de las plantillas reales, que quedan al final
+        base = plantillas[rng.integers(0, len(plantillas), n)]
+        galeria = base + rng.normal(0, 0.2, base.shape).astype("float32")
+        indice = FaceIndex(dim=motor.dim)
+        indice.cargar(((f"u{i}", v) for i, v in enumerate(galeria)))
+        for (nombre, _, _), p in zip(wavs, plantillas):
+            indice.agregar(nombre, p)
+        aciertos = sum(indice.buscar(p, k=1)[0][0] == nombre for (nombre, _, _), p in zip(wavs, plantillas))
+        resultado["indice"][str(n)] = {
+            "buscar_ms": _medir(lambda: [indice.buscar(p) for p in plantillas], r),
+            "top1": aciertos / len(wavs),
+        }
+        resultado["indice"][str(n)]["buscar_ms"] = {k: round(v / len(wavs), 3)
+                                                   for k, v in resultado["indice"][str(n)]["buscar_ms"].items()}
+    return resultado
+
+
+def imprimir(resultado):
+    for etapa in ("decodificar_ms", "mfcc_ms", "mfcc_lote_ms", "espectral_ms", "mfcc_referencia_ms"):
+        if etapa in resultado:
+            p = resultado[etapa]
+            print(f"  {etapa:<20} p50 {p['p50']:>8.3f}  p95 {p['p95']:>8.3f}  p99 {p['p99']:>8.3f} ms/WAV")
+    if "diferencia_maxima_referencia" in resultado:
+        print(f"  Diferencia máxima con la referencia: {resultado['diferencia_maxima_referencia']:.2e}")
+    for n, datos in resultado["indice"].items():
+        p = datos["buscar_ms"]
+        print(f"  índice {int(n):>9,}      p50 {p['p50']:>8.3f}  p95 {p['p95']:>8.3f}  p99 {p['p99']:>8.3f} ms  "
+              f"top-1 {datos['top1']:.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia de la verificación de voz")
+    parser.add_argument("--carpeta", default=CARPETA, help="Carpeta con los WAV a medir")
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--galerias", default="1000,10000,100000",
+                        type=lambda v: [int(x) for x in v.split(",") if x])
+    parser.add_argument("--referencia", action="store_true",
+                        help="Medir también la extracción trama por trama en Python")
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--json", help="Guardar el resultado en este archivo")
+    args = parser.parse_args()
+
+    resultado = medir(args)
+    imprimir(resultado)
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"plataforma": platform.platform(), "numpy": np.__version__, **resultado}, f, indent=2)
+        print(f"💾 Resultado guardado en {args.json}")
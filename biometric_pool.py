@@ -0,0 +1,108 @@
+# biometric_pool.py
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+import numpy as np
+
+# ==========================================
+# ⚙️ POOL DE CÓMPUTO BIOMÉTRICO CON CONTRAPRESIÓN
+# ==========================================
+# OpenCV y NumPy liberan el GIL en sus operaciones pesadas, así que un pool de
+# hilos da paralelismo real sin copiar el índice facial a otros procesos.
+
+
+class ColaBiometricaLlena(Exception):
+    """No hay cupo en la cola: el cliente debe reintentar más tarde"""
+
+    def __init__(self, retry_after):
+        super().__init__("Cola biométrica llena")
+        self.retry_after = retry_after
+
+
+class TiempoBiometricoAgotado(Exception):
+    """El trabajo no terminó dentro del tiempo máximo por trabajo"""
+
+    def __init__(self, retry_after):
+        super().__init__("Tiempo de procesamiento biométrico agotado")
+        self.retry_after = retry_after
+
+
+class PoolBiometrico:
+    """Pool de hilos de tamaño fijo con cola acotada y timeout por trabajo"""
+
+    def __init__(self, trabajadores=2, max_cola=16, timeout=10.0, retry_after=2):
+        self.trabajadores = trabajadores
+        self.max_cola = max_cola
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix="biometria")
+        # Un cupo por trabajo en ejecución o en espera
+        self._cupos = threading.BoundedSemaphore(trabajadores + max_cola)
+        self._lock = threading.Lock()
+        self._en_cola = 0
+        self._en_ejecucion = 0
+        self._esperas = deque(maxlen=500)
+        self.contadores = {"completados": 0, "rechazados": 0, "timeouts": 0, "errores": 0}
+
+    def _contar(self, clave):
+        with self._lock:
+            self.contadores[clave] += 1
+
+    def ejecutar(self, fn, *args, timeout=None, **kwargs):
+        """Ejecuta fn en el pool y espera su resultado; rechaza de inmediato si no hay cupo"""
+        if not self._cupos.acquire(blocking=False):
+            self._contar("rechazados")
+            raise ColaBiometricaLlena(self.retry_after)
+
+        encolado = time.perf_counter()
+        with self._lock:
+            self._en_cola += 1
+
+        def tarea():
+            inicio = time.perf_counter()
+            with self._lock:
+                self._en_cola -= 1
+                self._en_ejecucion += 1
+                self._esperas.append(inicio - encolado)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._en_ejecucion -= 1
+
+        future = self._executor.submit(tarea)
+        future.add_done_callback(lambda _: self._cupos.release())
+        try:
+            resultado = future.result(timeout=timeout or self.timeout)
+        except FuturesTimeout:
+            if future.cancel():
+                # No llegó a empezar: sale de la cola sin ocupar un hilo
+                with self._lock:
+                    self._en_cola -= 1
+            self._contar("timeouts")
+            raise TiempoBiometricoAgotado(self.retry_after)
+        except Exception:
+            self._contar("errores")
+            raise
+        self._contar("completados")
+        return resultado
+
+    def estadisticas(self):
+        """Profundidad de cola, ocupación y tiempos de espera para monitoreo"""
+        with self._lock:
+            esperas = np.array(self._esperas, dtype="float64") * 1000
+            datos = {
+                "trabajadores": self.trabajadores,
+                "max_cola": self.max_cola,
+                "en_cola": self._en_cola,
+                "en_ejecucion": self._en_ejecucion,
+                **self.contadores,
+            }
+        if len(esperas):
+            datos.update({
+                "espera_ms_p50": round(float(np.percentile(esperas, 50)), 3),
+                "espera_ms_p95": round(float(np.percentile(esperas, 95)), 3),
+                "espera_ms_max": round(float(esperas.max()), 3),
+            })
+        return datos
@@ -10,6 +10,12 @@ SECRET_KEY = "tu_clave_super_secreta_12345"
 
 # 💾 Base de datos
 DATABASE_PATH = os.path.join(BASE_DIR, "database", "usuarios.db")
+DB_POOL_TAMANO = 8               # Conexiones SQLite libres que se conservan (ver db_pool.py)
+DB_CACHE_KB = 8192               # Caché de páginas por conexión (PRAGMA cache_size)
+DB_MMAP_MB = 64                  # Lectura por memoria mapeada (PRAGMA mmap_size)
+DB_SENTENCIAS_CACHE = 256        # Sentencias preparadas guardadas por conexión
+DB_TIMEOUT_SEG = 5.0             # Espera máxima por un bloqueo de escritura
+DIABETES_DB_PATH = os.path.join(BASE_DIR, "database", "sistema_diabetes.db")  # Pacientes y glucemia (migraciones.py)
 ALLOWED_EXTENSIONS = {"pdf", "png", "jpg", "jpeg", "txt"}
 
 # 🔐 Claves RSA
@@ -33,6 +39,79 @@ RECAPTCHA_SECRET_KEY = "6LdhdhIsAAAAAPneaBoeYED2FRpxN9FtqVdiomUR"
 TOKEN_EXPIRATION_MINUTES = 30  # El token expira en 30 minutos
 MAX_TOKEN_ATTEMPTS = 3  # Máximo de intentos por token
 
+# 🧭 Índice facial aproximado (IVF)
+FACE_IVF_LISTAS = 256          # Número de centroides gruesos
+FACE_IVF_NPROBE = 8            # Listas revisadas por búsqueda (más = mejor recall, más latencia)
+FACE_IVF_MIN_USUARIOS = 5000   # Por debajo de este tamaño se usa búsqueda exacta
+
+# 🗜️ Plantillas faciales compactas en memoria
+FACE_CUANTIZACION = None       # None (float32), "float16" o "int8"
+FACE_RERANK = 10               # Candidatos re-puntuados con la plantilla float32
+FACE_INDICE_COMPARTIDO = False # Un solo segmento mapeado para todos los workers (Gunicorn/uWSGI)
+
+# 🪜 Cascada grueso-a-fino (firmas de baja resolución antes del coseno 100x100)
+FACE_CASCADA_LADO = None       # None (desactivada), 16 o 25
+FACE_CASCADA_UMBRAL = 0.3      # Similitud gruesa mínima para pasar a la comparación completa
+FACE_CASCADA_MUESTREO = 0.02   # Fracción de consultas auditadas contra la búsqueda exhaustiva
+
+# 🚦 Filtro de calidad antes de comparar rostros
+FACE_CALIDAD_ACTIVA = True
+FACE_CALIDAD_ESCALA = 0.5        # Copia reducida usada por el filtro
+FACE_CALIDAD_BRILLO_MIN = 40     # Brillo medio mínimo (0-255)
+FACE_CALIDAD_BRILLO_MAX = 215    # Brillo medio máximo (0-255)
+FACE_CALIDAD_NITIDEZ_MIN = 20.0  # Varianza mínima del Laplaciano en la copia reducida
+
+# 🎙️ Verificación de voz (MFCC, ver voice_engine.py)
+VOZ_UMBRAL = 0.7                 # Similitud mínima con centro (python voice_engine.py centro)
+VOZ_UMBRAL_SIN_CENTRO = 0.985    # Sin centro todas las voces se parecen mucho más
+VOZ_UMBRAL_ESPECTRAL = 0.97      # Plantillas voice_template_*.npy del formato anterior (solo 1:1)
+VOZ_MAX_SEG_SUBIDA = 15          # Duración máxima de un WAV subido (login, registro o muestra)
+VOZ_CAPTURA_LOCAL = False        # Solo desarrollo: grabar con el micrófono del servidor (sounddevice)
+VOZ_STREAM_MAX_SESIONES = 100    # Sesiones de voz por fragmentos abiertas a la vez (luego 503)
+VOZ_STREAM_INACTIVIDAD_SEG = 30  # Se descarta una sesión sin fragmentos durante este tiempo
+VOZ_STREAM_MAX_SEG = 10          # Audio máximo por sesión (fija la memoria reservada)
+VOZ_STREAM_MAX_FRAGMENTO_BYTES = 65536  # ~2 s de PCM16 a 16 kHz por fragmento
+VOZ_STREAM_MIN_VOZ_SEG = 1.0     # Voz mínima antes de evaluar puntajes parciales
+VOZ_STREAM_MARGEN = 0.1          # Distancia bajo el umbral para rechazar antes del final
+VOZ_STREAM_CONFIRMACIONES = 2    # Puntajes parciales seguidos que deben coincidir para decidir antes
+
+# 📥 Ingesta de lecturas de glucosa por lotes (NDJSON/CSV, ver glucemia_ingesta.py)
+GLUCEMIA_LOTE_MAX_BYTES = 16 * 1024 * 1024  # Tamaño máximo del cuerpo (413 si se supera)
+GLUCEMIA_LOTE_MAX_FILAS = 200000            # ~2 años de un sensor cada 5 min
+GLUCEMIA_MIN_MGDL = 20           # Lecturas fuera de este rango se rechazan por fila
+GLUCEMIA_MAX_MGDL = 600
+
+# 📉 Series de glucosa para las gráficas del dashboard (LTTB, ver glucemia_serie.py)
+GLUCEMIA_SERIE_PUNTOS = 300          # Puntos por defecto de /api/glucemia/<id>/serie
+GLUCEMIA_SERIE_MAX_PUNTOS = 2000     # Tope de ?puntos=
+GLUCEMIA_SERIE_MAX_LECTURAS = 50000  # Con fuente=auto, más lecturas que esto usan promedios por hora
+
+# 🔗 Vínculos de cuentas de la app con la base clínica (ver vinculos_clinicos.py)
+CLINICA_MAX_INTENTOS_VINCULO = 5        # Contraseñas clínicas erróneas antes de bloquear la cuenta clínica
+CLINICA_CODIGO_VIGENCIA_SEG = 86400     # Vigencia del código que el médico entrega al paciente
+
+# ⚙️ Pool de cómputo biométrico
+BIOMETRIA_TRABAJADORES = 2       # Hilos dedicados a preprocesado y comparación
+BIOMETRIA_MAX_COLA = 16          # Trabajos en espera antes de responder 503
+BIOMETRIA_TIMEOUT_SEG = 10       # Tiempo máximo por trabajo
+BIOMETRIA_RETRY_AFTER_SEG = 2    # Valor de la cabecera Retry-After
+
+# 🧾 Enrolamiento facial en segundo plano
+ENROLAMIENTO_TRABAJADORES = 1    # Hilos que procesan la cola persistida en SQLite
+ENROLAMIENTO_MAX_FRAMES = 10     # Frames aceptados por registro
+ENROLAMIENTO_ABANDONO_SEG = 900  # Sin progreso en este tiempo, un trabajo "procesando" se reintenta
+FACE_RAFAGA_TOP = 3              # Mejores frames promediados en la plantilla (1 = solo el mejor)
+FACE_RAFAGA_ESCALA_DETECCION = 0.5  # Escala de las copias usadas para puntuar y detectar
+FACE_EJEMPLARES_MAX = 5          # Muestras de enrolamiento guardadas por usuario (más su centroide)
+
+# 🕵️ Auditoría biométrica
+FACE_AUDITORIA_CAPTURAS = False  # Guardar en disco cada captura de login (solo auditoría)
+
+# 🧬 Proyección PCA (eigenfaces) de plantillas faciales
+FACE_PCA_ACTIVO = False        # Requiere entrenar antes con: python face_pca.py
+FACE_PCA_COMPONENTES = 128
+FACE_PCA_MAX_IMPOSTORES = 0.001  # Aumento tolerado de impostores sobre FACE_THRESHOLD al publicar
+
 # ⚙️ Config Flask adicional
 DEBUG = True
 HOST = "localhost"
@@ -3,6 +3,8 @@ import os
 import bcrypt
 from datetime import datetime
 import json
+from migraciones import aplicar as aplicar_migraciones
+from glucemia_resumen import reconstruir as reconstruir_resumenes
 
 # ==========================================
 # 📌 RUTA DE LA BASE DE DATOS
@@ -20,273 +22,9 @@ conexion = sqlite3.connect(DB_PATH)
 cursor = conexion.cursor()
 
 # ==========================================
-# 🧑‍⚕️ TABLA DE USUARIOS (personal médico)
+# 🧱 ESQUEMA (migraciones versionadas, ver migraciones.py)
 # ==========================================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS usuarios (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    correo TEXT UNIQUE NOT NULL,
-    password TEXT NOT NULL,
-    nombre TEXT NOT NULL,
-    rol TEXT DEFAULT 'medico',        -- medico, admin, enfermero
-    telefono TEXT,
-    especialidad TEXT,
-    activo BOOLEAN DEFAULT 1,
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    ultimo_login TIMESTAMP,
-    intentos_login INTEGER DEFAULT 0,
-    bloqueado BOOLEAN DEFAULT 0
-);
-""")
-
-# ==========================================
-# 👨‍⚕️ TABLA DE PACIENTES CON DIABETES
-# ==========================================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS pacientes (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    nombre TEXT NOT NULL,
-    edad INTEGER,
-    sexo TEXT,                        -- M, F, Otro
-    tipo_diabetes TEXT,               -- Tipo 1, Tipo 2, Gestacional
-    telefono TEXT,
-    email TEXT,
-    direccion TEXT,
-    fecha_nacimiento TEXT,
-    fecha_diagnostico TEXT,
-    medico_asignado INTEGER,
-    historial_medico TEXT,
-    alergias TEXT,
-    contacto_emergencia TEXT,
-    telefono_emergencia TEXT,
-    activo BOOLEAN DEFAULT 1,
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (medico_asignado) REFERENCES usuarios(id)
-);
-""")
-
-# ==========================================
-# 💊 TABLA DE MEDICAMENTOS PARA DIABETES
-# ==========================================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS medicamentos (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    nombre TEXT NOT NULL,
-    tipo TEXT,                        -- insulina, pastillas, GLP-1, etc.
-    dosis TEXT,
-    descripcion TEXT,
-    contraindicaciones TEXT,
-    laboratorio TEXT,
-    activo BOOLEAN DEFAULT 1,
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-""")
-
-# ==========================================
-# 📋 ASIGNACIÓN DE MEDICAMENTOS A PACIENTES
-# ==========================================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS tratamientos (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    paciente_id INTEGER,
-    medicamento_id INTEGER,
-    dosis_prescrita TEXT,
-    frecuencia TEXT,                  -- 1 diaria, 2 diarias, semanal...
-    via_administracion TEXT,          -- oral, subcutánea, etc.
-    hora_administracion TEXT,         -- 08:00, 20:00, etc.
-    fecha_inicio TEXT,
-    fecha_fin TEXT,
-    indicaciones TEXT,
-    estado TEXT DEFAULT 'activo',     -- activo, suspendido, completado
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
-    FOREIGN KEY (medicamento_id) REFERENCES medicamentos(id)
-);
-""")
-
-# ==========================================
-# 📊 REGISTROS GLUCÉMICOS
-# ==========================================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS registros_glucemia (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    paciente_id INTEGER,
-    nivel_glucosa REAL,               -- mg/dL
-    tipo_medicion TEXT,               -- ayunas, postprandial, aleatoria
-    fecha_medicion TIMESTAMP,
-    hora_medicion TEXT,
-    notas TEXT,
-    estado TEXT,                      -- normal, alto, bajo, crítico
-    dispositivo TEXT,                 -- glucómetro, sensor
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (paciente_id) REFERENCES pacientes(id)
-);
-""")
-
-# ==========================================
-# 🩺 CONSULTAS MÉDICAS
-# ==========================================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS consultas (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    paciente_id INTEGER,
-    medico_id INTEGER,
-    fecha_consulta TEXT,
-    hora_consulta TEXT,
-    motivo TEXT,
-    diagnostico TEXT,
-    tratamiento TEXT,
-    observaciones TEXT,
-    peso REAL,
-    altura REAL,
-    presion_arterial TEXT,
-    imc REAL,
-    proxima_cita TEXT,
-    estado TEXT DEFAULT 'realizada',  -- programada, realizada, cancelada
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
-    FOREIGN KEY (medico_id) REFERENCES usuarios(id)
-);
-""")
-
-# ==========================================
-# 🔐 TABLAS DE BIOMETRÍAS
-# ==========================================
-
-# Huella dactilar
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS biometricos_huella (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    usuario_id INTEGER,
-    public_key TEXT,
-    credential_id TEXT UNIQUE,
-    dispositivo TEXT,
-    activo BOOLEAN DEFAULT 1,
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
-);
-""")
-
-# Rostro
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS biometricos_facial (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    usuario_id INTEGER,
-    datos_facial TEXT,                -- Datos faciales codificados
-    descriptor_facial TEXT,           -- Descriptor facial para comparación
-    imagen_rostro BLOB,               -- Imagen del rostro
-    confianza_minima REAL DEFAULT 0.8,
-    activo BOOLEAN DEFAULT 1,
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
-);
-""")
-
-# Voz
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS biometricos_voz (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    usuario_id INTEGER,
-    huella_voz TEXT,                  -- Huella vocal codificada
-    frase TEXT,                       -- Frase de entrenamiento
-    audio_muestra BLOB,               -- Audio de muestra
-    confianza_minima REAL DEFAULT 0.7,
-    activo BOOLEAN DEFAULT 1,
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
-);
-""")
-
-# ==========================================
-# 🕓 HISTORIAL DE ACCESOS (LOGIN BIOMÉTRICO)
-# ==========================================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS historial_accesos (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    usuario_id INTEGER,
-    metodo TEXT,                      -- rostro, huella, voz, contraseña
-    dispositivo TEXT,
-    ip_address TEXT,
-    user_agent TEXT,
-    exito BOOLEAN,
-    confianza REAL,                   -- Nivel de confianza biométrica
-    mensaje_error TEXT,
-    fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
-);
-""")
-
-# ==========================================
-# 🚨 ALERTAS DE MEDICAMENTOS
-# ==========================================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS alertas (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    paciente_id INTEGER,
-    tratamiento_id INTEGER,
-    tipo TEXT,                        -- medicamento, glucosa, cita
-    mensaje TEXT,
-    prioridad TEXT DEFAULT 'media',   -- baja, media, alta, critica
-    estado TEXT DEFAULT 'pendiente',  -- pendiente, atendida, cancelada
-    fecha_alerta TIMESTAMP,
-    fecha_atencion TIMESTAMP,
-    leido BOOLEAN DEFAULT 0,
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
-    FOREIGN KEY (tratamiento_id) REFERENCES tratamientos(id)
-);
-""")
-
-# ==========================================
-# 📅 RECORDATORIOS DE MEDICAMENTOS
-# ==========================================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS recordatorios (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    paciente_id INTEGER,
-    tratamiento_id INTEGER,
-    titulo TEXT,
-    mensaje TEXT,
-    fecha_recordatorio TEXT,
-    hora_recordatorio TEXT,
-    repetir TEXT,                     -- una_vez, diario, semanal
-    estado TEXT DEFAULT 'pendiente',  -- pendiente, completado, cancelado
-    confirmado BOOLEAN DEFAULT 0,
-    fecha_confirmacion TIMESTAMP,
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
-    FOREIGN KEY (tratamiento_id) REFERENCES tratamientos(id)
-);
-""")
-
-# ==========================================
-# 📈 METAS GLUCÉMICAS
-# ==========================================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS metas_glucemia (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    paciente_id INTEGER,
-    tipo_medicion TEXT,               -- ayunas, postprandial, aleatoria
-    meta_minima REAL,
-    meta_maxima REAL,
-    activo BOOLEAN DEFAULT 1,
-    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (paciente_id) REFERENCES pacientes(id)
-);
-""")
-
-# ==========================================
-# 🔐 CONFIGURACIÓN DE SEGURIDAD
-# ==========================================
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS configuracion_seguridad (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    clave TEXT UNIQUE,
-    valor TEXT,
-    descripcion TEXT,
-    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-""")
+aplicar_migraciones(conexion)
 
 # ==========================================
 # 👤 INSERTAR USUARIOS DE PRUEBA
@@ -528,10 +266,16 @@ registros_prueba = [
 
 for r in registros_prueba:
     cursor.execute(
-        "INSERT INTO registros_glucemia (paciente_id, nivel_glucosa, tipo_medicion, fecha_medicion, hora_medicion, notas, estado, dispositivo) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        "INSERT OR IGNORE INTO registros_glucemia (paciente_id, nivel_glucosa, tipo_medicion, fecha_medicion, hora_medicion, notas, estado, dispositivo) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
         (r["paciente_id"], r["nivel_glucosa"], r["tipo_medicion"], r["fecha_medicion"], r["hora_medicion"], r["notas"], r["estado"], r["dispositivo"])
     )
 
+# La migración 005 calculó los resúmenes antes de estos registros: se recalculan
+# los de los pacientes de prueba (reconstruir abre su propia transacción)
+conexion.commit()
+for paciente_id in sorted({r["paciente_id"] for r in registros_prueba}):
+    reconstruir_resumenes(conexion, paciente_id)
+
 # ==========================================
 # 🔐 INSERTAR CONFIGURACIÓN DE SEGURIDAD
 # ==========================================
@@ -570,4 +314,6 @@ print(" - Ana Martínez (Diabetes Tipo 1)")
 print(" - Miguel Sánchez (Diabetes Tipo 2)")
 print("\n💊 MEDICAMENTOS REGISTRADOS:")
 print(" - Metformina, Insulina Glargina, Glibenclamida, Liraglutida")
+print("\n🔗 Para ver lecturas desde la app, vincula la cuenta: el personal con sus")
+print("   credenciales clínicas y cada paciente con el código que genera su médico")
 print("="*50)
\ No newline at end of file
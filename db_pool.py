@@ -0,0 +1,148 @@
+# db_pool.py
+import os
+import sqlite3
+import threading
+
+# ==========================================
+# 💾 POOL DE CONEXIONES SQLITE (WAL)
+# ==========================================
+# Abrir una conexión por consulta obliga a SQLite a abrir el archivo, leer el
+# esquema y descartar su caché de páginas y de sentencias preparadas cada vez.
+# El pool conserva conexiones ya configuradas (WAL, synchronous=NORMAL, caché
+# y mmap ajustados) y las reparte: close() sobre una conexión del pool la
+# devuelve en lugar de cerrarla, así que el código existente no cambia.
+
+
+class ConexionPool:
+    """Conexión sqlite3 prestada por el pool; close() la devuelve"""
+
+    __slots__ = ("_pool", "_conn")
+
+    def __init__(self, pool, conn):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conn", conn)
+
+    @property
+    def cerrada(self):
+        return self._conn is None
+
+    def _activa(self):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return self._conn
+
+    def __getattr__(self, nombre):
+        return getattr(self._activa(), nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._activa(), nombre, valor)
+
+    def __enter__(self):
+        self._activa().__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._activa().__exit__(*exc)
+
+    def close(self):
+        """Devuelve la conexión al pool (idempotente)"""
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, "_conn", None)
+            self._pool.devolver(conn)
+
+
+class PoolSQLite:
+    """Conexiones reutilizables a un archivo SQLite, compartidas entre hilos
+
+    Cada conexión la usa un solo hilo a la vez (la tiene prestada), por eso se
+    abren con check_same_thread=False. Se guardan hasta `tamano` conexiones
+    libres; si hay más préstamos simultáneos se abren conexiones extra que se
+    cierran al devolverlas.
+    """
+
+    def __init__(self, ruta, tamano=8, cache_kb=8192, mmap_mb=64, sentencias=256, timeout_seg=5.0):
+        self.ruta = ruta
+        self.tamano = tamano
+        self.cache_kb = cache_kb
+        self.mmap_mb = mmap_mb
+        self.sentencias = sentencias
+        self.timeout_seg = timeout_seg
+        self._libres = []
+        self._lock = threading.Lock()
+        self.contadores = {"abiertas": 0, "reutilizadas": 0, "descartadas": 0, "revertidas": 0}
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+    def _abrir(self):
+        conn = sqlite3.connect(self.ruta, timeout=self.timeout_seg,
+                               check_same_thread=False, cached_statements=self.sentencias)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_mb) * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def conectar(self):
+        """Conexión prestada; se devuelve con close()"""
+        with self._lock:
+            conn = self._libres.pop() if self._libres else None
+            self.contadores["reutilizadas" if conn is not None else "abiertas"] += 1
+        if conn is None:
+            conn = self._abrir()
+        return ConexionPool(self, conn)
+
+    def devolver(self, conn):
+        # Lo que no se confirmó se descarta, igual que al cerrar una conexión
+        try:
+            revertida = conn.in_transaction
+            if revertida:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self.contadores["descartadas"] += 1
+            return
+        with self._lock:
+            if revertida:
+                self.contadores["revertidas"] += 1
+            if len(self._libres) < self.tamano:
+                # LIFO: la conexión más reciente tiene la caché más caliente
+                self._libres.append(conn)
+                return
+            self.contadores["descartadas"] += 1
+        conn.close()
+
+    def cerrar(self):
+        """Cierra las conexiones libres (las prestadas se cierran al devolverse)"""
+        with self._lock:
+            libres, self._libres = self._libres, []
+        for conn in libres:
+            conn.close()
+
+    def estadisticas(self):
+        with self._lock:
+            datos = dict(self.contadores)
+            datos["libres"] = len(self._libres)
+        datos["tamano"] = self.tamano
+        return datos
+
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def obtener_pool(ruta, **opciones):
+    """Pool compartido por ruta; `opciones` solo se aplican la primera vez"""
+    ruta = os.path.abspath(ruta)
+    pool = _POOLS.get(ruta)
+    if pool is None:
+        with _POOLS_LOCK:
+            pool = _POOLS.get(ruta)
+            if pool is None:
+                pool = _POOLS[ruta] = PoolSQLite(ruta, **opciones)
+    return pool
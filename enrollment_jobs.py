@@ -0,0 +1,200 @@
+# enrollment_jobs.py
+import time
+import uuid
+import threading
+
+# ==========================================
+# 🧾 COLA PERSISTENTE DE ENROLAMIENTO FACIAL
+# ==========================================
+# Los trabajos y sus frames viven en SQLite, así que sobreviven a un reinicio.
+# Cada reporte de progreso renueva fecha_actualizacion; al arrancar un proceso
+# y luego cada abandono_seg / 2 mientras corre, los trabajos "procesando" sin
+# actualizar en `abandono_seg` (su worker murió) vuelven a "pendiente". Los
+# que otro worker vivo está procesando no se tocan.
+
+ESTADOS_FINALES = ("completado", "fallido")
+
+
+class ColaEnrolamiento:
+    """Trabajos de enrolamiento procesados por hilos en segundo plano"""
+
+    def __init__(self, conectar, procesar, trabajadores=1, intervalo_sondeo=2.0, abandono_seg=900):
+        # conectar(): nueva conexión sqlite3 con row_factory = sqlite3.Row
+        # procesar(trabajo, frames, reportar): hace el enrolamiento y devuelve un mensaje
+        self.conectar = conectar
+        self.procesar = procesar
+        self.trabajadores = trabajadores
+        self.intervalo_sondeo = intervalo_sondeo
+        self.abandono_seg = abandono_seg
+        self._evento = threading.Event()
+        self._hilos = []
+        self._iniciada = False
+        self._lock = threading.Lock()
+        self._proxima_recuperacion = 0.0
+
+    def crear_tablas(self):
+        conn = self.conectar()
+        cur = conn.cursor()
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS trabajos_enrolamiento (
+            id TEXT PRIMARY KEY,
+            usuario_id INTEGER,
+            correo TEXT NOT NULL,
+            estado TEXT DEFAULT 'pendiente',   -- pendiente, procesando, completado, fallido
+            progreso INTEGER DEFAULT 0,        -- 0 a 100
+            mensaje TEXT,
+            fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            fecha_actualizacion DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS trabajos_enrolamiento_frames (
+            trabajo_id TEXT NOT NULL,
+            orden INTEGER NOT NULL,
+            datos BLOB NOT NULL,
+            PRIMARY KEY (trabajo_id, orden)
+        )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_enrolamiento_estado ON trabajos_enrolamiento(estado, fecha_creacion)")
+        conn.commit()
+        conn.close()
+
+    def recuperar_abandonados(self):
+        """Devuelve a "pendiente" los trabajos cuyo worker dejó de reportar (caída del proceso)"""
+        conn = self.conectar()
+        cur = conn.execute("""
+            UPDATE trabajos_enrolamiento
+            SET estado = 'pendiente', mensaje = 'Reintentando tras una interrupción',
+                fecha_actualizacion = CURRENT_TIMESTAMP
+            WHERE estado = 'procesando' AND fecha_actualizacion < datetime('now', ?)
+        """, (f"-{int(self.abandono_seg)} seconds",))
+        recuperados = cur.rowcount
+        conn.commit()
+        conn.close()
+        if recuperados:
+            print(f"🧾 {recuperados} trabajos de enrolamiento abandonados vuelven a la cola")
+        return recuperados
+
+    def _recuperar_si_toca(self):
+        """Recupera abandonados cada abandono_seg / 2 (un solo hilo por vez)"""
+        with self._lock:
+            ahora = time.monotonic()
+            if ahora < self._proxima_recuperacion:
+                return
+            self._proxima_recuperacion = ahora + self.abandono_seg / 2
+        self.recuperar_abandonados()
+
+    def iniciar(self):
+        """Arranca los hilos trabajadores (idempotente)"""
+        with self._lock:
+            if self._iniciada:
+                return
+            self.crear_tablas()
+            self.recuperar_abandonados()
+            self._proxima_recuperacion = time.monotonic() + self.abandono_seg / 2
+            for i in range(self.trabajadores):
+                hilo = threading.Thread(target=self._bucle, name=f"enrolamiento-{i}", daemon=True)
+                hilo.start()
+                self._hilos.append(hilo)
+            self._iniciada = True
+
+    # ---------- API ----------
+    def encolar(self, usuario_id, correo, frames):
+        """Guarda el trabajo con sus frames y devuelve su id de inmediato"""
+        self.iniciar()
+        trabajo_id = uuid.uuid4().hex
+        conn = self.conectar()
+        cur = conn.cursor()
+        cur.execute("INSERT INTO trabajos_enrolamiento (id, usuario_id, correo, mensaje) VALUES (?, ?, ?, ?)",
+                    (trabajo_id, usuario_id, correo, "En cola"))
+        cur.executemany("INSERT INTO trabajos_enrolamiento_frames (trabajo_id, orden, datos) VALUES (?, ?, ?)",
+                        [(trabajo_id, i, datos) for i, datos in enumerate(frames)])
+        conn.commit()
+        conn.close()
+        self._evento.set()
+        print(f"🧾 Trabajo de enrolamiento {trabajo_id} encolado para {correo} ({len(frames)} frames)")
+        return trabajo_id
+
+    def estado(self, trabajo_id):
+        conn = self.conectar()
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, usuario_id, correo, estado, progreso, mensaje, fecha_creacion, fecha_actualizacion
+            FROM trabajos_enrolamiento WHERE id = ?
+        """, (trabajo_id,))
+        fila = cur.fetchone()
+        conn.close()
+        return dict(fila) if fila else None
+
+    # ---------- procesamiento ----------
+    def _actualizar(self, trabajo_id, **campos):
+        asignaciones = ", ".join(f"{k} = ?" for k in campos)
+        conn = self.conectar()
+        conn.execute(f"UPDATE trabajos_enrolamiento SET {asignaciones}, fecha_actualizacion = CURRENT_TIMESTAMP WHERE id = ?",
+                     (*campos.values(), trabajo_id))
+        conn.commit()
+        conn.close()
+
+    def _tomar_siguiente(self):
+        """Reclama de forma atómica el trabajo pendiente más antiguo"""
+        conn = self.conectar()
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("""
+                SELECT id, usuario_id, correo FROM trabajos_enrolamiento
+                WHERE estado = 'pendiente' ORDER BY fecha_creacion LIMIT 1
+            """)
+            trabajo = cur.fetchone()
+            if trabajo is None:
+                conn.rollback()
+                return None, []
+            cur.execute("""
+                UPDATE trabajos_enrolamiento
+                SET estado = 'procesando', progreso = 5, fecha_actualizacion = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (trabajo["id"],))
+            cur.execute("SELECT datos FROM trabajos_enrolamiento_frames WHERE trabajo_id = ? ORDER BY orden",
+                        (trabajo["id"],))
+            frames = [bytes(f["datos"]) for f in cur.fetchall()]
+            conn.commit()
+            return dict(trabajo), frames
+        finally:
+            conn.close()
+
+    def _bucle(self):
+        while True:
+            try:
+                # Trabajos de workers que murieron mientras este proceso sigue vivo
+                self._recuperar_si_toca()
+                trabajo, frames = self._tomar_siguiente()
+            except Exception as e:
+                print(f"❌ Error leyendo la cola de enrolamiento: {e}")
+                trabajo, frames = None, []
+            if trabajo is None:
+                # Despertar al encolar o sondear por trabajos de otros procesos
+                self._evento.wait(self.intervalo_sondeo)
+                self._evento.clear()
+                continue
+            self._ejecutar(trabajo, frames)
+
+    def _ejecutar(self, trabajo, frames):
+        trabajo_id = trabajo["id"]
+        inicio = time.perf_counter()
+
+        def reportar(progreso, mensaje):
+            self._actualizar(trabajo_id, progreso=int(progreso), mensaje=mensaje)
+
+        try:
+            mensaje = self.procesar(trabajo, frames, reportar)
+            self._actualizar(trabajo_id, estado="completado", progreso=100, mensaje=mensaje)
+            print(f"✅ Enrolamiento {trabajo_id} completado en {time.perf_counter() - inicio:.2f}s")
+        except Exception as e:
+            self._actualizar(trabajo_id, estado="fallido", mensaje=str(e))
+            print(f"❌ Enrolamiento {trabajo_id} fallido: {e}")
+        finally:
+            # Los frames ya no se necesitan una vez terminado el trabajo
+            conn = self.conectar()
+            conn.execute("DELETE FROM trabajos_enrolamiento_frames WHERE trabajo_id = ?", (trabajo_id,))
+            conn.commit()
+            conn.close()
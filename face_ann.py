@@ -0,0 +1,134 @@
+# face_ann.py
+import os
+import numpy as np
+
+# ==========================================
+# 🧭 ÍNDICE APROXIMADO IVF (CENTROIDES GRUESOS)
+# ==========================================
+class IVFCoarse:
+    """Cuantizador grueso: k-means esférico sobre las plantillas faciales.
+
+    Cada plantilla se asigna a su centroide más cercano. En la búsqueda solo
+    se revisan las `nprobe` listas más cercanas a la consulta; subir `nprobe`
+    mejora el recall a costa de latencia.
+    """
+
+    def __init__(self, centroides, nprobe=8):
+        self.centroides = np.ascontiguousarray(centroides, dtype="float32")
+        self.nprobe = nprobe
+
+    @property
+    def n_listas(self):
+        return self.centroides.shape[0]
+
+    @property
+    def dim(self):
+        return self.centroides.shape[1]
+
+    @staticmethod
+    def _normalizar_filas(matriz):
+        normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+        normas[normas == 0] = 1.0
+        return matriz / normas
+
+    @classmethod
+    def entrenar(cls, matriz, n_listas=256, iteraciones=10, muestra_por_lista=40, nprobe=8, semilla=0):
+        """Entrena los centroides con k-means esférico sobre una muestra"""
+        matriz = np.asarray(matriz, dtype="float32")
+        rng = np.random.default_rng(semilla)
+        n = matriz.shape[0]
+        n_listas = max(1, min(n_listas, n))
+
+        if n > n_listas * muestra_por_lista:
+            muestra = matriz[rng.choice(n, n_listas * muestra_por_lista, replace=False)]
+        else:
+            muestra = matriz
+        muestra = cls._normalizar_filas(muestra)
+
+        centroides = muestra[rng.choice(muestra.shape[0], n_listas, replace=False)].copy()
+        for _ in range(iteraciones):
+            asignacion = np.argmax(muestra @ centroides.T, axis=1)
+            sumas = np.zeros_like(centroides)
+            np.add.at(sumas, asignacion, muestra)
+            conteos = np.bincount(asignacion, minlength=n_listas)
+            vacias = np.flatnonzero(conteos == 0)
+            if len(vacias):
+                # Re-sembrar listas vacías con puntos aleatorios de la muestra
+                sumas[vacias] = muestra[rng.choice(muestra.shape[0], len(vacias), replace=False)]
+            centroides = cls._normalizar_filas(sumas)
+
+        print(f"🧭 IVF entrenado: {n_listas} listas sobre {muestra.shape[0]} plantillas")
+        return cls(centroides, nprobe=nprobe)
+
+    def asignar(self, matriz, bloque=4096):
+        """Lista (centroide) de cada fila, procesando por bloques"""
+        matriz = np.atleast_2d(np.asarray(matriz, dtype="float32"))
+        salida = np.empty(matriz.shape[0], dtype="int32")
+        for i in range(0, matriz.shape[0], bloque):
+            salida[i:i + bloque] = np.argmax(matriz[i:i + bloque] @ self.centroides.T, axis=1)
+        return salida
+
+    def sondear(self, vec, nprobe=None):
+        """Índices de las nprobe listas más cercanas a la consulta"""
+        nprobe = min(nprobe or self.nprobe, self.n_listas)
+        scores = self.centroides @ vec
+        if nprobe >= self.n_listas:
+            return np.arange(self.n_listas, dtype="int32")
+        return np.argpartition(-scores, nprobe - 1)[:nprobe].astype("int32")
+
+    def guardar(self, path):
+        """Escritura atómica del índice en formato .npz"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, centroides=self.centroides, nprobe=np.int32(self.nprobe))
+        os.replace(tmp, path)
+        print(f"✅ Índice IVF guardado: {path}")
+
+    @classmethod
+    def cargar(cls, path, nprobe=None):
+        try:
+            with np.load(path) as datos:
+                return cls(datos["centroides"], nprobe=int(nprobe or datos["nprobe"]))
+        except Exception as e:
+            print(f"❌ Error cargando índice IVF: {e}")
+            return None
+
+
+# ==========================================
+# 🛠️ ENTRENAMIENTO DESDE LÍNEA DE COMANDOS
+# ==========================================
+if __name__ == "__main__":
+    import argparse
+    import config
+    from template_store import TemplateStore
+    from face_preproceso import nombre_store_facial, version_activa
+
+    templates_folder = os.path.join(config.BASE_DIR, "biometric_data", "templates")
+    parser = argparse.ArgumentParser(description="Entrena el índice IVF de plantillas faciales")
+    parser.add_argument("--listas", type=int, default=getattr(config, "FACE_IVF_LISTAS", 256))
+    parser.add_argument("--nprobe", type=int, default=getattr(config, "FACE_IVF_NPROBE", 8))
+    parser.add_argument("--iteraciones", type=int, default=10)
+    parser.add_argument("--salida", default=os.path.join(templates_folder, "face_ivf.npz"))
+    args = parser.parse_args()
+
+    # El mismo almacén que sirve la app (cambia tras python reenrolamiento.py)
+    version = version_activa(templates_folder)
+    store = TemplateStore(templates_folder, nombre_store_facial(version))
+    if len(store) == 0:
+        print(f"⚠️  No hay plantillas faciales {version} para entrenar (¿falta python template_store.py migrar?)")
+        raise SystemExit(1)
+
+    matriz = np.stack([vec for _, vec in store.items()])
+    pca_path = os.path.join(templates_folder, "face_pca.npz")
+    if getattr(config, "FACE_PCA_ACTIVO", False) and os.path.exists(pca_path):
+        # El IVF debe vivir en el mismo espacio que el índice facial
+        from face_pca import ProyeccionPCA
+        pca = ProyeccionPCA.cargar(pca_path)
+        if pca is not None and pca.preproceso != version:
+            print(f"⚠️  PCA de preprocesado {pca.preproceso} (activo {version}): la app no la usa, se ignora")
+            pca = None
+        if pca is not None:
+            matriz = pca.proyectar_lote(matriz)
+            print(f"🧬 Entrenando sobre plantillas proyectadas {pca.version}")
+    ivf = IVFCoarse.entrenar(matriz, n_listas=args.listas, iteraciones=args.iteraciones, nprobe=args.nprobe)
+    ivf.guardar(args.salida)
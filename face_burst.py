@@ -0,0 +1,76 @@
+# face_burst.py
+import cv2
+import numpy as np
+
+# ==========================================
+# 📸 SELECCIÓN DEL MEJOR FRAME DE UNA RÁFAGA
+# ==========================================
+# Todas las métricas se calculan en lote sobre copias reducidas de los frames:
+# nitidez (varianza del Laplaciano), brillo y tamaño del rostro detectado.
+
+PESO_NITIDEZ = 0.5
+PESO_BRILLO = 0.2
+PESO_TAMANO = 0.3
+
+
+def _reducir_lote(frames, escala):
+    """Pila (N, h, w) en escala de grises al tamaño reducido del primer frame,
+    junto con el factor (fx, fy) para volver a las coordenadas de cada frame"""
+    alto, ancho = frames[0].shape[:2]
+    tam = (max(1, int(ancho * escala)), max(1, int(alto * escala)))
+    grises, factores = [], []
+    for frame in frames:
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        grises.append(cv2.resize(gray, tam, interpolation=cv2.INTER_AREA))
+        factores.append((gray.shape[1] / tam[0], gray.shape[0] / tam[1]))
+    return np.stack(grises), factores
+
+
+def nitidez_lote(grises):
+    """Varianza del Laplaciano (núcleo de 4 vecinos) para toda la pila a la vez"""
+    x = grises.astype("float32")
+    lap = (x[:, :-2, 1:-1] + x[:, 2:, 1:-1] + x[:, 1:-1, :-2] + x[:, 1:-1, 2:]
+           - 4.0 * x[:, 1:-1, 1:-1])
+    return lap.reshape(len(x), -1).var(axis=1)
+
+
+def brillo_lote(grises):
+    """1.0 para brillo medio ideal (128), 0.0 para imagen negra o saturada"""
+    media = grises.reshape(len(grises), -1).mean(axis=1)
+    return 1.0 - np.abs(media - 128.0) / 128.0
+
+
+def puntuar_rafaga(frames, detectar, escala=0.5):
+    """Puntaje por frame y el rostro más grande de cada uno (en coordenadas originales)
+
+    `detectar(gray)` devuelve rectángulos (x, y, w, h) como detectMultiScale.
+    """
+    grises, factores = _reducir_lote(frames, escala)
+    nitidez = nitidez_lote(grises)
+    brillo = brillo_lote(grises)
+
+    area_total = float(grises.shape[1] * grises.shape[2])
+    tamano = np.zeros(len(frames), dtype="float64")
+    rostros = [None] * len(frames)
+    for i, gray in enumerate(grises):
+        faces = detectar(gray)
+        if len(faces) == 0:
+            continue
+        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+        tamano[i] = (w * h) / area_total
+        fx, fy = factores[i]
+        rostros[i] = (int(x * fx), int(y * fy), int(w * fx), int(h * fy))
+
+    con_rostro = tamano > 0
+    nitidez_rel = nitidez / (nitidez[con_rostro].max() if con_rostro.any() else nitidez.max() or 1.0)
+    tamano_rel = tamano / (tamano.max() or 1.0)
+    puntaje = PESO_NITIDEZ * nitidez_rel + PESO_BRILLO * brillo + PESO_TAMANO * tamano_rel
+    puntaje[~con_rostro] = -1.0
+    return puntaje, rostros, {"nitidez": nitidez, "brillo": brillo, "tamano": tamano}
+
+
+def mejores_frames(frames, detectar, top=1, escala=0.5):
+    """Índices (del mejor al peor) de los `top` frames con rostro, y sus rostros"""
+    puntaje, rostros, _ = puntuar_rafaga(frames, detectar, escala)
+    orden = [int(i) for i in np.argsort(-puntaje) if puntaje[i] >= 0][:top]
+    return orden, [rostros[i] for i in orden]
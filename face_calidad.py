@@ -0,0 +1,79 @@
+# face_calidad.py
+import time
+import threading
+import cv2
+import numpy as np
+
+# ==========================================
+# 🚦 FILTRO DE CALIDAD ANTES DE LA COMPARACIÓN
+# ==========================================
+# Descarta en pocos milisegundos los frames que no vale la pena comparar
+# (oscuros, saturados, borrosos o sin rostro) usando una copia reducida.
+
+MOTIVOS = {
+    "imagen_oscura": "📸 La imagen está muy oscura. Busca más luz y vuelve a intentarlo.",
+    "imagen_saturada": "📸 La imagen está sobreexpuesta. Evita la luz directa y vuelve a intentarlo.",
+    "borrosa": "📸 La imagen salió borrosa. Mantén la cámara quieta y vuelve a intentarlo.",
+    "sin_rostro": "📸 No se detectó ningún rostro. Centra tu cara en la cámara y vuelve a intentarlo.",
+}
+
+
+class FiltroCalidad:
+    """Histograma de brillo + varianza del Laplaciano + Haar sobre una copia reducida"""
+
+    def __init__(self, detectar, escala=0.5, brillo_min=40, brillo_max=215,
+                 fraccion_extremos_max=0.6, nitidez_min=20.0):
+        # detectar(gray) devuelve rectángulos (x, y, w, h) sobre la copia reducida
+        self.detectar = detectar
+        self.escala = escala
+        self.brillo_min = brillo_min
+        self.brillo_max = brillo_max
+        self.fraccion_extremos_max = fraccion_extremos_max
+        self.nitidez_min = nitidez_min
+        self._lock = threading.Lock()
+        self.contadores = {"aceptadas": 0, **{motivo: 0 for motivo in MOTIVOS}}
+        self._ms_total = 0.0
+
+    def _reducir(self, img):
+        gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if self.escala != 1:
+            gray = cv2.resize(gray, None, fx=self.escala, fy=self.escala, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _motivo_rechazo(self, gray, detectar_rostro=True):
+        """Primera prueba que falla, de la más barata a la más cara"""
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        total = hist.sum()
+        media = float(np.dot(hist, np.arange(256)) / total)
+        if media < self.brillo_min or hist[:25].sum() / total > self.fraccion_extremos_max:
+            return "imagen_oscura"
+        if media > self.brillo_max or hist[231:].sum() / total > self.fraccion_extremos_max:
+            return "imagen_saturada"
+        if cv2.Laplacian(gray, cv2.CV_32F).var() < self.nitidez_min:
+            return "borrosa"
+        if detectar_rostro and len(self.detectar(gray)) == 0:
+            return "sin_rostro"
+        return None
+
+    def evaluar(self, img, recorte=False):
+        """None si el frame puede compararse; si no, el motivo del rechazo
+
+        Un `recorte` (rostro ya recortado por el navegador) se evalúa a tamaño
+        completo y sin detección: el rostro ocupa toda la imagen.
+        """
+        inicio = time.perf_counter()
+        if recorte:
+            motivo = self._motivo_rechazo(img, detectar_rostro=False)
+        else:
+            motivo = self._motivo_rechazo(self._reducir(img))
+        with self._lock:
+            self.contadores[motivo or "aceptadas"] += 1
+            self._ms_total += (time.perf_counter() - inicio) * 1000
+        return motivo
+
+    def estadisticas(self):
+        with self._lock:
+            datos = dict(self.contadores)
+            evaluadas = sum(datos.values())
+            datos["ms_promedio"] = round(self._ms_total / evaluadas, 3) if evaluadas else None
+        return datos
@@ -0,0 +1,377 @@
+# face_index.py
+import random
+import threading
+from contextlib import contextmanager
+import cv2
+import numpy as np
+
+# ==========================================
+# 🧠 ÍNDICE FACIAL EN MEMORIA (1:N)
+# ==========================================
+FACE_THRESHOLD = 0.6
+MODOS_CUANTIZACION = (None, "float16", "int8")
+
+
+def cuantizar(vec, modo):
+    """Forma compacta de un vector normalizado: (códigos, escala)"""
+    if modo == "float16":
+        return vec.astype("float16"), 1.0
+    if modo == "int8":
+        # Escala por vector: el mayor valor absoluto se mapea a 127
+        escala = float(np.max(np.abs(vec))) / 127.0 or 1.0
+        return np.clip(np.rint(vec / escala), -127, 127).astype("int8"), escala
+    return vec, 1.0
+
+
+def firma_baja_resolucion(vec, lado):
+    """Firma lado x lado (normalizada) del recorte 100x100 que codifica la plantilla"""
+    vec = np.asarray(vec, dtype="float32").ravel()
+    original = int(round(np.sqrt(vec.shape[0])))
+    if original * original != vec.shape[0]:
+        return None  # plantilla proyectada (PCA): no es una imagen
+    firma = cv2.resize(vec.reshape(original, original), (lado, lado), interpolation=cv2.INTER_AREA).ravel()
+    firma -= firma.mean()
+    norma = np.linalg.norm(firma)
+    return firma / norma if norma else None
+
+
+class CandadoLectoresEscritor:
+    """Candado reentrante para escritores con lectura compartida
+
+    `with candado:` es exclusivo (como un RLock); `with candado.lectura():`
+    deja correr varias búsquedas a la vez. Un escritor en espera tiene
+    prioridad sobre lectores nuevos para que las altas no se posterguen.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._lectores = 0
+        self._escritor = None
+        self._profundidad = 0
+        self._esperando = 0
+
+    def acquire(self):
+        yo = threading.get_ident()
+        with self._cond:
+            if self._escritor == yo:
+                self._profundidad += 1
+                return True
+            self._esperando += 1
+            while self._escritor is not None or self._lectores:
+                self._cond.wait()
+            self._esperando -= 1
+            self._escritor = yo
+            self._profundidad = 1
+        return True
+
+    def release(self):
+        with self._cond:
+            self._profundidad -= 1
+            if self._profundidad == 0:
+                self._escritor = None
+                self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    @contextmanager
+    def lectura(self):
+        yo = threading.get_ident()
+        with self._cond:
+            # El escritor puede leer dentro de su propia sección
+            if self._escritor != yo:
+                while self._escritor is not None or self._esperando:
+                    self._cond.wait()
+            self._lectores += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._lectores -= 1
+                if not self._lectores:
+                    self._cond.notify_all()
+
+
+class FaceIndex:
+    """Matriz contigua con todas las plantillas faciales y sus correos.
+
+    Con `cuantizacion` ("float16" o "int8") las filas se guardan en forma
+    compacta y solo los mejores `rerank` candidatos se vuelven a puntuar con
+    la plantilla float32 completa que devuelve `cargar_completa(correo)`.
+
+    Con `cascada` (lado de la firma, p. ej. 16) cada fila guarda además una
+    firma de baja resolución; solo las filas cuya similitud gruesa supera
+    `umbral_cascada` pasan a la comparación completa. Una fracción
+    `muestreo_cascada` de las consultas se audita contra la búsqueda exhaustiva
+    para contar cuántas veces la coincidencia verdadera habría sido podada.
+    """
+
+    def __init__(self, dim=None, capacidad_inicial=64, ivf=None, ivf_min_usuarios=0,
+                 cuantizacion=None, cargar_completa=None, rerank=10, bloque=8192,
+                 cascada=None, umbral_cascada=0.3, muestreo_cascada=0.0):
+        if cuantizacion not in MODOS_CUANTIZACION:
+            raise ValueError(f"Cuantización no soportada: {cuantizacion}")
+        # Escrituras exclusivas; las búsquedas 1:N del pool biométrico corren en paralelo
+        self._lock = CandadoLectoresEscritor()
+        self._lock_contadores = threading.Lock()
+        self.dim = dim
+        self._capacidad_inicial = capacidad_inicial
+        self._matriz = None
+        self._escalas = None
+        self._listas = None
+        self._correos = []
+        self._posiciones = {}
+        # Índice aproximado opcional (ver face_ann.IVFCoarse)
+        self.ivf = ivf
+        self.ivf_min_usuarios = ivf_min_usuarios
+        # Almacenamiento compacto opcional + re-ranqueo a precisión completa
+        self.cuantizacion = cuantizacion
+        self.cargar_completa = cargar_completa
+        self.rerank = rerank
+        self.bloque = bloque
+        # Cascada grueso-a-fino opcional
+        self.cascada = cascada
+        self.umbral_cascada = umbral_cascada
+        self.muestreo_cascada = muestreo_cascada
+        self._firmas = None
+        self.contadores_cascada = {"consultas": 0, "filas_evaluadas": 0, "filas_podadas": 0,
+                                   "auditadas": 0, "auditadas_con_coincidencia": 0,
+                                   "coincidencias_podadas": 0}
+
+    def __len__(self):
+        return len(self._correos)
+
+    def __contains__(self, correo):
+        return correo in self._posiciones
+
+    @property
+    def dtype(self):
+        return {"float16": "float16", "int8": "int8"}.get(self.cuantizacion, "float32")
+
+    @property
+    def bytes_por_plantilla(self):
+        return (self.dim or 0) * np.dtype(self.dtype).itemsize
+
+    @staticmethod
+    def _normalizar(vec):
+        vec = np.asarray(vec, dtype="float32").ravel()
+        norma = np.linalg.norm(vec)
+        if norma == 0:
+            return None
+        return vec / norma
+
+    def _reservar(self, n):
+        """Asegura capacidad para n filas duplicando el buffer (amortizado O(1))"""
+        if self._matriz is None:
+            cap = max(self._capacidad_inicial, n)
+            self._matriz = np.zeros((cap, self.dim), dtype=self.dtype)
+            self._escalas = np.ones(cap, dtype="float32")
+            self._listas = np.zeros(cap, dtype="int32")
+            if self.cascada:
+                self._firmas = np.zeros((cap, self.cascada * self.cascada), dtype="float32")
+            return
+        if n <= self._matriz.shape[0]:
+            return
+        cap = max(n, self._matriz.shape[0] * 2)
+        usados = len(self._correos)
+        nueva = np.zeros((cap, self.dim), dtype=self.dtype)
+        nueva[:usados] = self._matriz[:usados]
+        escalas = np.ones(cap, dtype="float32")
+        escalas[:usados] = self._escalas[:usados]
+        listas = np.zeros(cap, dtype="int32")
+        listas[:usados] = self._listas[:usados]
+        self._matriz = nueva
+        self._escalas = escalas
+        self._listas = listas
+        if self._firmas is not None:
+            firmas = np.zeros((cap, self._firmas.shape[1]), dtype="float32")
+            firmas[:usados] = self._firmas[:usados]
+            self._firmas = firmas
+
+    def _puntuar(self, vec, filas=None):
+        """Producto matriz-vector sobre las filas indicadas (todas si None)"""
+        n = len(self._correos)
+        if self.cuantizacion is None:
+            if filas is None:
+                return self._matriz[:n] @ vec
+            return self._matriz[filas] @ vec
+        # Forma compacta: se convierte por bloques para acotar la memoria temporal
+        total = n if filas is None else len(filas)
+        scores = np.empty(total, dtype="float32")
+        for i in range(0, total, self.bloque):
+            fin = min(total, i + self.bloque)
+            sel = slice(i, fin) if filas is None else filas[i:fin]
+            scores[i:fin] = (self._matriz[sel].astype("float32") @ vec) * self._escalas[sel]
+        return scores
+
+    def _filas_float32(self, desde, hasta):
+        bloque = self._matriz[desde:hasta].astype("float32")
+        return bloque * self._escalas[desde:hasta, None]
+
+    def cargar(self, plantillas):
+        """Reemplaza el contenido con un iterable de (correo, plantilla)"""
+        with self._lock:
+            self._matriz = None
+            self._firmas = None
+            self._correos = []
+            self._posiciones = {}
+            for correo, tpl in plantillas:
+                self.agregar(correo, tpl)
+        return len(self)
+
+    def agregar(self, correo, plantilla):
+        """Inserta o reemplaza la plantilla de un usuario"""
+        vec = self._normalizar(plantilla)
+        if vec is None:
+            return False
+        with self._lock:
+            if self.dim is None:
+                self.dim = vec.shape[0]
+                if self.cascada and firma_baja_resolucion(vec, self.cascada) is None:
+                    print(f"⚠️  Plantillas de {self.dim} valores no son imágenes: cascada desactivada")
+                    self.cascada = None
+            if vec.shape[0] != self.dim:
+                print(f"⚠️  Plantilla de {correo} con dimensión {vec.shape[0]} (esperada {self.dim}), se omite")
+                return False
+            fila = self._posiciones.get(correo)
+            if fila is None:
+                fila = len(self._correos)
+                self._reservar(fila + 1)
+                self._correos.append(correo)
+                self._posiciones[correo] = fila
+            self._matriz[fila], self._escalas[fila] = cuantizar(vec, self.cuantizacion)
+            if self.ivf is not None:
+                self._listas[fila] = self.ivf.asignar(vec)[0]
+            if self._firmas is not None:
+                self._firmas[fila] = firma_baja_resolucion(vec, self.cascada)
+        return True
+
+    def configurar_ivf(self, ivf, ivf_min_usuarios=None):
+        """Activa (o desactiva con None) el índice IVF y reasigna todas las filas"""
+        with self._lock:
+            if ivf is not None and self.dim is not None and ivf.dim != self.dim:
+                print(f"⚠️  Índice IVF con dimensión {ivf.dim} incompatible con {self.dim}, se ignora")
+                return False
+            self.ivf = ivf
+            if ivf_min_usuarios is not None:
+                self.ivf_min_usuarios = ivf_min_usuarios
+            n = len(self._correos)
+            if ivf is not None and n:
+                for i in range(0, n, self.bloque):
+                    fin = min(n, i + self.bloque)
+                    self._listas[i:fin] = ivf.asignar(self._filas_float32(i, fin))
+        return True
+
+    def eliminar(self, correo):
+        """Quita un usuario moviendo la última fila a su posición"""
+        with self._lock:
+            fila = self._posiciones.pop(correo, None)
+            if fila is None:
+                return False
+            ultima = len(self._correos) - 1
+            if fila != ultima:
+                self._matriz[fila] = self._matriz[ultima]
+                self._escalas[fila] = self._escalas[ultima]
+                self._listas[fila] = self._listas[ultima]
+                if self._firmas is not None:
+                    self._firmas[fila] = self._firmas[ultima]
+                movido = self._correos[ultima]
+                self._correos[fila] = movido
+                self._posiciones[movido] = fila
+            self._correos.pop()
+        return True
+
+    def _reranquear(self, vec, candidatos):
+        """Vuelve a puntuar los candidatos con la plantilla float32 completa"""
+        if self.cargar_completa is None:
+            return candidatos
+        exactos = []
+        for correo, score in candidatos:
+            completa = self.cargar_completa(correo)
+            if completa is not None:
+                completa = self._normalizar(completa)
+            if completa is not None and completa.shape[0] == vec.shape[0]:
+                score = float(completa @ vec)
+            exactos.append((correo, score))
+        exactos.sort(key=lambda c: c[1], reverse=True)
+        return exactos
+
+    def _podar_cascada(self, vec, filas, n):
+        """Etapa gruesa: filas cuya firma de baja resolución supera el umbral laxo"""
+        firma = firma_baja_resolucion(vec, self.cascada)
+        evaluadas = np.arange(n) if filas is None else filas
+        gruesos = (self._firmas[:n] if filas is None else self._firmas[filas]) @ firma
+        sobreviven = evaluadas[gruesos >= self.umbral_cascada]
+
+        auditoria = {}
+        if self.muestreo_cascada and random.random() < self.muestreo_cascada:
+            # Auditoría: ¿la mejor fila exhaustiva (si coincide) quedó fuera?
+            completos = self._puntuar(vec, filas)
+            mejor = int(np.argmax(completos))
+            auditoria["auditadas"] = 1
+            if completos[mejor] > FACE_THRESHOLD:
+                auditoria["auditadas_con_coincidencia"] = 1
+                if not np.any(sobreviven == evaluadas[mejor]):
+                    auditoria["coincidencias_podadas"] = 1
+        # Varias búsquedas comparten el candado de lectura: los contadores tienen el suyo
+        with self._lock_contadores:
+            c = self.contadores_cascada
+            c["consultas"] += 1
+            c["filas_evaluadas"] += len(evaluadas)
+            c["filas_podadas"] += len(evaluadas) - len(sobreviven)
+            for campo, valor in auditoria.items():
+                c[campo] += valor
+        return sobreviven
+
+    def estadisticas_cascada(self):
+        with self._lock_contadores:
+            c = dict(self.contadores_cascada)
+        c["lado"] = self.cascada
+        c["umbral"] = self.umbral_cascada
+        c["tasa_poda"] = round(c["filas_podadas"] / c["filas_evaluadas"], 4) if c["filas_evaluadas"] else None
+        c["tasa_coincidencias_podadas"] = (round(c["coincidencias_podadas"] / c["auditadas_con_coincidencia"], 4)
+                                          if c["auditadas_con_coincidencia"] else None)
+        return c
+
+    def buscar(self, plantilla, k=5, nprobe=None):
+        """Devuelve [(correo, similitud)] ordenado con los k más parecidos"""
+        vec = self._normalizar(plantilla)
+        with self._lock.lectura():
+            n = len(self._correos)
+            if vec is None or n == 0 or vec.shape[0] != self.dim:
+                return []
+            if self.ivf is not None and n >= self.ivf_min_usuarios:
+                # Lista corta de las nprobe listas más cercanas, re-ranqueada exacta
+                listas = self.ivf.sondear(vec, nprobe)
+                filas = np.flatnonzero(np.isin(self._listas[:n], listas))
+            else:
+                filas = None
+            if self._firmas is not None:
+                filas = self._podar_cascada(vec, filas, n)
+            # Un solo producto matriz-vector: las filas ya están normalizadas
+            scores = self._puntuar(vec, filas)
+            correos = list(self._correos)
+        if len(scores) == 0:
+            return []
+        k_gruesa = max(k, self.rerank) if self.cuantizacion else k
+        k_gruesa = min(k_gruesa, len(scores))
+        top = np.argpartition(-scores, k_gruesa - 1)[:k_gruesa]
+        top = top[np.argsort(-scores[top])]
+        if filas is not None:
+            candidatos = [(correos[filas[i]], float(scores[i])) for i in top]
+        else:
+            candidatos = [(correos[i], float(scores[i])) for i in top]
+        if self.cuantizacion:
+            candidatos = self._reranquear(vec, candidatos)
+        return candidatos[:k]
+
+    def identificar(self, plantilla, threshold=FACE_THRESHOLD, k=5, nprobe=None):
+        """Top-1 si supera el umbral, junto con los k candidatos evaluados"""
+        candidatos = self.buscar(plantilla, k=k, nprobe=nprobe)
+        if candidatos and candidatos[0][1] > threshold:
+            return candidatos[0], candidatos
+        return None, candidatos
@@ -0,0 +1,67 @@
+# face_muestras.py
+import os
+import numpy as np
+
+# ==========================================
+# 👥 VARIAS MUESTRAS DE ENROLAMIENTO POR USUARIO
+# ==========================================
+# Cada usuario guarda hasta `maximo` ejemplares (capturas en distintas
+# condiciones de luz) y un centroide normalizado. El índice 1:N solo tiene el
+# centroide, así que identificar cuesta una comparación por usuario; los
+# ejemplares se consultan únicamente para los pocos candidatos que el
+# centroide deja por debajo del umbral.
+#
+# Los ejemplares dependen del preprocesado, así que también se guardan los
+# recortes de los que salió cada uno: face_ejemplares.recortes tiene una línea
+# "clave#n<TAB>ruta1<TAB>ruta2..." por muestra guardada (manda la última de
+# cada ejemplar) y reenrolamiento.py los vuelve a derivar con la versión nueva.
+
+ARCHIVO_RECORTES = "face_ejemplares.recortes"
+
+
+def _normalizar(vec):
+    vec = np.asarray(vec, dtype="float32").ravel()
+    return vec / (np.linalg.norm(vec) + 1e-9)
+
+
+def centroide(ejemplares):
+    """Media normalizada de los ejemplares"""
+    return _normalizar(np.mean([_normalizar(e) for e in ejemplares], axis=0))
+
+
+def posicion_para_muestra(ejemplares, nueva, maximo):
+    """Dónde guardar la muestra nueva: al final o sobre el ejemplar más parecido
+
+    Con el cupo lleno se reemplaza el ejemplar más redundante respecto a la
+    muestra nueva, para que el conjunto conserve la mayor variedad posible.
+    """
+    if len(ejemplares) < maximo:
+        return len(ejemplares)
+    similitudes = np.stack([_normalizar(e) for e in ejemplares]) @ _normalizar(nueva)
+    return int(np.argmax(similitudes))
+
+
+def registrar_recortes(carpeta, clave, rutas):
+    """Anota los recortes de origen del ejemplar `clave` ("<usuario>#<n>")"""
+    with open(os.path.join(carpeta, ARCHIVO_RECORTES), "a", encoding="utf-8") as f:
+        f.write("\t".join([clave, *rutas]) + "\n")
+
+
+def leer_recortes(carpeta):
+    """{clave del ejemplar: (rutas de sus recortes)} según el último registro de cada uno"""
+    recortes = {}
+    path = os.path.join(carpeta, ARCHIVO_RECORTES)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for linea in f:
+                if linea.endswith("\n") and "\t" in linea:
+                    clave, *rutas = linea.rstrip("\n").split("\t")
+                    recortes[clave] = tuple(rutas)
+    return recortes
+
+
+def mejor_similitud(ejemplares, plantilla):
+    """Similitud coseno más alta entre la plantilla y los ejemplares"""
+    if not ejemplares:
+        return 0.0
+    return float(np.max(np.stack([_normalizar(e) for e in ejemplares]) @ _normalizar(plantilla)))
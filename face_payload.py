@@ -0,0 +1,66 @@
+# face_payload.py
+import struct
+import zlib
+import numpy as np
+
+# ==========================================
+# 📦 RECORTE FACIAL BINARIO ENVIADO POR EL NAVEGADOR
+# ==========================================
+# En lugar de un JPEG completo, el login puede enviar el rostro ya recortado
+# en escala de grises (100x100 uint8 = 10 KB) con esta cabecera little-endian:
+#
+#   magia  "FCRP"   4 bytes
+#   versión         uint8   (1)
+#   dtype           uint8   (1 = uint8, 2 = float32 en rango 0-255)
+#   alto, ancho     uint16, uint16
+#   crc32           uint32  (de los datos que siguen)
+#   datos           alto * ancho * tamaño del dtype
+#
+# El recorte entra directo al preprocesado (ecualización, tamaño, suavizado)
+# sin decodificar ni convertir color.
+
+MAGIA = b"FCRP"
+VERSION = 1
+DTYPES = {1: np.dtype("uint8"), 2: np.dtype("<f4")}
+CABECERA = struct.Struct("<4sBBHHI")
+LADO_MAXIMO = 256
+
+
+class RecorteInvalido(ValueError):
+    """El cuerpo no es un recorte facial válido"""
+
+
+def empaquetar_recorte(gray):
+    """Bytes del formato anterior para un arreglo 2D uint8 o float32"""
+    gray = np.ascontiguousarray(gray)
+    codigo = next((c for c, dt in DTYPES.items() if dt == gray.dtype), None)
+    if gray.ndim != 2 or codigo is None:
+        raise RecorteInvalido("Se espera un arreglo 2D uint8 o float32")
+    datos = gray.astype(DTYPES[codigo]).tobytes()
+    alto, ancho = gray.shape
+    return CABECERA.pack(MAGIA, VERSION, codigo, alto, ancho, zlib.crc32(datos)) + datos
+
+
+def desempaquetar_recorte(cuerpo):
+    """Arreglo 2D uint8 listo para preprocesar_rostro; RecorteInvalido si no cuadra"""
+    if len(cuerpo) < CABECERA.size:
+        raise RecorteInvalido("Cabecera incompleta")
+    magia, version, codigo, alto, ancho, crc = CABECERA.unpack_from(cuerpo)
+    if magia != MAGIA or version != VERSION:
+        raise RecorteInvalido("Formato o versión desconocidos")
+    dtype = DTYPES.get(codigo)
+    if dtype is None:
+        raise RecorteInvalido(f"dtype {codigo} no soportado")
+    if not (0 < alto <= LADO_MAXIMO and 0 < ancho <= LADO_MAXIMO):
+        raise RecorteInvalido(f"Dimensiones {alto}x{ancho} fuera de rango")
+    datos = memoryview(cuerpo)[CABECERA.size:]
+    if len(datos) != alto * ancho * dtype.itemsize:
+        raise RecorteInvalido("Longitud de datos distinta a la declarada")
+    if zlib.crc32(datos) != crc:
+        raise RecorteInvalido("Checksum inválido")
+    gray = np.frombuffer(datos, dtype=dtype).reshape(alto, ancho)
+    if dtype != np.uint8:
+        if not np.isfinite(gray).all():
+            raise RecorteInvalido("Valores NaN o infinitos en el recorte")
+        return np.clip(gray, 0, 255).astype("uint8")
+    return gray.copy()
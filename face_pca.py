@@ -0,0 +1,166 @@
+# face_pca.py
+import os
+import glob
+import hashlib
+import numpy as np
+
+from face_preproceso import FACE_TEMPLATE_VERSION, VERSION_INICIAL, nombre_store_facial
+
+# ==========================================
+# 🧬 PROYECCIÓN PCA (EIGENFACES) DE PLANTILLAS
+# ==========================================
+# Las plantillas originales (100x100 = 10.000 valores) siguen guardándose en
+# el almacén de la versión de preprocesado activa (ver face_preproceso.py).
+# Las proyectadas se guardan en un almacén por versión de preprocesado y de
+# proyección ("face_templates[_<preprocesado>]_<version>"), para que al
+# reentrenar la PCA las plantillas viejas y nuevas puedan convivir. Una PCA
+# entrenada con otro preprocesado que el activo no se usa (ver app.py).
+#
+# El umbral de similitud (FACE_THRESHOLD) se calibró en el espacio original.
+# Con pocas muestras la PCA queda con muy pocas dimensiones y dos rostros
+# cualesquiera pasan el umbral, así que se exige MUESTRAS_POR_COMPONENTE
+# muestras por componente y, antes de publicar, que la tasa de impostores
+# sobre el umbral en recortes no usados al entrenar no empeore.
+
+MUESTRAS_POR_COMPONENTE = 2
+
+
+class ProyeccionPCA:
+    """Media + componentes principales para pasar de 10.000 a ~128 dimensiones"""
+
+    def __init__(self, media, componentes, preproceso=VERSION_INICIAL):
+        self.media = np.ascontiguousarray(media, dtype="float32")
+        self.componentes = np.ascontiguousarray(componentes, dtype="float32")
+        # Versión de face_preproceso de los recortes con que se entrenó
+        self.preproceso = preproceso
+        huella = hashlib.sha1(preproceso.encode("utf-8") + self.media.tobytes() +
+                              self.componentes.tobytes()).hexdigest()[:8]
+        self.version = f"pca{self.n_componentes}_{huella}"
+
+    @property
+    def n_componentes(self):
+        return self.componentes.shape[0]
+
+    @property
+    def dim_original(self):
+        return self.componentes.shape[1]
+
+    @classmethod
+    def entrenar(cls, matriz, n_componentes=128, preproceso=FACE_TEMPLATE_VERSION):
+        """Ajusta la PCA con SVD económica sobre las plantillas originales
+
+        ValueError si hay menos de MUESTRAS_POR_COMPONENTE * n_componentes
+        plantillas: nunca se entrega un espacio más chico que el pedido.
+        """
+        matriz = np.asarray(matriz, dtype="float32")
+        minimo = MUESTRAS_POR_COMPONENTE * n_componentes
+        if matriz.shape[0] < minimo or n_componentes > matriz.shape[1]:
+            raise ValueError(f"Se necesitan al menos {minimo} plantillas para {n_componentes} componentes "
+                             f"(hay {matriz.shape[0]})")
+        media = matriz.mean(axis=0)
+        centrada = matriz - media
+        # Con N imágenes << 10.000 píxeles la SVD económica es N x N
+        _, valores, vt = np.linalg.svd(centrada, full_matrices=False)
+        varianza = valores ** 2
+        explicada = float(varianza[:n_componentes].sum() / (varianza.sum() + 1e-12))
+        print(f"🧬 PCA entrenada: {n_componentes} componentes, {explicada:.1%} de varianza explicada")
+        return cls(media, vt[:n_componentes], preproceso)
+
+    def proyectar(self, vec):
+        """Plantilla reducida y normalizada (lista para similitud coseno)"""
+        vec = np.asarray(vec, dtype="float32").ravel()
+        if vec.shape[0] != self.dim_original:
+            return None
+        reducida = self.componentes @ (vec - self.media)
+        return reducida / (np.linalg.norm(reducida) + 1e-9)
+
+    def proyectar_lote(self, matriz):
+        reducida = (np.asarray(matriz, dtype="float32") - self.media) @ self.componentes.T
+        return reducida / (np.linalg.norm(reducida, axis=1, keepdims=True) + 1e-9)
+
+    def verificar_umbral(self, matriz, umbral):
+        """(tasa original, tasa PCA) de pares de plantillas distintas con similitud > umbral
+
+        Cada fila debe ser una persona distinta (un recorte de registro por usuario).
+        """
+        return tasa_impostores(matriz, umbral), tasa_impostores(self.proyectar_lote(matriz), umbral)
+
+    def nombre_store(self):
+        return f"{nombre_store_facial(self.preproceso)}_{self.version}"
+
+    def guardar(self, path):
+        """Escritura atómica de la proyección en formato .npz"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, media=self.media, componentes=self.componentes, preproceso=self.preproceso)
+        os.replace(tmp, path)
+        print(f"✅ Proyección PCA {self.version} guardada: {path}")
+
+    @classmethod
+    def cargar(cls, path):
+        try:
+            with np.load(path) as datos:
+                # Las proyecciones guardadas antes de versionar el preprocesado son de v1
+                preproceso = str(datos["preproceso"]) if "preproceso" in datos.files else VERSION_INICIAL
+                return cls(datos["media"], datos["componentes"], preproceso)
+        except Exception as e:
+            print(f"❌ Error cargando proyección PCA: {e}")
+            return None
+
+
+def tasa_impostores(matriz, umbral):
+    """Fracción de pares (i < j) de filas cuya similitud coseno supera el umbral"""
+    matriz = np.asarray(matriz, dtype="float32")
+    n = matriz.shape[0]
+    if n < 2:
+        return 0.0
+    normalizada = matriz / (np.linalg.norm(matriz, axis=1, keepdims=True) + 1e-9)
+    similitudes = (normalizada @ normalizada.T)[np.triu_indices(n, k=1)]
+    return float(np.mean(similitudes > umbral))
+
+
+# ==========================================
+# 🛠️ ENTRENAMIENTO DESDE LÍNEA DE COMANDOS
+# ==========================================
+if __name__ == "__main__":
+    import argparse
+    import config
+    from app import BIOMETRIC_FOLDER, FACE_PCA_PATH, build_face_template_from_image
+    from face_index import FACE_THRESHOLD
+
+    parser = argparse.ArgumentParser(description="Entrena la proyección PCA de plantillas faciales")
+    parser.add_argument("--componentes", type=int, default=getattr(config, "FACE_PCA_COMPONENTES", 128))
+    parser.add_argument("--carpeta", action="append", default=[BIOMETRIC_FOLDER],
+                        help="Carpeta con recortes register_*.jpg (se puede repetir)")
+    parser.add_argument("--salida", default=FACE_PCA_PATH)
+    parser.add_argument("--validacion", type=float, default=0.2,
+                        help="Fracción de recortes apartados para medir impostores sobre el umbral")
+    parser.add_argument("--max-impostores", type=float, default=getattr(config, "FACE_PCA_MAX_IMPOSTORES", 0.001),
+                        help="Aumento máximo tolerado de la tasa de impostores sobre FACE_THRESHOLD")
+    args = parser.parse_args()
+
+    imagenes = sorted(set(p for c in args.carpeta for p in glob.glob(os.path.join(c, "register_*.jpg"))))
+    plantillas = [build_face_template_from_image(p) for p in imagenes]
+    plantillas = [p for p in plantillas if p is not None]
+    apartados = int(len(plantillas) * args.validacion)
+    minimo = MUESTRAS_POR_COMPONENTE * args.componentes
+    if len(plantillas) - apartados < minimo or apartados < 2:
+        print(f"⚠️  Se necesitan al menos {minimo} recortes register_*.jpg para entrenar y "
+              f"{args.validacion:.0%} más para validar {args.componentes} componentes (hay {len(plantillas)})")
+        raise SystemExit(1)
+
+    print(f"📷 {len(plantillas)} recortes de registro cargados")
+    matriz = np.stack(plantillas)
+    orden = np.random.default_rng(0).permutation(len(matriz))
+    prueba = ProyeccionPCA.entrenar(matriz[orden[apartados:]], n_componentes=args.componentes)
+    original, reducida = prueba.verificar_umbral(matriz[orden[:apartados]], FACE_THRESHOLD)
+    print(f"🕵️  Impostores sobre {FACE_THRESHOLD} en recortes apartados: {original:.3%} original, "
+          f"{reducida:.3%} con PCA")
+    if reducida > original + args.max_impostores:
+        print(f"❌ La PCA aumenta los impostores que pasan el umbral: no se publica "
+              f"(usa más recortes o menos --componentes)")
+        raise SystemExit(1)
+
+    pca = ProyeccionPCA.entrenar(matriz, n_componentes=args.componentes)
+    pca.guardar(args.salida)
+    print(f"💡 Activa FACE_PCA_ACTIVO en config.py; las plantillas sin proyectar se proyectan al cargarlas")
@@ -0,0 +1,62 @@
+# face_preproceso.py
+import os
+import cv2
+import numpy as np
+
+# ==========================================
+# 🧼 PREPROCESADO FACIAL ÚNICO (REGISTRO Y LOGIN)
+# ==========================================
+# v1: el registro redimensionaba antes de ecualizar y no suavizaba, mientras
+#     que el login ecualizaba, redimensionaba y aplicaba GaussianBlur.
+# v2: registro y login usan exactamente preprocesar_rostro().
+#
+# Cada versión vive en su propio almacén ("face_templates" para v1,
+# "face_templates_<version>" para las siguientes). El archivo
+# face_templates.version indica cuál usa la app; se cambia de forma atómica
+# al terminar el re-enrolamiento (python reenrolamiento.py).
+FACE_TEMPLATE_VERSION = "v2"
+VERSION_INICIAL = "v1"
+ARCHIVO_VERSION = "face_templates.version"
+
+
+def preprocesar_rostro(img, size=(100, 100)):
+    """Vector normalizado de un recorte BGR (o gris): ecualizar, redimensionar, suavizar"""
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    # Mejorar contraste
+    gray = cv2.equalizeHist(gray)
+
+    # Redimensionar a tamaño estándar
+    gray = cv2.resize(gray, size)
+
+    # Aplicar filtro Gaussiano para reducir ruido
+    gray = cv2.GaussianBlur(gray, (3, 3), 0)
+
+    # Convertir a vector y normalizar
+    vec = gray.astype("float32").flatten()
+    vec = (vec - np.mean(vec)) / (np.std(vec) + 1e-9)
+    return vec / (np.linalg.norm(vec) + 1e-9)
+
+
+def nombre_store_facial(version):
+    return "face_templates" if version == VERSION_INICIAL else f"face_templates_{version}"
+
+
+def version_activa(carpeta):
+    """Versión de plantillas que usa la app (v1 si nunca se re-enroló)"""
+    try:
+        with open(os.path.join(carpeta, ARCHIVO_VERSION), encoding="utf-8") as f:
+            return f.read().strip() or VERSION_INICIAL
+    except FileNotFoundError:
+        return VERSION_INICIAL
+
+
+def publicar_version(carpeta, version):
+    """Cambia la versión activa con un solo os.replace"""
+    path = os.path.join(carpeta, ARCHIVO_VERSION)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(f"{version}\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
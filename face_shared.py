@@ -0,0 +1,343 @@
+# face_shared.py
+import os
+import zlib
+from contextlib import contextmanager
+import numpy as np
+
+from face_index import FaceIndex, cuantizar
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo hay un proceso escritor posible
+    fcntl = None
+
+# ==========================================
+# 🤝 ÍNDICE FACIAL COMPARTIDO ENTRE WORKERS (np.memmap)
+# ==========================================
+# Con varios workers de Gunicorn/uWSGI cada proceso tendría su propia copia de
+# la matriz de plantillas. Aquí la matriz vive en un archivo mapeado en memoria
+# que todos los procesos abren en solo lectura, así que el sistema operativo
+# mantiene una única copia en la caché de páginas.
+#
+# Archivos (en la carpeta de plantillas):
+#   <nombre>.meta          -> 8 enteros int64 (ver META_*), mapeados por todos
+#   <nombre>.<seg>.seg     -> matriz (cap, dim) + escalas float32 + listas IVF int32
+#   <nombre>.<seg>.claves  -> un correo por línea, en el orden de las filas
+#   <nombre>.lock          -> candado fcntl de los escritores
+#
+# La generación funciona como un seqlock: el escritor la deja impar mientras
+# modifica la cabecera o reescribe filas ya visibles, y par al terminar. Los
+# lectores comparan un entero antes y después de cada consulta: si cambió,
+# leen las claves nuevas o se vuelven a mapear y repiten la consulta.
+
+MAGIA = 0x46414345534547  # "FACESEG"
+VERSION = 1
+META_MAGIA, META_VERSION, META_GEN, META_N, META_CAP, META_SEG, META_DIM, META_IVF = range(8)
+REINTENTOS_LECTURA = 5
+CAMPOS_META = {"n": META_N, "cap": META_CAP, "seg": META_SEG, "dim": META_DIM, "ivf": META_IVF}
+
+
+class FaceIndexCompartido(FaceIndex):
+    """FaceIndex cuyas filas están en un segmento mapeado compartido entre procesos"""
+
+    def __init__(self, carpeta, nombre="face_index", capacidad_inicial=1024, **kwargs):
+        super().__init__(capacidad_inicial=capacidad_inicial, **kwargs)
+        self.carpeta = carpeta
+        self.nombre = f"{nombre}_{self.dtype}"
+        self.meta_path = os.path.join(carpeta, f"{self.nombre}.meta")
+        self.lock_path = os.path.join(carpeta, f"{self.nombre}.lock")
+        self._meta = None
+        self._gen_visto = -1
+        self._seg_visto = -1
+        self._claves_offset = 0
+        self._ivf_firma = 0
+        self._escritura = None
+        self._profundidad = 0
+        self._vistas_rw = None
+        self._seg_rw = -1
+        os.makedirs(carpeta, exist_ok=True)
+
+    # ---------- rutas ----------
+    def _seg_path(self, seg):
+        return os.path.join(self.carpeta, f"{self.nombre}.{seg}.seg")
+
+    def _claves_path(self, seg):
+        return os.path.join(self.carpeta, f"{self.nombre}.{seg}.claves")
+
+    def _mapear(self, seg, cap, dim, modo="r"):
+        """Vistas (matriz, escalas, listas) sobre el archivo del segmento"""
+        path = self._seg_path(seg)
+        itemsize = np.dtype(self.dtype).itemsize
+        if modo == "w+":
+            # Un solo archivo con las tres vistas: se reserva completo antes de mapear
+            with open(path, "wb") as f:
+                f.truncate(cap * (dim * itemsize + 8))
+            modo = "r+"
+        matriz = np.memmap(path, dtype=self.dtype, mode=modo, shape=(cap, dim))
+        escalas = np.memmap(path, dtype="float32", mode=modo, shape=(cap,), offset=cap * dim * itemsize)
+        listas = np.memmap(path, dtype="int32", mode=modo, shape=(cap,),
+                           offset=cap * dim * itemsize + cap * 4)
+        return matriz, escalas, listas
+
+    @property
+    def generacion(self):
+        return self._gen_visto
+
+    # ---------- escritura (un proceso a la vez) ----------
+    @contextmanager
+    def escritura(self):
+        """Candado exclusivo entre procesos (reentrante dentro del proceso)"""
+        with self._lock:
+            if self._profundidad == 0 and fcntl is not None:
+                self._escritura = open(self.lock_path, "a+b")
+                fcntl.flock(self._escritura.fileno(), fcntl.LOCK_EX)
+            self._profundidad += 1
+            try:
+                yield
+            finally:
+                self._profundidad -= 1
+                if self._profundidad == 0 and self._escritura is not None:
+                    fcntl.flock(self._escritura.fileno(), fcntl.LOCK_UN)
+                    self._escritura.close()
+                    self._escritura = None
+
+    @contextmanager
+    def _ciclo_generacion(self, **campos):
+        """Generación impar durante el bloque; al salir, cabecera nueva y generación par"""
+        meta = np.memmap(self.meta_path, dtype="int64", mode="r+", shape=(8,))
+        gen = int(meta[META_GEN])
+        meta[META_GEN] = gen + 1
+        try:
+            yield
+        finally:
+            for campo, valor in campos.items():
+                meta[CAMPOS_META[campo]] = valor
+            meta[META_GEN] = gen + 2
+            meta.flush()
+            del meta
+
+    def _publicar_meta(self, **campos):
+        """Actualiza la cabecera dentro de un ciclo impar/par de la generación"""
+        with self._ciclo_generacion(**campos):
+            pass
+
+    def _escribir_segmento(self, matriz, escalas, listas, correos, dim, cap, ivf_firma=0):
+        """Crea un segmento nuevo completo y lo publica con un solo cambio de cabecera"""
+        seg_anterior = self._seg_visto
+        seg = seg_anterior + 1 if seg_anterior >= 0 else 0
+        if os.path.exists(self.meta_path):
+            meta = np.memmap(self.meta_path, dtype="int64", mode="r", shape=(8,))
+            seg = max(seg, int(meta[META_SEG]) + 1)
+            del meta
+        n = len(correos)
+        destino = self._mapear(seg, cap, dim, modo="w+")
+        for vista, origen in zip(destino, (matriz, escalas, listas)):
+            if n:
+                vista[:n] = origen[:n]
+            vista.flush()
+        with open(self._claves_path(seg), "wb") as f:
+            f.write("".join(f"{c}\n" for c in correos).encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        del destino
+
+        if not os.path.exists(self.meta_path):
+            tmp = f"{self.meta_path}.tmp"
+            np.array([MAGIA, VERSION, 0, 0, 0, -1, 0, 0], dtype="int64").tofile(tmp)
+            os.replace(tmp, self.meta_path)
+        self._publicar_meta(n=n, cap=cap, seg=seg, dim=dim, ivf=ivf_firma)
+        for viejo in (self._seg_path(seg_anterior), self._claves_path(seg_anterior)):
+            if seg_anterior >= 0 and seg_anterior != seg and os.path.exists(viejo):
+                # Los lectores que aún lo tienen mapeado siguen leyendo el inodo
+                os.remove(viejo)
+        self._sincronizar()
+
+    def _escribible(self):
+        """Vistas de escritura sobre el segmento vigente (solo bajo escritura())"""
+        if self._seg_rw != self._seg_visto:
+            self._vistas_rw = self._mapear(self._seg_visto, self._matriz.shape[0], self.dim, modo="r+")
+            self._seg_rw = self._seg_visto
+        return self._vistas_rw
+
+    # ---------- lectura ----------
+    def _leer_meta(self):
+        """Copia consistente de la cabecera (reintenta si hay un escritor a medias)"""
+        if self._meta is None:
+            if not os.path.exists(self.meta_path):
+                return None
+            self._meta = np.memmap(self.meta_path, dtype="int64", mode="r", shape=(8,))
+            if int(self._meta[META_MAGIA]) != MAGIA or int(self._meta[META_VERSION]) != VERSION:
+                raise ValueError(f"Segmento facial inválido: {self.meta_path}")
+        for _ in range(10000):
+            gen = int(self._meta[META_GEN])
+            if gen % 2:
+                continue
+            copia = np.array(self._meta)
+            if int(self._meta[META_GEN]) == gen:
+                return copia
+        # Un escritor murió a mitad de la cabecera: los campos son todos viejos o nuevos
+        return np.array(self._meta)
+
+    def _sincronizar(self):
+        """Adopta la generación publicada: claves nuevas o un segmento nuevo"""
+        meta = self._leer_meta()
+        if meta is None or int(meta[META_GEN]) == self._gen_visto:
+            return
+        with self._lock:
+            seg, n, cap, dim = (int(meta[i]) for i in (META_SEG, META_N, META_CAP, META_DIM))
+            if seg != self._seg_visto:
+                self.dim = dim
+                self._matriz, self._escalas, self._listas = self._mapear(seg, cap, dim)
+                self._correos = []
+                self._posiciones = {}
+                self._claves_offset = 0
+                self._seg_visto = seg
+            if len(self._correos) < n:
+                with open(self._claves_path(seg), "rb") as f:
+                    f.seek(self._claves_offset)
+                    while len(self._correos) < n:
+                        linea = f.readline()
+                        correo = linea.decode("utf-8").rstrip("\n")
+                        self._posiciones[correo] = len(self._correos)
+                        self._correos.append(correo)
+                        self._claves_offset += len(linea)
+            self._gen_visto = int(meta[META_GEN])
+            self._ivf_firma = int(meta[META_IVF])
+
+    def adjuntar(self):
+        """Se conecta al segmento publicado por otro proceso; False si no existe"""
+        self._sincronizar()
+        return self._seg_visto >= 0
+
+    # ---------- API de FaceIndex ----------
+    def cargar(self, plantillas):
+        """Construye y publica un segmento nuevo con todas las plantillas"""
+        temporal = FaceIndex(dim=self.dim, capacidad_inicial=self._capacidad_inicial,
+                             ivf=self.ivf, cuantizacion=self.cuantizacion)
+        temporal.cargar(plantillas)
+        if temporal.dim is None:
+            return 0  # Sin plantillas todavía: el primer agregar() crea el segmento
+        with self.escritura():
+            cap = max(self._capacidad_inicial, len(temporal))
+            self._escribir_segmento(temporal._matriz, temporal._escalas, temporal._listas,
+                                    temporal._correos, temporal.dim, cap, self._firma_ivf(self.ivf))
+        return len(self)
+
+    def agregar(self, correo, plantilla):
+        vec = self._normalizar(plantilla)
+        if vec is None:
+            return False
+        with self.escritura():
+            self._sincronizar()
+            if self._seg_visto < 0:
+                self.cargar([(correo, vec)])
+                return True
+            if vec.shape[0] != self.dim:
+                print(f"⚠️  Plantilla de {correo} con dimensión {vec.shape[0]} (esperada {self.dim}), se omite")
+                return False
+            fila = self._posiciones.get(correo)
+            n = len(self._correos)
+            if fila is None and n >= self._matriz.shape[0]:
+                # Sin capacidad: segmento nuevo del doble de tamaño
+                self._escribir_segmento(self._matriz, self._escalas, self._listas, self._correos,
+                                        self.dim, self._matriz.shape[0] * 2, self._ivf_firma)
+            matriz, escalas, listas = self._escribible()
+            if fila is None:
+                # La fila n todavía no es visible: se escribe antes de publicar n + 1
+                self._escribir_fila(matriz, escalas, listas, n, vec)
+                with open(self._claves_path(self._seg_visto), "ab") as f:
+                    f.write(f"{correo}\n".encode("utf-8"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._publicar_meta(n=n + 1)
+            else:
+                # Reescritura de una fila visible: los lectores que la vean a medias
+                # encuentran la generación cambiada y repiten la consulta
+                with self._ciclo_generacion():
+                    self._escribir_fila(matriz, escalas, listas, fila, vec)
+            self._sincronizar()
+        return True
+
+    def _escribir_fila(self, matriz, escalas, listas, destino, vec):
+        matriz[destino], escalas[destino] = cuantizar(vec, self.cuantizacion)
+        if self.ivf is not None:
+            listas[destino] = self.ivf.asignar(vec)[0]
+        for vista in (matriz, escalas, listas):
+            vista.flush()
+
+    def eliminar(self, correo):
+        """Reescribe el segmento sin el usuario (las eliminaciones son raras)"""
+        with self.escritura():
+            self._sincronizar()
+            fila = self._posiciones.get(correo)
+            if fila is None:
+                return False
+            conservar = np.array([i for i in range(len(self._correos)) if i != fila], dtype="int64")
+            correos = [self._correos[i] for i in conservar]
+            self._escribir_segmento(self._matriz[conservar], self._escalas[conservar], self._listas[conservar],
+                                    correos, self.dim, self._matriz.shape[0], self._ivf_firma)
+        return True
+
+    @staticmethod
+    def _firma_ivf(ivf):
+        if ivf is None:
+            return 0
+        return zlib.crc32(np.ascontiguousarray(ivf.centroides, dtype="float32").tobytes()) + 1
+
+    def configurar_ivf(self, ivf, ivf_min_usuarios=None):
+        """Reasigna las listas en el segmento solo si se entrenó otro IVF"""
+        with self._lock:
+            self._sincronizar()
+            if ivf is not None and self.dim is not None and ivf.dim != self.dim:
+                print(f"⚠️  Índice IVF con dimensión {ivf.dim} incompatible con {self.dim}, se ignora")
+                return False
+            self.ivf = ivf
+            if ivf_min_usuarios is not None:
+                self.ivf_min_usuarios = ivf_min_usuarios
+            firma = self._firma_ivf(ivf)
+            if ivf is None or self._seg_visto < 0 or firma == self._ivf_firma:
+                return True
+            with self.escritura():
+                self._sincronizar()
+                _, _, listas = self._escribible()
+                n = len(self._correos)
+                with self._ciclo_generacion(ivf=firma):
+                    for i in range(0, n, self.bloque):
+                        fin = min(n, i + self.bloque)
+                        listas[i:fin] = ivf.asignar(self._filas_float32(i, fin))
+                    listas.flush()
+                self._sincronizar()
+        return True
+
+    def buscar(self, plantilla, k=5, nprobe=None):
+        for _ in range(REINTENTOS_LECTURA):
+            self._sincronizar()
+            gen = self._gen_visto
+            resultado = super().buscar(plantilla, k=k, nprobe=nprobe)
+            # Generación par e igual durante toda la consulta: ninguna fila cambió a medias
+            if self._meta is None or (gen % 2 == 0 and int(self._meta[META_GEN]) == gen):
+                return resultado
+        return resultado
+
+    def __len__(self):
+        self._sincronizar()
+        return len(self._correos)
+
+    def __contains__(self, correo):
+        self._sincronizar()
+        return correo in self._posiciones
+
+
+# ==========================================
+# 🛠️ RECONSTRUCCIÓN DESDE LÍNEA DE COMANDOS
+# ==========================================
+if __name__ == "__main__":
+    # Tras cambios masivos hechos fuera de la app (p. ej. un re-enrolamiento
+    # offline) el segmento se regenera y los workers lo adoptan sin reiniciar
+    import app
+
+    if not app.FACE_INDICE_COMPARTIDO:
+        print("⚠️  FACE_INDICE_COMPARTIDO está desactivado en config.py")
+        raise SystemExit(1)
+    indice = app.obtener_face_index(reconstruir=True)
+    print(f"✅ Segmento {indice.nombre} reconstruido: {len(indice)} plantillas, generación {indice.generacion}")
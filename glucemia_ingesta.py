@@ -0,0 +1,299 @@
+# glucemia_ingesta.py
+import io
+import csv
+import json
+import warnings
+from datetime import datetime
+import numpy as np
+
+# ==========================================
+# 📥 INGESTA POR LOTES DE LECTURAS DE GLUCOSA (CGM)
+# ==========================================
+# Un sensor continuo produce ~288 lecturas por paciente al día. Los lotes
+# llegan como NDJSON (un objeto por línea) o CSV con cabecera, con los
+# campos de registros_glucemia:
+#
+#   paciente_id, fecha_medicion, nivel_glucosa  (obligatorios)
+#   tipo_medicion, dispositivo                 (opcionales)
+#
+# fecha_medicion es hora local ISO 8601 sin zona ("2024-01-20 08:05:00" o
+# "2024-01-20T08:05:00") y se guarda como "AAAA-MM-DD HH:MM:SS", igual que
+# los registros existentes, para que la clave única la compare bien.
+#
+# El lote se convierte a columnas NumPy y se valida completo de una vez;
+# después se descartan los duplicados (paciente_id, fecha_medicion) del
+# propio lote y los que ya están en la base, y lo nuevo se escribe con un
+# solo executemany dentro de una transacción.
+
+COLUMNAS = ("paciente_id", "fecha_medicion", "nivel_glucosa", "tipo_medicion", "dispositivo")
+OBLIGATORIAS = ("paciente_id", "fecha_medicion", "nivel_glucosa")
+MAX_ERRORES_REPORTADOS = 20
+
+
+class LoteInvalido(ValueError):
+    """El cuerpo no se puede leer como lote (no por filas sueltas inválidas)"""
+
+
+class PacienteNoAutorizado(LoteInvalido):
+    """El lote trae lecturas de pacientes que quien lo envía no puede cargar"""
+
+
+class LoteGlucemia:
+    """Lecturas válidas en columnas, ordenadas por (paciente_id, fecha)"""
+
+    def __init__(self, paciente_id, fecha, nivel, tipo, dispositivo):
+        self.paciente_id = paciente_id    # int64
+        self.fecha = fecha                # datetime64[s]
+        self.nivel = nivel                # float64 (mg/dL)
+        self.tipo = tipo                  # object
+        self.dispositivo = dispositivo    # object
+
+    def __len__(self):
+        return len(self.paciente_id)
+
+    def seleccionar(self, mascara):
+        return LoteGlucemia(self.paciente_id[mascara], self.fecha[mascara], self.nivel[mascara],
+                            self.tipo[mascara], self.dispositivo[mascara])
+
+
+# ==========================================
+# 📄 LECTURA DE NDJSON Y CSV
+# ==========================================
+def leer_ndjson(datos):
+    """(columnas, filas, ilegibles) de un cuerpo NDJSON; ilegibles son índices de filas"""
+    texto = datos.decode("utf-8-sig") if isinstance(datos, (bytes, bytearray)) else datos
+    lineas = [l for l in texto.splitlines() if l.strip()]
+    try:
+        # Un solo json.loads para todo el lote; si falla, se lee línea a línea
+        objetos = json.loads("[" + ",".join(lineas) + "]")
+    except ValueError:
+        objetos = []
+        for linea in lineas:
+            try:
+                objetos.append(json.loads(linea))
+            except ValueError:
+                objetos.append(None)
+    ilegibles = [i for i, o in enumerate(objetos) if not isinstance(o, dict)]
+    for i in ilegibles:
+        objetos[i] = {}
+    columnas = {c: [o.get(c) for o in objetos] for c in COLUMNAS}
+    return columnas, len(objetos), ilegibles
+
+
+def leer_csv(datos):
+    """(columnas, filas, ilegibles) de un CSV con cabecera
+
+    A las filas cortas se les completan los campos opcionales finales; las
+    que traen más campos que la cabecera se marcan ilegibles.
+    """
+    texto = datos.decode("utf-8-sig") if isinstance(datos, (bytes, bytearray)) else datos
+    lector = csv.reader(io.StringIO(texto))
+    cabecera = [c.strip() for c in next(lector, [])]
+    faltantes = [c for c in OBLIGATORIAS if c not in cabecera]
+    if faltantes:
+        raise LoteInvalido(f"Faltan columnas en la cabecera: {', '.join(faltantes)}")
+    filas = [f for f in lector if f]
+    ancho = len(cabecera)
+    ilegibles = [i for i, f in enumerate(filas) if len(f) > ancho]
+    for i in ilegibles:
+        filas[i] = [None] * ancho
+    filas = [f if len(f) == ancho else f + [None] * (ancho - len(f)) for f in filas]
+    por_columna = dict(zip(cabecera, zip(*filas))) if filas else {}
+    columnas = {c: list(por_columna.get(c, [None] * len(filas))) for c in COLUMNAS}
+    return columnas, len(filas), ilegibles
+
+
+# ==========================================
+# ✅ VALIDACIÓN VECTORIZADA
+# ==========================================
+def _a_numeros(valores):
+    """float64 con NaN donde el valor no es numérico"""
+    try:
+        return np.asarray(valores, dtype="float64")
+    except (TypeError, ValueError):
+        salida = np.full(len(valores), np.nan)
+        for i, v in enumerate(valores):
+            try:
+                salida[i] = float(v)
+            except (TypeError, ValueError):
+                pass
+        return salida
+
+
+def convertir_fechas(valores):
+    """datetime64[s] con NaT donde la fecha no es texto ISO 8601 sin zona horaria"""
+    # Los números se descartan: NumPy los tomaría como segundos Unix (UTC)
+    valores = [v if isinstance(v, str) else None for v in valores]
+    with warnings.catch_warnings():
+        # NumPy solo avisa ante "Z" o "+02:00"; aquí es un error
+        warnings.simplefilter("error")
+        try:
+            return np.asarray(valores, dtype="datetime64[s]")
+        except (TypeError, ValueError, UserWarning):
+            salida = np.full(len(valores), np.datetime64("NaT"), dtype="datetime64[s]")
+            for i, v in enumerate(valores):
+                try:
+                    if isinstance(v, str) and v:
+                        salida[i] = np.datetime64(v.strip(), "s")
+                except (TypeError, ValueError, UserWarning):
+                    pass
+            return salida
+
+
+def _texto(valores, defecto, largo=32):
+    col = np.array([v if isinstance(v, str) and v.strip() else defecto for v in valores], dtype=object)
+    if any(len(v) > largo for v in col):
+        col = np.array([v[:largo] for v in col], dtype=object)
+    return col
+
+
+def validar(columnas, filas, ilegibles=(), ahora=None, minimo=20.0, maximo=600.0, tolerancia_futuro_seg=600,
+            tipo_defecto="continua", dispositivo_defecto="sensor"):
+    """(LoteGlucemia, errores, duplicadas_en_lote)
+
+    errores: [(fila, motivo)] con filas numeradas desde 1. Los duplicados
+    dentro del lote conservan la primera aparición.
+    """
+    pid = _a_numeros(columnas["paciente_id"])
+    fecha = convertir_fechas(columnas["fecha_medicion"])
+    nivel = _a_numeros(columnas["nivel_glucosa"])
+    # Hora local, como fecha_medicion: np.datetime64("now") es UTC y en zonas
+    # UTC+ rechazaría como futuras las lecturas recién tomadas
+    ahora = np.datetime64(ahora or datetime.now(), "s")
+
+    motivos = np.full(filas, None, dtype=object)
+    # Del menos al más grave: el último motivo que aplica es el que se reporta
+    motivos[fecha > ahora + np.timedelta64(int(tolerancia_futuro_seg), "s")] = "fecha_medicion en el futuro"
+    motivos[~((nivel >= minimo) & (nivel <= maximo))] = f"nivel_glucosa fuera de {minimo:g}-{maximo:g} mg/dL"
+    motivos[np.isnan(nivel)] = "nivel_glucosa no numérico"
+    motivos[np.isnat(fecha)] = "fecha_medicion inválida"
+    motivos[~((pid > 0) & (pid == np.floor(pid)))] = "paciente_id inválido"
+    motivos[np.isnan(pid)] = "paciente_id inválido"
+    motivos[list(ilegibles)] = "fila ilegible"
+    validas = np.equal(motivos, None)
+    errores = [(int(i) + 1, motivos[i]) for i in np.flatnonzero(~validas)]
+
+    lote = LoteGlucemia(pid[validas].astype("int64"), fecha[validas], nivel[validas],
+                        _texto(np.asarray(columnas["tipo_medicion"], dtype=object)[validas], tipo_defecto),
+                        _texto(np.asarray(columnas["dispositivo"], dtype=object)[validas], dispositivo_defecto))
+    if not len(lote):
+        return lote, errores, 0
+
+    # Orden estable por (paciente, fecha): el primero de cada clave repetida es el que llegó antes
+    orden = np.lexsort((lote.fecha.astype("int64"), lote.paciente_id))
+    lote = lote.seleccionar(orden)
+    repetida = np.zeros(len(lote), dtype=bool)
+    repetida[1:] = (lote.paciente_id[1:] == lote.paciente_id[:-1]) & (lote.fecha[1:] == lote.fecha[:-1])
+    return lote.seleccionar(~repetida), errores, int(repetida.sum())
+
+
+def estados(nivel):
+    """Columna estado de registros_glucemia según el nivel (rangos de consenso CGM)"""
+    return np.select([nivel < 54, nivel < 70, nivel > 250, nivel > 180],
+                     ["crítico", "bajo", "crítico", "alto"], default="normal").astype(object)
+
+
+# ==========================================
+# 💾 ESCRITURA
+# ==========================================
+def _existentes(conn, lote):
+    """Máscara de lecturas del lote que ya están en la base (mismo paciente y fecha)"""
+    ya = np.zeros(len(lote), dtype=bool)
+    inicios = np.flatnonzero(np.r_[True, lote.paciente_id[1:] != lote.paciente_id[:-1]])
+    for inicio, fin in zip(inicios, np.r_[inicios[1:], len(lote)]):
+        fechas = lote.fecha[inicio:fin]
+        # Usa el índice (paciente_id, fecha_medicion): solo recorre el rango del lote
+        guardadas = [f[0] for f in conn.execute(
+            "SELECT fecha_medicion FROM registros_glucemia "
+            "WHERE paciente_id = ? AND fecha_medicion BETWEEN ? AND ?",
+            (int(lote.paciente_id[inicio]), _formatear(fechas[:1])[0], _formatear(fechas[-1:])[0]))]
+        if guardadas:
+            ya[inicio:fin] = np.isin(fechas, convertir_fechas(guardadas))
+    return ya
+
+
+def _formatear(fechas):
+    return [f.replace("T", " ") for f in np.datetime_as_string(fechas, unit="s").tolist()]
+
+
+def pacientes_existentes(conn, ids):
+    ids = [int(i) for i in np.unique(ids)]
+    existentes = set()
+    for i in range(0, len(ids), 500):
+        parte = ids[i:i + 500]
+        existentes.update(f[0] for f in conn.execute(
+            f"SELECT id FROM pacientes WHERE id IN ({','.join('?' * len(parte))})", parte))
+    return existentes
+
+
+def guardar(conn, lote, al_insertar=None):
+    """Inserta las lecturas nuevas del lote en una sola transacción
+
+    Devuelve (insertadas, ya_existentes, sin_paciente, pacientes_desconocidos).
+    `al_insertar` recibe (conn, LoteGlucemia insertado) dentro de la misma
+    transacción.
+    """
+    if not len(lote):
+        return 0, 0, 0, []
+    aislamiento = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        # IMMEDIATE: nadie más escribe entre la consulta de existentes y el INSERT
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conocidos = pacientes_existentes(conn, lote.paciente_id)
+            desconocidos = sorted(set(np.unique(lote.paciente_id).tolist()) - conocidos)
+            sin_paciente = np.isin(lote.paciente_id, desconocidos)
+            lote = lote.seleccionar(~sin_paciente)
+            ya = _existentes(conn, lote) if len(lote) else np.zeros(0, dtype=bool)
+            nuevo = lote.seleccionar(~ya)
+            fechas = _formatear(nuevo.fecha)
+            conn.executemany(
+                "INSERT INTO registros_glucemia (paciente_id, nivel_glucosa, tipo_medicion, fecha_medicion, "
+                "hora_medicion, estado, dispositivo) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                zip(nuevo.paciente_id.tolist(), nuevo.nivel.tolist(), nuevo.tipo.tolist(), fechas,
+                    [f[11:16] for f in fechas], estados(nuevo.nivel).tolist(), nuevo.dispositivo.tolist()))
+            if al_insertar is not None and len(nuevo):
+                al_insertar(conn, nuevo)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.isolation_level = aislamiento
+    return len(nuevo), int(ya.sum()), int(sin_paciente.sum()), desconocidos
+
+
+def ingestar(conn, datos, formato, max_filas=None, **opciones):
+    """Lee, valida y guarda un lote; devuelve el resumen que responde la API
+
+    formato: "ndjson" o "csv". LoteInvalido si el cuerpo no se puede leer o
+    supera max_filas. Con `autorizar` (ids -> ids permitidos) el lote completo
+    se rechaza con PacienteNoAutorizado si trae otro paciente; no se guarda nada.
+    """
+    lector = leer_csv if formato == "csv" else leer_ndjson
+    try:
+        columnas, filas, ilegibles = lector(datos)
+    except UnicodeDecodeError:
+        raise LoteInvalido("El lote debe estar en UTF-8")
+    if max_filas and filas > max_filas:
+        raise LoteInvalido(f"El lote tiene {filas} filas (máximo {max_filas})")
+    al_insertar = opciones.pop("al_insertar", None)
+    autorizar = opciones.pop("autorizar", None)
+    lote, errores, duplicadas_lote = validar(columnas, filas, ilegibles, **opciones)
+    if autorizar is not None and len(lote):
+        pedidos = np.unique(lote.paciente_id).tolist()
+        negados = sorted(set(pedidos) - set(autorizar(pedidos)))
+        if negados:
+            raise PacienteNoAutorizado(f"Sin permiso para cargar lecturas de los pacientes: "
+                                       f"{', '.join(map(str, negados[:20]))}")
+    insertadas, existentes, sin_paciente, desconocidos = guardar(conn, lote, al_insertar)
+    if desconocidos:
+        errores.append((None, f"pacientes inexistentes: {', '.join(map(str, desconocidos[:20]))}"))
+    return {
+        "recibidas": filas,
+        "insertadas": insertadas,
+        "duplicadas": duplicadas_lote + existentes,
+        "invalidas": filas - len(lote) - duplicadas_lote + sin_paciente,
+        "errores": [{"fila": f, "motivo": m} for f, m in errores[:MAX_ERRORES_REPORTADOS]],
+    }
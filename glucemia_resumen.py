@@ -0,0 +1,233 @@
+# glucemia_resumen.py
+import os
+import sqlite3
+import argparse
+import numpy as np
+
+from glucemia_ingesta import convertir_fechas
+
+# ==========================================
+# 🧮 RESÚMENES POR HORA Y POR DÍA DE LA GLUCEMIA
+# ==========================================
+# Las gráficas del dashboard (historial y tendencias de 7/30/90 días) leen
+# estos resúmenes en vez de registros_glucemia: un renglón por paciente y
+# hora (o día), así que la consulta cuesta O(intervalos) y no O(lecturas).
+#
+# Se guardan sumas y no promedios para poder acumular lotes nuevos con un
+# UPSERT: media = suma / n, desviación = sqrt(suma_cuadrados / n - media²).
+# Los conteos bajo/en/sobre rango usan la meta activa del paciente en
+# metas_glucemia al momento de la ingesta; si la meta cambia, reconstruir:
+#
+#   python glucemia_resumen.py reconstruir [--paciente 3]
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database", "sistema_diabetes.db")
+
+# granularidad -> (tabla, unidad datetime64 del intervalo)
+GRANULARIDADES = {
+    "hora": ("glucemia_resumen_hora", "h"),
+    "dia": ("glucemia_resumen_dia", "D"),
+}
+RANGO_DEFECTO = (70.0, 180.0)     # rango objetivo de consenso para CGM (mg/dL)
+# Meta usada cuando un paciente tiene varias activas, de más a menos preferida
+PREFERENCIA_META = ("continua", "aleatoria", None)
+
+
+def limites_pacientes(conn, ids):
+    """{paciente_id: (mínimo, máximo)} desde metas_glucemia, con RANGO_DEFECTO si no hay meta"""
+    ids = [int(i) for i in np.unique(ids)]
+    limites = {}
+    for i in range(0, len(ids), 500):
+        parte = ids[i:i + 500]
+        filas = conn.execute(
+            "SELECT paciente_id, tipo_medicion, meta_minima, meta_maxima FROM metas_glucemia "
+            f"WHERE activo = 1 AND paciente_id IN ({','.join('?' * len(parte))})", parte).fetchall()
+        for pid, tipo, minimo, maximo in filas:
+            if minimo is None or maximo is None:
+                continue
+            prioridad = PREFERENCIA_META.index(tipo) if tipo in PREFERENCIA_META else len(PREFERENCIA_META)
+            actual = limites.get(pid)
+            if actual is None or prioridad < actual[0]:
+                limites[pid] = (prioridad, float(minimo), float(maximo))
+    return {pid: (limites[pid][1:] if pid in limites else RANGO_DEFECTO) for pid in ids}
+
+
+def agregar(paciente_id, fecha, nivel, limites, unidad):
+    """Tuplas (paciente_id, inicio, n, suma, suma_cuadrados, mínimo, máximo, n_bajo, n_rango, n_alto)
+
+    Las lecturas deben venir ordenadas por (paciente_id, fecha), como las deja
+    glucemia_ingesta.validar: así cada intervalo es un tramo contiguo y todas
+    las sumas salen con un reduceat.
+    """
+    if not len(nivel):
+        return []
+    inicio = fecha.astype(f"datetime64[{unidad}]")
+    corte = np.r_[True, (paciente_id[1:] != paciente_id[:-1]) | (inicio[1:] != inicio[:-1])]
+    tramos = np.flatnonzero(corte)
+
+    pids = np.fromiter(limites.keys(), dtype="int64")
+    orden = np.argsort(pids)
+    fila = orden[np.searchsorted(pids, paciente_id, sorter=orden)]
+    rangos = np.array(list(limites.values()), dtype="float64")
+    bajo = nivel < rangos[fila, 0]
+    alto = nivel > rangos[fila, 1]
+
+    n = np.diff(np.r_[tramos, len(nivel)])
+    n_bajo = np.add.reduceat(bajo.astype("int64"), tramos)
+    n_alto = np.add.reduceat(alto.astype("int64"), tramos)
+    inicios = np.datetime_as_string(inicio[tramos].astype("datetime64[s]"), unit="s").tolist()
+    return list(zip(
+        paciente_id[tramos].tolist(),
+        [i.replace("T", " ") for i in inicios],
+        n.tolist(),
+        np.add.reduceat(nivel, tramos).tolist(),
+        np.add.reduceat(nivel * nivel, tramos).tolist(),
+        np.minimum.reduceat(nivel, tramos).tolist(),
+        np.maximum.reduceat(nivel, tramos).tolist(),
+        n_bajo.tolist(),
+        (n - n_bajo - n_alto).tolist(),
+        n_alto.tolist(),
+    ))
+
+
+def _upsert(tabla):
+    return (f"INSERT INTO {tabla} (paciente_id, inicio, n, suma, suma_cuadrados, minimo, maximo, "
+            "n_bajo, n_rango, n_alto) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (paciente_id, inicio) DO UPDATE SET "
+            "n = n + excluded.n, suma = suma + excluded.suma, "
+            "suma_cuadrados = suma_cuadrados + excluded.suma_cuadrados, "
+            "minimo = MIN(minimo, excluded.minimo), maximo = MAX(maximo, excluded.maximo), "
+            "n_bajo = n_bajo + excluded.n_bajo, n_rango = n_rango + excluded.n_rango, "
+            "n_alto = n_alto + excluded.n_alto")
+
+
+def actualizar_resumenes(conn, lote):
+    """Acumula un lote recién insertado (LoteGlucemia) en los resúmenes por hora y día
+
+    Pensada como `al_insertar` de glucemia_ingesta.guardar: corre dentro de
+    la misma transacción que el INSERT de las lecturas.
+    """
+    limites = limites_pacientes(conn, lote.paciente_id)
+    for tabla, unidad in GRANULARIDADES.values():
+        conn.executemany(_upsert(tabla), agregar(lote.paciente_id, lote.fecha, lote.nivel, limites, unidad))
+
+
+def reconstruir(conn, paciente_id=None):
+    """Recalcula los resúmenes desde registros_glucemia (todos o de un paciente)
+
+    Devuelve el número de lecturas procesadas. Corre en una transacción.
+    """
+    aislamiento = conn.isolation_level
+    conn.isolation_level = None
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            total = recalcular(conn, paciente_id)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.isolation_level = aislamiento
+    return total
+
+
+def recalcular(conn, paciente_id=None):
+    """Cuerpo de reconstruir() sin transacción propia (lo usa también la migración)"""
+    if paciente_id is None:
+        ids = [f[0] for f in conn.execute(
+            "SELECT DISTINCT paciente_id FROM registros_glucemia WHERE paciente_id IS NOT NULL")]
+    else:
+        ids = [int(paciente_id)]
+    for tabla, _ in GRANULARIDADES.values():
+        if paciente_id is None:
+            conn.execute(f"DELETE FROM {tabla}")
+        else:
+            conn.execute(f"DELETE FROM {tabla} WHERE paciente_id = ?", (int(paciente_id),))
+    limites = limites_pacientes(conn, ids)
+    total = 0
+    for pid in ids:
+        filas = conn.execute(
+            "SELECT fecha_medicion, nivel_glucosa FROM registros_glucemia "
+            "WHERE paciente_id = ? AND nivel_glucosa IS NOT NULL ORDER BY fecha_medicion", (pid,)).fetchall()
+        if not filas:
+            continue
+        fechas, niveles = zip(*filas)
+        fecha = convertir_fechas(list(fechas))
+        validas = ~np.isnat(fecha)
+        nivel = np.asarray(niveles, dtype="float64")[validas]
+        fecha = fecha[validas]
+        pids = np.full(len(nivel), pid, dtype="int64")
+        for tabla, unidad in GRANULARIDADES.values():
+            conn.executemany(_upsert(tabla), agregar(pids, fecha, nivel, {pid: limites[pid]}, unidad))
+        total += len(nivel)
+    return total
+
+
+# ==========================================
+# 📊 LECTURA PARA LAS GRÁFICAS
+# ==========================================
+def leer_resumen(conn, paciente_id, desde, hasta, granularidad="dia"):
+    """Intervalos [desde, hasta) del paciente como arreglos NumPy
+
+    Claves: inicio (texto), n, media, desviacion, minimo, maximo,
+    tiempo_bajo, tiempo_en_rango, tiempo_alto (fracciones de lecturas).
+    """
+    tabla, _ = GRANULARIDADES[granularidad]
+    filas = conn.execute(
+        f"SELECT inicio, n, suma, suma_cuadrados, minimo, maximo, n_bajo, n_rango, n_alto FROM {tabla} "
+        "WHERE paciente_id = ? AND inicio >= ? AND inicio < ? ORDER BY inicio",
+        (int(paciente_id), desde, hasta)).fetchall()
+    inicio = [f[0] for f in filas]
+    v = np.array([f[1:] for f in filas], dtype="float64").reshape(-1, 8)
+    n, suma, cuadrados = v[:, 0], v[:, 1], v[:, 2]
+    media = suma / np.maximum(n, 1)
+    return {
+        "inicio": inicio,
+        "n": n.astype("int64"),
+        "media": media,
+        "desviacion": np.sqrt(np.maximum(cuadrados / np.maximum(n, 1) - media ** 2, 0)),
+        "minimo": v[:, 3],
+        "maximo": v[:, 4],
+        "tiempo_bajo": v[:, 5] / np.maximum(n, 1),
+        "tiempo_en_rango": v[:, 6] / np.maximum(n, 1),
+        "tiempo_alto": v[:, 7] / np.maximum(n, 1),
+        # Totales del periodo, combinando las sumas de todos los intervalos
+        "total": _combinar(v),
+    }
+
+
+def _combinar(v):
+    n = float(v[:, 0].sum())
+    if not n:
+        return {"n": 0}
+    media = v[:, 1].sum() / n
+    return {
+        "n": int(n),
+        "media": float(media),
+        "desviacion": float(np.sqrt(max(v[:, 2].sum() / n - media ** 2, 0))),
+        "minimo": float(v[:, 3].min()),
+        "maximo": float(v[:, 4].max()),
+        "tiempo_bajo": float(v[:, 5].sum() / n),
+        "tiempo_en_rango": float(v[:, 6].sum() / n),
+        "tiempo_alto": float(v[:, 7].sum() / n),
+    }
+
+
+def ultimo_dia(conn, paciente_id):
+    """Inicio del último día con lecturas del paciente ("AAAA-MM-DD 00:00:00") o None"""
+    fila = conn.execute("SELECT MAX(inicio) FROM glucemia_resumen_dia WHERE paciente_id = ?",
+                        (int(paciente_id),)).fetchone()
+    return fila[0] if fila else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resúmenes por hora y día de registros_glucemia")
+    parser.add_argument("accion", choices=["reconstruir"])
+    parser.add_argument("--paciente", type=int, help="Solo este paciente (por defecto todos)")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    total = reconstruir(conn, args.paciente)
+    print(f"🧮 Resúmenes reconstruidos con {total:,} lecturas")
+    conn.close()
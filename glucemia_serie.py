@@ -0,0 +1,117 @@
+# glucemia_serie.py
+import hashlib
+import numpy as np
+
+from glucemia_ingesta import convertir_fechas
+from glucemia_resumen import GRANULARIDADES
+
+# ==========================================
+# 📉 SERIES REDUCIDAS PARA LAS GRÁFICAS (LTTB)
+# ==========================================
+# Un sensor deja ~26 000 lecturas en 90 días; la gráfica no puede mostrar
+# más puntos que píxeles. Largest-Triangle-Three-Buckets conserva la forma
+# (picos e hipoglucemias incluidos) eligiendo en cada intervalo el punto que
+# forma el triángulo más grande con el punto anterior elegido y el promedio
+# del intervalo siguiente.
+#
+# fuente: "lecturas" (registros_glucemia), "hora" o "dia" (promedios de los
+# resúmenes de glucemia_resumen.py). "auto" usa las lecturas mientras no
+# pasen de max_lecturas en el periodo y si no los promedios por hora.
+
+FUENTES = ("auto", "lecturas") + tuple(GRANULARIDADES)
+
+
+def lttb(x, y, puntos):
+    """Índices de los `puntos` elegidos por LTTB (siempre el primero y el último)
+
+    x debe ser creciente. Si ya hay `puntos` o menos, devuelve todos.
+    """
+    n = len(x)
+    if puntos >= n or n < 3:
+        return np.arange(n)
+    if puntos < 3:
+        return np.array([0, n - 1])[:max(puntos, 0)]
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    # puntos - 2 intervalos para las posiciones 1 .. n-2
+    bordes = np.linspace(1, n - 1, puntos - 1).astype("int64")
+    conteos = np.diff(bordes)
+    # Promedio de cada intervalo (y del último punto como "siguiente" del final), de una vez
+    prom_x = np.r_[np.add.reduceat(x[:n - 1], bordes[:-1]) / conteos, x[-1]]
+    prom_y = np.r_[np.add.reduceat(y[:n - 1], bordes[:-1]) / conteos, y[-1]]
+
+    elegidos = np.empty(puntos, dtype="int64")
+    elegidos[0], elegidos[-1] = 0, n - 1
+    a = 0
+    for i in range(puntos - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        cx, cy = prom_x[i + 1], prom_y[i + 1]
+        # Doble del área del triángulo (a, candidato, promedio siguiente)
+        area = np.abs((x[a] - cx) * (y[ini:fin] - y[a]) - (x[a] - x[ini:fin]) * (cy - y[a]))
+        a = ini + int(np.argmax(area))
+        elegidos[i + 1] = a
+    return elegidos
+
+
+def _lecturas(conn, paciente_id, desde, hasta):
+    filas = conn.execute(
+        "SELECT fecha_medicion, nivel_glucosa FROM registros_glucemia "
+        "WHERE paciente_id = ? AND fecha_medicion >= ? AND fecha_medicion < ? ORDER BY fecha_medicion",
+        (int(paciente_id), desde, hasta)).fetchall()
+    if not filas:
+        return np.empty(0, dtype="datetime64[s]"), np.empty(0)
+    fechas, niveles = zip(*filas)
+    fecha = convertir_fechas(list(fechas))
+    nivel = np.asarray(niveles, dtype="float64")
+    validas = ~np.isnat(fecha) & ~np.isnan(nivel)
+    return fecha[validas], nivel[validas]
+
+
+def _promedios(conn, paciente_id, desde, hasta, granularidad):
+    tabla, _ = GRANULARIDADES[granularidad]
+    filas = conn.execute(
+        f"SELECT inicio, suma / n FROM {tabla} WHERE paciente_id = ? AND inicio >= ? AND inicio < ? ORDER BY inicio",
+        (int(paciente_id), desde, hasta)).fetchall()
+    if not filas:
+        return np.empty(0, dtype="datetime64[s]"), np.empty(0)
+    inicios, medias = zip(*filas)
+    return convertir_fechas(list(inicios)), np.asarray(medias, dtype="float64")
+
+
+def estado_periodo(conn, paciente_id, desde, hasta):
+    """(lecturas, suma) del periodo según los resúmenes diarios: O(días)
+
+    Cualquier lote nuevo dentro del periodo cambia estos valores, así que
+    sirven como versión para el ETag sin leer las lecturas.
+    """
+    fila = conn.execute(
+        "SELECT COALESCE(SUM(n), 0), COALESCE(SUM(suma), 0) FROM glucemia_resumen_dia "
+        "WHERE paciente_id = ? AND inicio >= ? AND inicio < ?",
+        (int(paciente_id), desde[:10] + " 00:00:00", hasta)).fetchone()
+    return int(fila[0]), float(fila[1])
+
+
+def etag(paciente_id, desde, hasta, puntos, fuente, estado):
+    clave = f"{paciente_id}|{desde}|{hasta}|{puntos}|{fuente}|{estado[0]}|{estado[1]:.6f}"
+    return hashlib.sha1(clave.encode("utf-8")).hexdigest()[:20]
+
+
+def elegir_fuente(fuente, lecturas, max_lecturas):
+    if fuente != "auto":
+        return fuente
+    return "lecturas" if lecturas <= max_lecturas else "hora"
+
+
+def serie(conn, paciente_id, desde, hasta, puntos, fuente="lecturas"):
+    """{"fechas", "valores", "originales"} con a lo sumo `puntos` puntos"""
+    if fuente == "lecturas":
+        fecha, valor = _lecturas(conn, paciente_id, desde, hasta)
+    else:
+        fecha, valor = _promedios(conn, paciente_id, desde, hasta, fuente)
+    elegidos = lttb(fecha.astype("int64"), valor, puntos)
+    fechas = np.datetime_as_string(fecha[elegidos], unit="m").tolist()
+    return {
+        "fechas": [f.replace("T", " ") for f in fechas],
+        "valores": np.round(valor[elegidos], 1).tolist(),
+        "originales": len(valor),
+    }
@@ -0,0 +1,516 @@
+# migraciones.py
+import os
+import sys
+import sqlite3
+import argparse
+
+# ==========================================
+# 🧱 MIGRACIONES VERSIONADAS DE sistema_diabetes.db
+# ==========================================
+# Cada migración tiene un número y se aplica una sola vez, dentro de su propia
+# transacción, registrándose en la tabla `migraciones`. Para cambiar el
+# esquema se agrega una migración nueva al final de MIGRACIONES; las ya
+# publicadas no se editan.
+#
+#   python migraciones.py aplicar      # lleva la base a la última versión
+#   python migraciones.py estado       # versiones aplicadas y pendientes
+#   python migraciones.py verificar    # EXPLAIN QUERY PLAN de las consultas críticas
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database", "sistema_diabetes.db")
+
+# ==========================================
+# 📐 ESQUEMA BASE (antes en crear-db.py)
+# ==========================================
+ESQUEMA_BASE = [
+    """
+    CREATE TABLE IF NOT EXISTS usuarios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        correo TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        nombre TEXT NOT NULL,
+        rol TEXT DEFAULT 'medico',        -- medico, admin, enfermero
+        telefono TEXT,
+        especialidad TEXT,
+        activo BOOLEAN DEFAULT 1,
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ultimo_login TIMESTAMP,
+        intentos_login INTEGER DEFAULT 0,
+        bloqueado BOOLEAN DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pacientes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        edad INTEGER,
+        sexo TEXT,                        -- M, F, Otro
+        tipo_diabetes TEXT,               -- Tipo 1, Tipo 2, Gestacional
+        telefono TEXT,
+        email TEXT,
+        direccion TEXT,
+        fecha_nacimiento TEXT,
+        fecha_diagnostico TEXT,
+        medico_asignado INTEGER,
+        historial_medico TEXT,
+        alergias TEXT,
+        contacto_emergencia TEXT,
+        telefono_emergencia TEXT,
+        activo BOOLEAN DEFAULT 1,
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (medico_asignado) REFERENCES usuarios(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS medicamentos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre TEXT NOT NULL,
+        tipo TEXT,                        -- insulina, pastillas, GLP-1, etc.
+        dosis TEXT,
+        descripcion TEXT,
+        contraindicaciones TEXT,
+        laboratorio TEXT,
+        activo BOOLEAN DEFAULT 1,
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tratamientos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        paciente_id INTEGER,
+        medicamento_id INTEGER,
+        dosis_prescrita TEXT,
+        frecuencia TEXT,                  -- 1 diaria, 2 diarias, semanal...
+        via_administracion TEXT,          -- oral, subcutánea, etc.
+        hora_administracion TEXT,         -- 08:00, 20:00, etc.
+        fecha_inicio TEXT,
+        fecha_fin TEXT,
+        indicaciones TEXT,
+        estado TEXT DEFAULT 'activo',     -- activo, suspendido, completado
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
+        FOREIGN KEY (medicamento_id) REFERENCES medicamentos(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS registros_glucemia (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        paciente_id INTEGER,
+        nivel_glucosa REAL,               -- mg/dL
+        tipo_medicion TEXT,               -- ayunas, postprandial, aleatoria
+        fecha_medicion TIMESTAMP,
+        hora_medicion TEXT,
+        notas TEXT,
+        estado TEXT,                      -- normal, alto, bajo, crítico
+        dispositivo TEXT,                 -- glucómetro, sensor
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (paciente_id) REFERENCES pacientes(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS consultas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        paciente_id INTEGER,
+        medico_id INTEGER,
+        fecha_consulta TEXT,
+        hora_consulta TEXT,
+        motivo TEXT,
+        diagnostico TEXT,
+        tratamiento TEXT,
+        observaciones TEXT,
+        peso REAL,
+        altura REAL,
+        presion_arterial TEXT,
+        imc REAL,
+        proxima_cita TEXT,
+        estado TEXT DEFAULT 'realizada',  -- programada, realizada, cancelada
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
+        FOREIGN KEY (medico_id) REFERENCES usuarios(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS biometricos_huella (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario_id INTEGER,
+        public_key TEXT,
+        credential_id TEXT UNIQUE,
+        dispositivo TEXT,
+        activo BOOLEAN DEFAULT 1,
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS biometricos_facial (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario_id INTEGER,
+        datos_facial TEXT,                -- Datos faciales codificados
+        descriptor_facial TEXT,           -- Descriptor facial para comparación
+        imagen_rostro BLOB,               -- Imagen del rostro
+        confianza_minima REAL DEFAULT 0.8,
+        activo BOOLEAN DEFAULT 1,
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS biometricos_voz (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario_id INTEGER,
+        huella_voz TEXT,                  -- Huella vocal codificada
+        frase TEXT,                       -- Frase de entrenamiento
+        audio_muestra BLOB,               -- Audio de muestra
+        confianza_minima REAL DEFAULT 0.7,
+        activo BOOLEAN DEFAULT 1,
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS historial_accesos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario_id INTEGER,
+        metodo TEXT,                      -- rostro, huella, voz, contraseña
+        dispositivo TEXT,
+        ip_address TEXT,
+        user_agent TEXT,
+        exito BOOLEAN,
+        confianza REAL,                   -- Nivel de confianza biométrica
+        mensaje_error TEXT,
+        fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS alertas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        paciente_id INTEGER,
+        tratamiento_id INTEGER,
+        tipo TEXT,                        -- medicamento, glucosa, cita
+        mensaje TEXT,
+        prioridad TEXT DEFAULT 'media',   -- baja, media, alta, critica
+        estado TEXT DEFAULT 'pendiente',  -- pendiente, atendida, cancelada
+        fecha_alerta TIMESTAMP,
+        fecha_atencion TIMESTAMP,
+        leido BOOLEAN DEFAULT 0,
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
+        FOREIGN KEY (tratamiento_id) REFERENCES tratamientos(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS recordatorios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        paciente_id INTEGER,
+        tratamiento_id INTEGER,
+        titulo TEXT,
+        mensaje TEXT,
+        fecha_recordatorio TEXT,
+        hora_recordatorio TEXT,
+        repetir TEXT,                     -- una_vez, diario, semanal
+        estado TEXT DEFAULT 'pendiente',  -- pendiente, completado, cancelado
+        confirmado BOOLEAN DEFAULT 0,
+        fecha_confirmacion TIMESTAMP,
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (paciente_id) REFERENCES pacientes(id),
+        FOREIGN KEY (tratamiento_id) REFERENCES tratamientos(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS metas_glucemia (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        paciente_id INTEGER,
+        tipo_medicion TEXT,               -- ayunas, postprandial, aleatoria
+        meta_minima REAL,
+        meta_maxima REAL,
+        activo BOOLEAN DEFAULT 1,
+        fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (paciente_id) REFERENCES pacientes(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS configuracion_seguridad (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        clave TEXT UNIQUE,
+        valor TEXT,
+        descripcion TEXT,
+        fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+
+def _columnas(conn, tabla):
+    return {fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})")}
+
+
+def m001_esquema_base(conn):
+    for sql in ESQUEMA_BASE:
+        conn.execute(sql)
+
+
+def m002_completar_columnas(conn):
+    """Agrega a las tablas de bases antiguas las columnas del esquema base que les faltan
+
+    Las bases creadas con versiones anteriores de crear-db.py ya tenían
+    tablas con menos columnas (p. ej. alertas sin prioridad), así que
+    CREATE TABLE IF NOT EXISTS las dejó como estaban.
+    """
+    referencia = sqlite3.connect(":memory:")
+    for sql in ESQUEMA_BASE:
+        referencia.execute(sql)
+    tablas = [fila[0] for fila in referencia.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    for tabla in tablas:
+        existentes = _columnas(conn, tabla)
+        for _, nombre, tipo, _, defecto, pk in referencia.execute(f"PRAGMA table_info({tabla})"):
+            if nombre in existentes or pk:
+                continue
+            # ADD COLUMN no admite valores por defecto no constantes ni UNIQUE/NOT NULL sin defecto
+            if defecto is None or defecto.upper() == "CURRENT_TIMESTAMP":
+                conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo}")
+            else:
+                conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo} DEFAULT {defecto}")
+    referencia.close()
+
+
+def m003_indices_rendimiento(conn):
+    # Cubren las consultas de CONSULTAS_CRITICAS: filtro por igualdad primero,
+    # después la columna de rango u orden, y al final lo que se lee
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_registros_glucemia_paciente_fecha
+                    ON registros_glucemia(paciente_id, fecha_medicion, nivel_glucosa)""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_tratamientos_paciente
+                    ON tratamientos(paciente_id, estado)""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_alertas_estado_prioridad
+                    ON alertas(estado, prioridad)""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_recordatorios_fecha_hora
+                    ON recordatorios(fecha_recordatorio, hora_recordatorio)""")
+    conn.execute("""CREATE INDEX IF NOT EXISTS idx_historial_accesos_usuario_fecha
+                    ON historial_accesos(usuario_id, fecha)""")
+    conn.execute("ANALYZE")
+
+
+def m004_glucemia_unica(conn):
+    # Una lectura por paciente e instante: la ingesta por lotes descarta duplicados
+    # (crear-db.py volvía a insertar sus registros de ejemplo en cada ejecución)
+    conn.execute("""DELETE FROM registros_glucemia WHERE id NOT IN (
+                        SELECT MIN(id) FROM registros_glucemia GROUP BY paciente_id, fecha_medicion)""")
+    conn.execute("""CREATE UNIQUE INDEX IF NOT EXISTS uq_registros_glucemia_paciente_fecha
+                    ON registros_glucemia(paciente_id, fecha_medicion)""")
+
+
+def m005_resumenes_glucemia(conn):
+    # Sumas por paciente e intervalo (ver glucemia_resumen.py); la clave
+    # primaria ordena por (paciente, inicio), que es como se leen las gráficas
+    for tabla in ("glucemia_resumen_hora", "glucemia_resumen_dia"):
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {tabla} (
+            paciente_id INTEGER NOT NULL,
+            inicio TEXT NOT NULL,             -- AAAA-MM-DD HH:00:00 (hora) o AAAA-MM-DD 00:00:00 (día)
+            n INTEGER NOT NULL,
+            suma REAL NOT NULL,
+            suma_cuadrados REAL NOT NULL,
+            minimo REAL NOT NULL,
+            maximo REAL NOT NULL,
+            n_bajo INTEGER NOT NULL,          -- lecturas bajo la meta del paciente
+            n_rango INTEGER NOT NULL,
+            n_alto INTEGER NOT NULL,
+            PRIMARY KEY (paciente_id, inicio)
+        ) WITHOUT ROWID
+        """)
+    from glucemia_resumen import recalcular
+    recalcular(conn)
+
+
+def m006_estadisticas(conn):
+    # El ANALYZE de m003 es anterior a la depuración de m004 y a sus índices:
+    # en bases antiguas con lecturas repetidas las estadísticas quedaban
+    # desfasadas y la última lectura del paciente se ordenaba en memoria
+    conn.execute("ANALYZE")
+
+
+def m007_vinculos_clinicos(conn):
+    # Cuentas de la app vinculadas a personal clínico o a pacientes (ver
+    # vinculos_clinicos.py); app_usuario_id es usuarios.id de la base de la app
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS vinculos_clinicos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        app_usuario_id INTEGER NOT NULL,
+        clinico_id INTEGER,
+        paciente_id INTEGER,
+        verificado_por TEXT NOT NULL,      -- credenciales, codigo
+        fecha_vinculo TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        CHECK ((clinico_id IS NULL) <> (paciente_id IS NULL)),
+        FOREIGN KEY (clinico_id) REFERENCES usuarios(id),
+        FOREIGN KEY (paciente_id) REFERENCES pacientes(id)
+    )
+    """)
+    conn.execute("""CREATE UNIQUE INDEX IF NOT EXISTS uq_vinculos_clinicos_clinico
+                    ON vinculos_clinicos(app_usuario_id, clinico_id) WHERE clinico_id IS NOT NULL""")
+    conn.execute("""CREATE UNIQUE INDEX IF NOT EXISTS uq_vinculos_clinicos_paciente
+                    ON vinculos_clinicos(app_usuario_id, paciente_id) WHERE paciente_id IS NOT NULL""")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS codigos_vinculo (
+        codigo_hash TEXT PRIMARY KEY,      -- sha256 del código entregado al paciente
+        paciente_id INTEGER NOT NULL,
+        creado_por INTEGER NOT NULL,       -- cuenta de la app del clínico que lo generó
+        expira TIMESTAMP NOT NULL,
+        usado_por INTEGER,
+        fecha_uso TIMESTAMP,
+        FOREIGN KEY (paciente_id) REFERENCES pacientes(id)
+    )
+    """)
+
+
+MIGRACIONES = [
+    (1, "esquema_base", m001_esquema_base),
+    (2, "completar_columnas", m002_completar_columnas),
+    (3, "indices_rendimiento", m003_indices_rendimiento),
+    (4, "glucemia_unica", m004_glucemia_unica),
+    (5, "resumenes_glucemia", m005_resumenes_glucemia),
+    (6, "estadisticas", m006_estadisticas),
+    (7, "vinculos_clinicos", m007_vinculos_clinicos),
+]
+
+# ==========================================
+# ▶️ EJECUCIÓN
+# ==========================================
+def _crear_registro(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS migraciones (
+        version INTEGER PRIMARY KEY,
+        nombre TEXT NOT NULL,
+        fecha_aplicacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+def versiones_aplicadas(conn):
+    _crear_registro(conn)
+    return {fila[0] for fila in conn.execute("SELECT version FROM migraciones")}
+
+
+def pendientes(conn):
+    aplicadas = versiones_aplicadas(conn)
+    return [m for m in MIGRACIONES if m[0] not in aplicadas]
+
+
+def aplicar(conn):
+    """Aplica las migraciones pendientes en orden; devuelve las versiones aplicadas
+
+    Cada migración corre en una transacción explícita (incluido su DDL): si
+    falla, la base queda en la versión anterior y la excepción se propaga.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    aislamiento = conn.isolation_level
+    conn.isolation_level = None
+    hechas = []
+    try:
+        for version, nombre, migrar in pendientes(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Otro proceso pudo aplicarla mientras esperábamos el bloqueo
+                if conn.execute("SELECT 1 FROM migraciones WHERE version = ?", (version,)).fetchone():
+                    conn.execute("ROLLBACK")
+                    continue
+                migrar(conn)
+                conn.execute("INSERT INTO migraciones (version, nombre) VALUES (?, ?)", (version, nombre))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"✅ Migración {version:03d} {nombre} aplicada")
+            hechas.append(version)
+    finally:
+        conn.isolation_level = aislamiento
+    return hechas
+
+
+# ==========================================
+# 🔎 PLANES DE LAS CONSULTAS CRÍTICAS
+# ==========================================
+# (nombre, SQL, parámetros de ejemplo, índice que debe usar; "PRIMARY KEY" en
+# las tablas WITHOUT ROWID). Si una consulta
+# deja de usar su índice (p. ej. alguien lo borra o cambia el WHERE), el
+# comando `verificar` termina con error.
+CONSULTAS_CRITICAS = [
+    ("glucemia_serie_paciente",
+     "SELECT fecha_medicion, nivel_glucosa FROM registros_glucemia "
+     "WHERE paciente_id = ? AND fecha_medicion >= ? ORDER BY fecha_medicion",
+     (1, "2024-01-01"), "idx_registros_glucemia_paciente_fecha"),
+    ("glucemia_ultima_paciente",
+     "SELECT fecha_medicion, nivel_glucosa FROM registros_glucemia "
+     "WHERE paciente_id = ? ORDER BY fecha_medicion DESC LIMIT 1",
+     (1,), "idx_registros_glucemia_paciente_fecha"),
+    ("tratamientos_activos_paciente",
+     "SELECT * FROM tratamientos WHERE paciente_id = ? AND estado = 'activo'",
+     (1,), "idx_tratamientos_paciente"),
+    ("alertas_pendientes_prioridad",
+     "SELECT id, paciente_id, mensaje FROM alertas WHERE estado = ? AND prioridad IN ('alta', 'critica')",
+     ("pendiente",), "idx_alertas_estado_prioridad"),
+    ("recordatorios_del_dia",
+     "SELECT id, paciente_id, titulo FROM recordatorios "
+     "WHERE fecha_recordatorio = ? AND hora_recordatorio <= ? ORDER BY hora_recordatorio",
+     ("2024-01-20", "12:00"), "idx_recordatorios_fecha_hora"),
+    ("accesos_recientes_usuario",
+     "SELECT metodo, exito, fecha FROM historial_accesos WHERE usuario_id = ? ORDER BY fecha DESC LIMIT 20",
+     (1,), "idx_historial_accesos_usuario_fecha"),
+    ("resumen_diario_paciente",
+     "SELECT inicio, n, suma, suma_cuadrados, minimo, maximo, n_bajo, n_rango, n_alto FROM glucemia_resumen_dia "
+     "WHERE paciente_id = ? AND inicio >= ? AND inicio < ? ORDER BY inicio",
+     (1, "2024-01-01", "2024-04-01"), "PRIMARY KEY"),
+    ("resumen_horario_paciente",
+     "SELECT inicio, n, suma, suma_cuadrados, minimo, maximo, n_bajo, n_rango, n_alto FROM glucemia_resumen_hora "
+     "WHERE paciente_id = ? AND inicio >= ? AND inicio < ? ORDER BY inicio",
+     (1, "2024-01-01", "2024-01-08"), "PRIMARY KEY"),
+]
+
+
+def plan(conn, sql, parametros=()):
+    """Líneas de EXPLAIN QUERY PLAN (columna detail)"""
+    return [fila[3] for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros)]
+
+
+def verificar_planes(conn):
+    """(nombre, plan, problema) de cada consulta crítica; problema es None si usa su índice"""
+    resultados = []
+    for nombre, sql, parametros, indice in CONSULTAS_CRITICAS:
+        detalle = plan(conn, sql, parametros)
+        problema = None
+        if not any(f"INDEX {indice}" in d or f"USING {indice}" in d for d in detalle):
+            problema = f"no usa {indice}"
+        elif any(d.startswith("SCAN") or "TEMP B-TREE" in d for d in detalle):
+            problema = "recorre la tabla u ordena en memoria"
+        resultados.append((nombre, detalle, problema))
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migraciones versionadas de sistema_diabetes.db")
+    parser.add_argument("accion", choices=["aplicar", "estado", "verificar"])
+    parser.add_argument("--db", default=DB_PATH, help="Base de datos a migrar")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    conn = sqlite3.connect(args.db)
+    if args.accion == "aplicar":
+        hechas = aplicar(conn)
+        print(f"🧱 Versión {max(versiones_aplicadas(conn), default=0)} "
+              f"({len(hechas)} migraciones aplicadas ahora)")
+    elif args.accion == "estado":
+        aplicadas = versiones_aplicadas(conn)
+        for version, nombre, _ in MIGRACIONES:
+            print(f"  {'✅' if version in aplicadas else '⏳'} {version:03d} {nombre}")
+    else:
+        if pendientes(conn):
+            print("⚠️  Hay migraciones pendientes: ejecuta python migraciones.py aplicar")
+        fallas = 0
+        for nombre, detalle, problema in verificar_planes(conn):
+            print(f"  {'❌' if problema else '✅'} {nombre}: {' | '.join(detalle)}")
+            if problema:
+                print(f"     {problema}")
+                fallas += 1
+        conn.close()
+        sys.exit(1 if fallas else 0)
+    conn.close()
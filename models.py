@@ -1,12 +1,13 @@
 # models.py
-import sqlite3
 import os
 from datetime import datetime, timedelta
 import secrets
 from config import DATABASE_PATH, TOKEN_EXPIRATION_HOURS
+from db_pool import obtener_pool
 
 def conectar_db():
-    return sqlite3.connect(DATABASE_PATH)
+    # Conexión del pool compartido (close() la devuelve)
+    return obtener_pool(DATABASE_PATH).conectar()
 
 def crear_tabla_tokens():
     """Crear tabla para tokens de recuperación si no existe"""
@@ -0,0 +1,202 @@
+# reenrolamiento.py
+# Re-enrolamiento offline: regenera todas las plantillas faciales con el
+# preprocesado actual (FACE_TEMPLATE_VERSION), en paralelo, y publica la
+# versión nueva de forma atómica. Si se interrumpe, al volver a ejecutarlo
+# continúa donde quedó.
+#
+# Los ejemplares (varias muestras por usuario) se vuelven a derivar de sus
+# recortes de origen (face_ejemplares.recortes) y la plantilla del usuario es
+# su centroide, igual que en la app. Quien no tiene ejemplares se regenera
+# desde el recorte register_*.jpg de usuarios.face_path. Un ejemplar sin
+# recortes guardados cuenta como fallo: no se publica sin --permitir-fallos.
+#
+#   python reenrolamiento.py --procesos 4
+#   python reenrolamiento.py --sin-publicar     # generar o reanudar sin activar
+import os
+import time
+import argparse
+import multiprocessing as mp
+import cv2
+
+from face_muestras import centroide, leer_recortes
+from face_preproceso import FACE_TEMPLATE_VERSION, preprocesar_rostro, nombre_store_facial, publicar_version
+from template_store import TemplateStore
+
+
+# ==========================================
+# 👷 TRABAJO POR IMAGEN (en los procesos del pool)
+# ==========================================
+def procesar_imagen(tarea):
+    """(clave, rutas separadas por TAB) -> (clave, rutas, plantilla o None, error)
+
+    Con varias rutas (los recortes de un ejemplar) la plantilla es su centroide.
+    """
+    clave, path = tarea
+    plantillas, error = [], "imagen no encontrada o ilegible"
+    for ruta in (path or "").split("\t"):
+        img = cv2.imread(ruta) if ruta and os.path.exists(ruta) else None
+        if img is None:
+            continue
+        try:
+            plantillas.append(preprocesar_rostro(img))
+        except Exception as e:
+            error = str(e)
+    if not plantillas:
+        return clave, path, None, error
+    return clave, path, plantillas[0] if len(plantillas) == 1 else centroide(plantillas), None
+
+
+# ==========================================
+# 🧾 ORIGEN DE CADA PLANTILLA (para reanudar)
+# ==========================================
+# <almacén>.origen guarda "clave<TAB>face_path" por plantilla escrita (o las
+# rutas de los recortes, para los ejemplares). Una clave se vuelve a procesar
+# si falta en el almacén o si su origen cambió (el usuario volvió a registrar
+# su rostro mientras corría el trabajo).
+def leer_origen(path):
+    origen = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for linea in f:
+                if linea.endswith("\n") and "\t" in linea:
+                    clave, face_path = linea.rstrip("\n").split("\t", 1)
+                    origen[clave] = face_path
+    return origen
+
+
+def pendientes(usuarios, store, origen, omitir=()):
+    return [(clave, path) for clave, path in usuarios
+            if (clave not in store or origen.get(clave) != path) and (clave, path) not in omitir]
+
+
+def reenrolar(tareas, store, origen, origen_path, procesos, lote, cada_seg):
+    """Procesa las tareas en paralelo; un solo escritor (este proceso) en el almacén"""
+    total = len(tareas)
+    hechas, fallidas = 0, []
+    inicio = ultimo = time.perf_counter()
+    contexto = mp.get_context("spawn")
+    with contexto.Pool(procesos) as pool, open(origen_path, "a", encoding="utf-8") as registro:
+        for clave, path, plantilla, error in pool.imap_unordered(procesar_imagen, tareas, chunksize=lote):
+            if plantilla is None:
+                fallidas.append((clave, path, error))
+            else:
+                store.agregar(clave, plantilla)
+                registro.write(f"{clave}\t{path}\n")
+                registro.flush()
+                origen[clave] = path
+            hechas += 1
+
+            ahora = time.perf_counter()
+            if ahora - ultimo >= cada_seg or hechas == total:
+                ultimo = ahora
+                ritmo = hechas / (ahora - inicio)
+                eta = (total - hechas) / ritmo if ritmo else 0
+                print(f"🔄 {hechas}/{total} ({hechas / total:.1%}) · {ritmo:.1f} plantillas/s · "
+                      f"{len(fallidas)} fallidas · ETA {eta:.0f}s")
+    return hechas, fallidas, time.perf_counter() - inicio
+
+
+if __name__ == "__main__":
+    from app import conectar_db, TEMPLATES_FOLDER, FACE_TEMPLATE_VERSION_ACTIVA, FACE_EJEMPLARES_MAX, _template_key
+
+    parser = argparse.ArgumentParser(description="Regenera todas las plantillas faciales en paralelo")
+    parser.add_argument("--version", default=FACE_TEMPLATE_VERSION,
+                        help="Versión de plantillas a generar (la del preprocesado actual)")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--lote", type=int, default=16, help="Imágenes por envío a cada proceso")
+    parser.add_argument("--cada", type=float, default=2.0, help="Segundos entre reportes de progreso")
+    parser.add_argument("--sin-publicar", action="store_true", help="No activar la versión al terminar")
+    parser.add_argument("--permitir-fallos", action="store_true",
+                        help="Publicar aunque algunos usuarios no tengan imagen utilizable "
+                             "(los ejemplares que no se puedan regenerar se descartan)")
+    args = parser.parse_args()
+
+    store = TemplateStore(TEMPLATES_FOLDER, nombre_store_facial(args.version))
+    origen_path = os.path.join(TEMPLATES_FOLDER, f"{store.nombre}.origen")
+    origen = leer_origen(origen_path)
+    store_ejemplares = TemplateStore(TEMPLATES_FOLDER, f"{store.nombre}_ejemplares")
+    origen_ejemplares_path = os.path.join(TEMPLATES_FOLDER, f"{store_ejemplares.nombre}.origen")
+    origen_ejemplares = leer_origen(origen_ejemplares_path)
+    print(f"🧼 Re-enrolamiento {FACE_TEMPLATE_VERSION_ACTIVA} → {args.version}: "
+          f"{len(store)} plantillas ya generadas, {args.procesos} procesos")
+
+    # Varias pasadas: la segunda recoge usuarios registrados durante la primera
+    fallidas, omitir = [], set()
+    hechas_total, duracion_total = 0, 0.0
+    for pasada in range(3):
+        conn = conectar_db()
+        filas = conn.execute("SELECT correo, face_path FROM usuarios WHERE face_path IS NOT NULL").fetchall()
+        conn.close()
+
+        # 1) Ejemplares de la versión activa, desde sus recortes de origen
+        activos = TemplateStore(TEMPLATES_FOLDER, f"{nombre_store_facial(FACE_TEMPLATE_VERSION_ACTIVA)}_ejemplares")
+        recortes = leer_recortes(TEMPLATES_FOLDER)
+        ejemplares = {}
+        for f in filas:
+            clave = _template_key(f["correo"])
+            for n in range(FACE_EJEMPLARES_MAX):
+                if f"{clave}#{n}" not in activos:
+                    break
+                ejemplares.setdefault(clave, []).append(f"{clave}#{n}")
+        tareas_ejemplares = []
+        for clave_ejemplar in (k for claves in ejemplares.values() for k in claves):
+            if clave_ejemplar in recortes:
+                tareas_ejemplares.append((clave_ejemplar, "\t".join(recortes[clave_ejemplar])))
+            elif (clave_ejemplar, None) not in omitir:
+                fallidas.append((clave_ejemplar, None, "ejemplar sin recortes de origen guardados"))
+                omitir.add((clave_ejemplar, None))
+        tareas_ejemplares = pendientes(tareas_ejemplares, store_ejemplares, origen_ejemplares, omitir)
+        if tareas_ejemplares:
+            print(f"📋 Pasada {pasada + 1}: {len(tareas_ejemplares)} ejemplares pendientes")
+            hechas, nuevas_fallidas, duracion = reenrolar(tareas_ejemplares, store_ejemplares, origen_ejemplares,
+                                                          origen_ejemplares_path, args.procesos, args.lote, args.cada)
+            hechas_total += hechas
+            duracion_total += duracion
+            fallidas.extend(nuevas_fallidas)
+            omitir.update((clave, path) for clave, path, _ in nuevas_fallidas)
+
+        # 2) Plantillas desde face_path para quien no tiene ejemplares regenerables
+        claves_fallidas = {clave for clave, _, _ in fallidas}
+
+        def regenerables(clave):
+            claves = ejemplares.get(clave, [])
+            return bool(claves) and not claves_fallidas.intersection(claves)
+
+        tareas = pendientes([(_template_key(f["correo"]), f["face_path"]) for f in filas
+                             if not regenerables(_template_key(f["correo"]))], store, origen, omitir)
+        if tareas:
+            print(f"📋 Pasada {pasada + 1}: {len(tareas)} de {len(filas)} usuarios pendientes")
+            hechas, nuevas_fallidas, duracion = reenrolar(tareas, store, origen, origen_path,
+                                                          args.procesos, args.lote, args.cada)
+            hechas_total += hechas
+            duracion_total += duracion
+            fallidas.extend(nuevas_fallidas)
+            omitir.update((clave, path) for clave, path, _ in nuevas_fallidas)
+
+        # 3) La plantilla de quien tiene ejemplares es su centroide, como en la app
+        for clave, claves in ejemplares.items():
+            nuevos = [store_ejemplares.obtener(k) for k in claves]
+            if regenerables(clave) and all(v is not None for v in nuevos):
+                store.agregar(clave, centroide(nuevos))
+        if not tareas_ejemplares and not tareas:
+            break
+
+    if duracion_total:
+        print(f"✅ {hechas_total} imágenes procesadas en {duracion_total:.1f}s "
+              f"({hechas_total / duracion_total:.1f} plantillas/s)")
+    for clave, path, error in fallidas[:20]:
+        print(f"  ❌ {clave}: {error} ({path})")
+    if len(fallidas) > 20:
+        print(f"  ... y {len(fallidas) - 20} más")
+
+    if args.sin_publicar:
+        print(f"⏸️  Versión {args.version} generada sin publicar")
+    elif fallidas and not args.permitir_fallos:
+        print(f"⚠️  {len(fallidas)} plantillas o ejemplares sin regenerar: no se publica "
+              f"(corrige las imágenes o usa --permitir-fallos)")
+        raise SystemExit(1)
+    else:
+        publicar_version(TEMPLATES_FOLDER, args.version)
+        print(f"🚀 Versión de plantillas {args.version} activa. Reinicia los workers; "
+              f"con FACE_PCA_ACTIVO reentrena la PCA (python face_pca.py) y con "
+              f"FACE_INDICE_COMPARTIDO reconstruye el segmento (python face_shared.py)")
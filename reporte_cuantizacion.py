@@ -0,0 +1,105 @@
+# reporte_cuantizacion.py
+# Compara la identificación con plantillas compactas (float16 / int8) contra
+# la similitud coseno float32 de compare_face_templates.
+import os
+import json
+import argparse
+import numpy as np
+
+import config
+from face_index import FaceIndex, FACE_THRESHOLD
+from template_store import TemplateStore
+from face_preproceso import nombre_store_facial, version_activa
+
+TEMPLATES_FOLDER = os.path.join(config.BASE_DIR, "biometric_data", "templates")
+
+
+def _normalizar_filas(matriz):
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return (matriz / normas).astype("float32")
+
+
+def construir_conjunto(n_galeria, n_consultas, dim, ruido, semilla):
+    """Galería (plantillas del almacén completadas con sintéticas) y consultas ruidosas"""
+    rng = np.random.default_rng(semilla)
+    # Plantillas de la versión activa, las mismas que sirve la app
+    store = TemplateStore(TEMPLATES_FOLDER, nombre_store_facial(version_activa(TEMPLATES_FOLDER)))
+    reales = [vec for _, vec in store.items()] if store.dim == dim else []
+    galeria = np.empty((n_galeria, dim), dtype="float32")
+    n_reales = min(len(reales), n_galeria)
+    if n_reales:
+        galeria[:n_reales] = np.stack(reales[:n_reales])
+    galeria[n_reales:] = rng.standard_normal((n_galeria - n_reales, dim))
+    galeria = _normalizar_filas(galeria)
+
+    # Cada consulta simula una nueva captura de un usuario inscrito
+    verdad = rng.integers(0, n_galeria, n_consultas)
+    consultas = galeria[verdad] + ruido * rng.standard_normal((n_consultas, dim)).astype("float32") / np.sqrt(dim)
+    return galeria, _normalizar_filas(consultas), n_reales
+
+
+def evaluar(galeria, consultas, modo, rerank):
+    """Resultado de un modo frente a la referencia float32 exhaustiva"""
+    correos = [f"u{i}" for i in range(len(galeria))]
+    completa = dict(zip(correos, galeria))
+    indice = FaceIndex(cuantizacion=modo, rerank=rerank,
+                       cargar_completa=completa.get if modo else None)
+    indice.cargar(zip(correos, galeria))
+
+    # Referencia: mismo coseno que compare_face_templates, vectorizado
+    referencia = consultas @ galeria.T
+    ref_top = np.argmax(referencia, axis=1)
+    ref_score = referencia[np.arange(len(consultas)), ref_top]
+
+    coincide_top1 = coincide_decision = 0
+    errores = []
+    for i, vec in enumerate(consultas):
+        mejor = indice.buscar(vec, k=1)[0]
+        fila = int(mejor[0][1:])
+        coincide_top1 += fila == ref_top[i]
+        coincide_decision += (mejor[1] > FACE_THRESHOLD) == (ref_score[i] > FACE_THRESHOLD)
+        errores.append(abs(mejor[1] - ref_score[i]))
+
+    # Error del puntaje grueso (sin re-ranqueo) sobre toda la galería
+    gruesa = FaceIndex(cuantizacion=modo)
+    gruesa.cargar(zip(correos, galeria))
+    error_grueso = np.abs(np.stack([gruesa._puntuar(v) for v in consultas[:50]]) - referencia[:50])
+
+    n = len(consultas)
+    return {
+        "modo": modo or "float32",
+        "bytes_por_plantilla": indice.bytes_por_plantilla,
+        "coincidencia_top1": coincide_top1 / n,
+        "coincidencia_decision_umbral": coincide_decision / n,
+        "error_max_score_final": float(np.max(errores)),
+        "error_medio_score_grueso": float(np.mean(error_grueso)),
+        "error_max_score_grueso": float(np.max(error_grueso)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reporte de precisión de plantillas faciales cuantizadas")
+    parser.add_argument("--galeria", type=int, default=2000)
+    parser.add_argument("--consultas", type=int, default=300)
+    parser.add_argument("--dim", type=int, default=10000)
+    parser.add_argument("--ruido", type=float, default=1.0, help="Desviación del ruido de captura (norma relativa)")
+    parser.add_argument("--rerank", type=int, default=getattr(config, "FACE_RERANK", 10))
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--json", help="Ruta donde guardar el reporte")
+    args = parser.parse_args()
+
+    galeria, consultas, n_reales = construir_conjunto(
+        args.galeria, args.consultas, args.dim, args.ruido, args.semilla)
+    print(f"📋 Galería: {len(galeria)} plantillas ({n_reales} reales), {len(consultas)} consultas")
+
+    resultados = [evaluar(galeria, consultas, modo, args.rerank) for modo in (None, "float16", "int8")]
+    for r in resultados:
+        print(f"  {r['modo']:>8}: {r['bytes_por_plantilla']:>6} B/plantilla | "
+              f"top-1 {r['coincidencia_top1']:.2%} | decisión {r['coincidencia_decision_umbral']:.2%} | "
+              f"error grueso medio {r['error_medio_score_grueso']:.5f} (máx {r['error_max_score_grueso']:.5f})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2)
+        print(f"✅ Reporte guardado en {args.json}")
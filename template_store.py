@@ -0,0 +1,306 @@
+# template_store.py
+import os
+import glob
+import threading
+import zlib
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo hay un proceso escritor posible
+    fcntl = None
+
+# ==========================================
+# 🗄️ ALMACÉN EMPAQUETADO DE PLANTILLAS (np.memmap)
+# ==========================================
+# Formato en disco (por tipo de plantilla, p. ej. "face" o "voice"):
+#   <nombre>.idx  -> cabecera + registros "clave slot crc32" (solo se agregan)
+#   <nombre>.<gen>.dat -> registros float32 de ancho fijo (dim valores c/u)
+#   <nombre>.lock -> candado fcntl de los escritores (varios workers)
+#
+# Una escritura primero escribe el vector en su slot del .dat (fsync) y
+# después agrega la línea al .idx (fsync), todo con el candado tomado. Si el
+# proceso muere a medias, la línea final incompleta se descarta y el slot
+# huérfano se reutiliza. Un registro completo con CRC inválido o que apunta
+# más allá del .dat se ignora sin afectar a los demás. slot = -1 marca una
+# eliminación.
+
+CABECERA = "TPLSTORE"
+VERSION = 1
+
+
+class TemplateStore:
+    """Plantillas de ancho fijo en un solo archivo mapeado en memoria"""
+
+    def __init__(self, carpeta, nombre, dim=None):
+        self.carpeta = carpeta
+        self.nombre = nombre
+        self.idx_path = os.path.join(carpeta, f"{nombre}.idx")
+        self.lock_path = os.path.join(carpeta, f"{nombre}.lock")
+        self.dim = dim
+        self.generacion = 0
+        self._lock = threading.RLock()
+        self._slots = {}
+        self._n_slots = 0
+        self._idx_offset = 0
+        self._idx_ino = None
+        self._mmap = None
+        self._escritura = None
+        self._profundidad = 0
+        os.makedirs(carpeta, exist_ok=True)
+        self._abrir()
+
+    # ---------- rutas y cabecera ----------
+    def _dat_path(self, generacion=None):
+        gen = self.generacion if generacion is None else generacion
+        return os.path.join(self.carpeta, f"{self.nombre}.{gen}.dat")
+
+    def _linea_cabecera(self):
+        return f"{CABECERA} {VERSION} dim={self.dim} gen={self.generacion}\n"
+
+    @staticmethod
+    def _crc(vec):
+        return zlib.crc32(np.ascontiguousarray(vec, dtype="float32").tobytes())
+
+    @contextmanager
+    def escritura(self):
+        """Candado exclusivo entre procesos (reentrante dentro del proceso)"""
+        with self._lock:
+            if self._profundidad == 0 and fcntl is not None:
+                self._escritura = open(self.lock_path, "a+b")
+                fcntl.flock(self._escritura.fileno(), fcntl.LOCK_EX)
+            self._profundidad += 1
+            try:
+                yield
+            finally:
+                self._profundidad -= 1
+                if self._profundidad == 0 and self._escritura is not None:
+                    fcntl.flock(self._escritura.fileno(), fcntl.LOCK_UN)
+                    self._escritura.close()
+                    self._escritura = None
+
+    def _descartar_cola_idx(self):
+        """Elimina la línea final incompleta de un escritor caído (con el candado tomado)
+
+        refrescar() solo se detiene antes de una línea sin salto de línea, así
+        que lo que queda después de _idx_offset es únicamente esa línea.
+        """
+        if os.path.exists(self.idx_path) and os.path.getsize(self.idx_path) > self._idx_offset:
+            with open(self.idx_path, "ab") as f:
+                f.truncate(self._idx_offset)
+
+    @staticmethod
+    def _fsync_append(path, datos):
+        with open(path, "ab") as f:
+            f.write(datos)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _fsync_escribir(path, offset, datos):
+        """Escribe en una posición fija sin truncar: el .dat nunca se encoge
+        mientras otros procesos lo tienen mapeado"""
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            f.seek(offset)
+            f.write(datos)
+            f.flush()
+            os.fsync(f.fileno())
+
+    # ---------- apertura / refresco ----------
+    def _abrir(self):
+        with self._lock:
+            self._slots = {}
+            self._n_slots = 0
+            self._idx_offset = 0
+            self._mmap = None
+            if not os.path.exists(self.idx_path):
+                return
+            with open(self.idx_path, "rb") as f:
+                cabecera = f.readline().decode("utf-8").split()
+                if len(cabecera) < 4 or cabecera[0] != CABECERA:
+                    raise ValueError(f"Cabecera inválida en {self.idx_path}")
+                self.dim = int(cabecera[2].split("=")[1])
+                self.generacion = int(cabecera[3].split("=")[1])
+                self._idx_offset = f.tell()
+                self._idx_ino = os.fstat(f.fileno()).st_ino
+            self.refrescar()
+
+    def refrescar(self):
+        """Lee las entradas nuevas del .idx (escritas por otro proceso o hilo)"""
+        with self._lock:
+            if not os.path.exists(self.idx_path):
+                return False
+            st = os.stat(self.idx_path)
+            if self._idx_ino is None or st.st_ino != self._idx_ino:
+                # Otro proceso creó o compactó el almacén: releer desde cero
+                self._abrir()
+                return True
+            if st.st_size <= self._idx_offset:
+                return False
+            dat = self._dat_path()
+            try:
+                filas_dat = os.path.getsize(dat) // (4 * self.dim) if os.path.exists(dat) else 0
+                datos = None
+                if filas_dat:
+                    datos = np.memmap(dat, dtype="float32", mode="r", shape=(filas_dat, self.dim))
+            except (OSError, ValueError):
+                return False  # .dat reemplazado por una compactación: se reintenta en la próxima lectura
+
+            with open(self.idx_path, "rb") as f:
+                f.seek(self._idx_offset)
+                for linea in f:
+                    if not linea.endswith(b"\n"):
+                        break  # escritura incompleta
+                    self._idx_offset += len(linea)
+                    try:
+                        clave, slot, crc = linea.decode("utf-8").split()
+                        slot, crc = int(slot), int(crc)
+                    except ValueError:
+                        print(f"⚠️ Registro ilegible en {self.idx_path}: {linea[:80]!r}")
+                        continue
+                    if slot < 0:
+                        self._slots.pop(clave, None)
+                        continue
+                    # El slot queda ocupado aunque el registro no sea válido
+                    self._n_slots = max(self._n_slots, slot + 1)
+                    if datos is not None and slot < filas_dat and self._crc(datos[slot]) == crc:
+                        self._slots[clave] = slot
+                    else:
+                        # .dat más corto que el índice o vector dañado: solo se pierde esta clave
+                        print(f"⚠️ Plantilla '{clave}' (slot {slot}) ausente o dañada en {dat}")
+            self._mmap = datos
+            return True
+
+    # ---------- escritura ----------
+    def agregar(self, clave, vec):
+        """Agrega (o reemplaza) la plantilla de una clave de forma segura ante caídas"""
+        vec = np.ascontiguousarray(vec, dtype="float32").ravel()
+        with self.escritura():
+            self.refrescar()
+            if self.dim is None:
+                self.dim = vec.shape[0]
+            if vec.shape[0] != self.dim:
+                raise ValueError(f"Dimensión {vec.shape[0]} distinta de la del almacén ({self.dim})")
+            if not os.path.exists(self.idx_path):
+                self._fsync_append(self.idx_path, self._linea_cabecera().encode("utf-8"))
+                self._idx_offset = os.path.getsize(self.idx_path)
+                self._idx_ino = os.stat(self.idx_path).st_ino
+            self._descartar_cola_idx()
+
+            slot = self._n_slots
+            # Sobrescribe los bytes huérfanos que haya dejado una escritura interrumpida
+            self._fsync_escribir(self._dat_path(), slot * 4 * self.dim, vec.tobytes())
+            self._fsync_append(self.idx_path, f"{clave} {slot} {self._crc(vec)}\n".encode("utf-8"))
+            self.refrescar()
+        return slot
+
+    def eliminar(self, clave):
+        with self.escritura():
+            self.refrescar()
+            if clave not in self._slots:
+                return False
+            self._descartar_cola_idx()
+            self._fsync_append(self.idx_path, f"{clave} -1 0\n".encode("utf-8"))
+            self.refrescar()
+        return True
+
+    def compactar(self):
+        """Reescribe solo las plantillas vigentes en una nueva generación del .dat"""
+        with self.escritura():
+            self.refrescar()
+            if self.dim is None:
+                return 0
+            claves = list(self._slots)
+            nueva_gen = self.generacion + 1
+            nuevo_dat = self._dat_path(nueva_gen)
+            with open(nuevo_dat, "wb") as f:
+                for clave in claves:
+                    f.write(np.asarray(self._mmap[self._slots[clave]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            viejo_dat = self._dat_path()
+            tmp_idx = f"{self.idx_path}.tmp"
+            self.generacion = nueva_gen
+            with open(tmp_idx, "wb") as f:
+                f.write(self._linea_cabecera().encode("utf-8"))
+                for slot, clave in enumerate(claves):
+                    vec = self._mmap[self._slots[clave]]
+                    f.write(f"{clave} {slot} {self._crc(vec)}\n".encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            # El reemplazo del .idx es el punto de confirmación de la compactación
+            self._mmap = None
+            os.replace(tmp_idx, self.idx_path)
+            self._abrir()
+            try:
+                os.remove(viejo_dat)
+            except OSError:
+                pass
+            print(f"🗜️  Almacén {self.nombre} compactado: {len(claves)} plantillas")
+            return len(claves)
+
+    # ---------- lectura ----------
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, clave):
+        return clave in self._slots
+
+    def obtener(self, clave):
+        """Copia de la plantilla o None"""
+        with self._lock:
+            slot = self._slots.get(clave)
+            if slot is None:
+                self.refrescar()
+                slot = self._slots.get(clave)
+            if slot is None:
+                return None
+            return np.array(self._mmap[slot])
+
+    def items(self):
+        """Lista de (clave, vista de solo lectura) de las plantillas vigentes"""
+        with self._lock:
+            self.refrescar()
+            return [(clave, self._mmap[slot]) for clave, slot in self._slots.items()]
+
+
+# ==========================================
+# 🔁 MIGRACIÓN DESDE ARCHIVOS .npy SUELTOS
+# ==========================================
+def migrar_npy(store, carpeta_origen, prefijo, borrar=False):
+    """Importa <prefijo>_<clave>.npy al almacén (una sola vez por clave)"""
+    importadas = 0
+    for archivo in sorted(glob.glob(os.path.join(carpeta_origen, f"{prefijo}_*.npy"))):
+        clave = os.path.basename(archivo)[len(prefijo) + 1:-len(".npy")]
+        if clave in store:
+            continue
+        try:
+            store.agregar(clave, np.load(archivo))
+            importadas += 1
+            if borrar:
+                os.remove(archivo)
+        except Exception as e:
+            print(f"❌ Error migrando {archivo}: {e}")
+    print(f"✅ {importadas} plantillas '{prefijo}' migradas a {store.idx_path}")
+    return importadas
+
+
+if __name__ == "__main__":
+    import argparse
+    import config
+
+    templates_folder = os.path.join(config.BASE_DIR, "biometric_data", "templates")
+    parser = argparse.ArgumentParser(description="Administra el almacén empaquetado de plantillas")
+    parser.add_argument("accion", choices=["migrar", "compactar"])
+    parser.add_argument("--origen", default=templates_folder, help="Carpeta con los .npy a migrar")
+    parser.add_argument("--borrar", action="store_true", help="Eliminar los .npy ya migrados")
+    args = parser.parse_args()
+
+    for nombre, prefijo in (("face_templates", "face_template"), ("voice_templates", "voice_template")):
+        store = TemplateStore(templates_folder, nombre)
+        if args.accion == "migrar":
+            migrar_npy(store, args.origen, prefijo, borrar=args.borrar)
+        else:
+            store.compactar()
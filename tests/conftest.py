@@ -0,0 +1,6 @@
+# conftest.py
+import os
+import sys
+
+# Los módulos de la app viven en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,56 @@
+# test_biometric_pool.py
+import threading
+import time
+
+import pytest
+
+from biometric_pool import ColaBiometricaLlena, PoolBiometrico, TiempoBiometricoAgotado
+
+
+def test_sin_cupo_rechaza_de_inmediato_con_retry_after():
+    pool = PoolBiometrico(trabajadores=1, max_cola=1, timeout=5.0, retry_after=7)
+    liberar = threading.Event()
+    ocupado = threading.Event()
+
+    def bloquear():
+        ocupado.set()
+        liberar.wait(5)
+        return "ok"
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(pool.ejecutar(bloquear))) for _ in range(2)]
+    hilos[0].start()
+    ocupado.wait(5)
+    hilos[1].start()  # queda en la cola
+    while pool.estadisticas()["en_cola"] < 1:
+        time.sleep(0.01)
+
+    with pytest.raises(ColaBiometricaLlena) as error:
+        pool.ejecutar(lambda: "no llega")
+    assert error.value.retry_after == 7
+
+    liberar.set()
+    for hilo in hilos:
+        hilo.join()
+    datos = pool.estadisticas()
+    assert resultados == ["ok", "ok"]
+    assert (datos["completados"], datos["rechazados"], datos["en_cola"], datos["en_ejecucion"]) == (2, 1, 0, 0)
+    # Los cupos se liberan al terminar
+    assert pool.ejecutar(lambda: 3) == 3
+
+
+def test_trabajo_lento_agota_el_tiempo():
+    pool = PoolBiometrico(trabajadores=1, max_cola=0, timeout=0.05, retry_after=3)
+    liberar = threading.Event()
+    with pytest.raises(TiempoBiometricoAgotado) as error:
+        pool.ejecutar(liberar.wait, 5)
+    assert error.value.retry_after == 3
+    liberar.set()
+    assert pool.estadisticas()["timeouts"] == 1
+
+
+def test_errores_del_trabajo_se_propagan():
+    pool = PoolBiometrico(trabajadores=1)
+    with pytest.raises(ZeroDivisionError):
+        pool.ejecutar(lambda: 1 / 0)
+    assert pool.estadisticas()["errores"] == 1
@@ -0,0 +1,47 @@
+# test_db_pool.py
+import threading
+
+from db_pool import PoolSQLite
+
+
+def test_devolver_revierte_y_reutiliza(tmp_path):
+    pool = PoolSQLite(str(tmp_path / "t.db"), tamano=1)
+    conn = pool.conectar()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.close()
+    conn.close()  # idempotente
+
+    conn = pool.conectar()
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    conn.close()
+    datos = pool.estadisticas()
+    assert (datos["abiertas"], datos["reutilizadas"], datos["revertidas"], datos["libres"]) == (1, 1, 1, 1)
+
+
+def test_contadores_exactos_con_varios_hilos(tmp_path):
+    pool = PoolSQLite(str(tmp_path / "t.db"), tamano=2)
+    conn = pool.conectar()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    conn.close()
+    hilos, vueltas = 8, 50
+
+    def trabajar():
+        for _ in range(vueltas):
+            conn = pool.conectar()
+            conn.execute("INSERT INTO t VALUES (1)")
+            conn.close()  # sin commit: se revierte al devolverla
+
+    trabajadores = [threading.Thread(target=trabajar) for _ in range(hilos)]
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+
+    datos = pool.estadisticas()
+    prestamos = hilos * vueltas + 1
+    assert datos["revertidas"] == hilos * vueltas
+    assert datos["abiertas"] + datos["reutilizadas"] == prestamos
+    assert datos["abiertas"] - datos["descartadas"] == datos["libres"] <= 2
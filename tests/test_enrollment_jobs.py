@@ -0,0 +1,62 @@
+# test_enrollment_jobs.py
+import sqlite3
+import time
+
+from enrollment_jobs import ColaEnrolamiento
+
+
+def _cola(tmp_path, procesados, **kwargs):
+    ruta = str(tmp_path / "cola.db")
+
+    def conectar():
+        conn = sqlite3.connect(ruta)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def procesar(trabajo, frames, reportar):
+        procesados.append((trabajo["id"], frames))
+        return "ok"
+
+    return ColaEnrolamiento(conectar, procesar, intervalo_sondeo=0.05, **kwargs)
+
+
+def _esperar(cola, trabajo_id, estado, limite=5.0):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if cola.estado(trabajo_id)["estado"] == estado:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_encolar_procesa_y_borra_los_frames(tmp_path):
+    procesados = []
+    cola = _cola(tmp_path, procesados)
+    trabajo_id = cola.encolar(7, "a@x.com", [b"f1", b"f2"])
+
+    assert _esperar(cola, trabajo_id, "completado")
+    assert procesados == [(trabajo_id, [b"f1", b"f2"])]
+    assert cola.estado(trabajo_id)["usuario_id"] == 7
+    conn = cola.conectar()
+    assert conn.execute("SELECT COUNT(*) FROM trabajos_enrolamiento_frames").fetchone()[0] == 0
+    conn.close()
+
+
+def test_abandonados_se_recuperan_con_el_proceso_en_marcha(tmp_path):
+    procesados = []
+    cola = _cola(tmp_path, procesados, abandono_seg=2)
+    cola.iniciar()
+    # Trabajo reclamado por un worker de otro proceso que murió después del arranque
+    conn = cola.conectar()
+    conn.execute("INSERT INTO trabajos_enrolamiento (id, usuario_id, correo, estado, fecha_actualizacion) "
+                 "VALUES ('huerfano', 1, 'b@x.com', 'procesando', datetime('now', '-10 seconds'))")
+    conn.execute("INSERT INTO trabajos_enrolamiento_frames (trabajo_id, orden, datos) VALUES ('huerfano', 0, x'00')")
+    # Y otro que un worker vivo sigue actualizando
+    conn.execute("INSERT INTO trabajos_enrolamiento (id, usuario_id, correo, estado) "
+                 "VALUES ('vivo', 2, 'c@x.com', 'procesando')")
+    conn.commit()
+    conn.close()
+
+    assert _esperar(cola, "huerfano", "completado")
+    assert [t for t, _ in procesados] == ["huerfano"]
+    assert cola.estado("vivo")["estado"] == "procesando"
@@ -0,0 +1,68 @@
+# test_face_index.py
+import numpy as np
+import pytest
+
+from face_index import FaceIndex
+
+DIM = 64
+
+
+@pytest.fixture
+def galeria():
+    rng = np.random.default_rng(0)
+    plantillas = rng.normal(size=(300, DIM)).astype("float32")
+    plantillas /= np.linalg.norm(plantillas, axis=1, keepdims=True)
+    return {f"u{i}@x.com": plantillas[i] for i in range(len(plantillas))}
+
+
+def _exacto(galeria, sonda, k):
+    scores = {c: float(p @ sonda) for c, p in galeria.items()}
+    return sorted(scores.items(), key=lambda cs: -cs[1])[:k]
+
+
+def _sonda(galeria, correo, ruido=0.3, semilla=1):
+    vec = galeria[correo] + ruido * np.random.default_rng(semilla).normal(size=DIM).astype("float32") / np.sqrt(DIM)
+    return vec / np.linalg.norm(vec)
+
+
+def test_top_k_igual_a_la_busqueda_exhaustiva(galeria):
+    indice = FaceIndex()
+    indice.cargar(galeria.items())
+    sonda = _sonda(galeria, "u42@x.com")
+    resultado = indice.buscar(sonda, k=5)
+
+    assert [c for c, _ in resultado] == [c for c, _ in _exacto(galeria, sonda, 5)]
+    assert np.allclose([s for _, s in resultado], [s for _, s in _exacto(galeria, sonda, 5)], atol=1e-5)
+    mejor, _ = indice.identificar(sonda, threshold=0.5)
+    assert mejor[0] == "u42@x.com"
+
+
+def test_agregar_reemplazar_y_eliminar(galeria):
+    indice = FaceIndex()
+    indice.cargar(list(galeria.items())[:3])
+    assert indice.agregar("u0@x.com", galeria["u2@x.com"])
+    assert len(indice) == 3
+    assert indice.eliminar("u2@x.com") and not indice.eliminar("u2@x.com")
+    assert indice.buscar(galeria["u2@x.com"], k=1)[0][0] == "u0@x.com"
+
+
+@pytest.mark.parametrize("modo", ["float16", "int8"])
+def test_cuantizado_reranquea_con_la_plantilla_completa(galeria, modo):
+    indice = FaceIndex(cuantizacion=modo, cargar_completa=galeria.get, rerank=10)
+    indice.cargar(galeria.items())
+    sonda = _sonda(galeria, "u7@x.com")
+    resultado = indice.buscar(sonda, k=3)
+
+    # Mismo orden y puntajes exactos en float32 tras re-ranquear
+    esperado = _exacto(galeria, sonda, 3)
+    assert [c for c, _ in resultado] == [c for c, _ in esperado]
+    assert np.allclose([s for _, s in resultado], [s for _, s in esperado], atol=1e-6)
+
+
+def test_int8_sin_rerank_es_aproximado_pero_cercano(galeria):
+    indice = FaceIndex(cuantizacion="int8")
+    indice.cargar(galeria.items())
+    sonda = _sonda(galeria, "u9@x.com")
+    (correo, score), = indice.buscar(sonda, k=1)
+    assert correo == "u9@x.com"
+    assert score == pytest.approx(float(galeria[correo] @ sonda), abs=0.02)
@@ -0,0 +1,41 @@
+# test_face_muestras.py
+import os
+
+import cv2
+import numpy as np
+
+from face_muestras import ARCHIVO_RECORTES, centroide, leer_recortes, posicion_para_muestra, registrar_recortes
+from face_preproceso import preprocesar_rostro
+from reenrolamiento import procesar_imagen
+
+
+def test_posicion_para_muestra_reemplaza_el_mas_parecido():
+    ejemplares = [np.array([1, 0, 0]), np.array([0, 1, 0])]
+    assert posicion_para_muestra(ejemplares, np.array([0, 0, 1]), maximo=3) == 2
+    assert posicion_para_muestra(ejemplares, np.array([0.1, 1, 0]), maximo=2) == 1
+
+
+def test_recortes_manda_el_ultimo_registro_de_cada_ejemplar(tmp_path):
+    carpeta = str(tmp_path)
+    assert leer_recortes(carpeta) == {}
+    registrar_recortes(carpeta, "a#0", ["r1.jpg", "r2.jpg"])
+    registrar_recortes(carpeta, "a#1", ["r3.jpg"])
+    registrar_recortes(carpeta, "a#0", ["r4.jpg"])
+    # Línea cortada por una caída a mitad de escritura
+    with open(os.path.join(carpeta, ARCHIVO_RECORTES), "a", encoding="utf-8") as f:
+        f.write("a#1\tr5")
+    assert leer_recortes(carpeta) == {"a#0": ("r4.jpg",), "a#1": ("r3.jpg",)}
+
+
+def test_reenrolar_un_ejemplar_usa_el_centroide_de_sus_recortes(tmp_path):
+    rng = np.random.default_rng(0)
+    rutas = []
+    for i in range(2):
+        rutas.append(str(tmp_path / f"r{i}.jpg"))
+        cv2.imwrite(rutas[-1], rng.integers(0, 255, (120, 120, 3), dtype=np.uint8))
+    esperada = centroide([preprocesar_rostro(cv2.imread(r)) for r in rutas])
+
+    clave, _, plantilla, error = procesar_imagen(("a#0", "\t".join(rutas + [str(tmp_path / "falta.jpg")])))
+    assert (clave, error) == ("a#0", None)
+    assert np.allclose(plantilla, esperada, atol=1e-6)
+    assert procesar_imagen(("a#1", str(tmp_path / "falta.jpg")))[2] is None
@@ -0,0 +1,44 @@
+# test_face_payload.py
+import numpy as np
+import pytest
+
+from face_payload import CABECERA, LADO_MAXIMO, RecorteInvalido, desempaquetar_recorte, empaquetar_recorte
+
+
+def _gris(dtype="uint8"):
+    return (np.arange(100 * 100) % 256).reshape(100, 100).astype(dtype)
+
+
+def test_ida_y_vuelta_uint8_y_float32():
+    assert np.array_equal(desempaquetar_recorte(empaquetar_recorte(_gris())), _gris())
+    flotante = _gris("float32")
+    flotante[0, 0] = 300.0
+    recorte = desempaquetar_recorte(empaquetar_recorte(flotante))
+    assert recorte.dtype == np.uint8 and recorte[0, 0] == 255
+
+
+@pytest.mark.parametrize("valor", [np.nan, np.inf, -np.inf])
+def test_float32_no_finito_se_rechaza(valor):
+    gray = _gris("float32")
+    gray[50, 50] = valor
+    with pytest.raises(RecorteInvalido):
+        desempaquetar_recorte(empaquetar_recorte(gray))
+
+
+def test_cabeceras_y_datos_invalidos():
+    bueno = empaquetar_recorte(_gris())
+    casos = [
+        bueno[:CABECERA.size - 1],                      # cabecera incompleta
+        b"JPEG" + bueno[4:],                            # magia
+        bueno[:4] + b"\x02" + bueno[5:],                # versión
+        bueno[:5] + b"\x09" + bueno[6:],                # dtype
+        bueno[:-1],                                     # longitud
+        bueno[:-1] + bytes([bueno[-1] ^ 1]),            # crc
+    ]
+    for cuerpo in casos:
+        with pytest.raises(RecorteInvalido):
+            desempaquetar_recorte(cuerpo)
+    with pytest.raises(RecorteInvalido):
+        desempaquetar_recorte(empaquetar_recorte(np.zeros((LADO_MAXIMO + 1, 4), dtype="uint8")))
+    with pytest.raises(RecorteInvalido):
+        empaquetar_recorte(np.zeros((4, 4, 3), dtype="uint8"))
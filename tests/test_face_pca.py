@@ -0,0 +1,64 @@
+# test_face_pca.py
+import numpy as np
+import pytest
+
+from face_index import FACE_THRESHOLD
+from face_pca import ProyeccionPCA, MUESTRAS_POR_COMPONENTE, tasa_impostores
+from face_preproceso import FACE_TEMPLATE_VERSION, VERSION_INICIAL
+
+
+@pytest.fixture
+def rostros():
+    # Una fila por persona: vectores independientes (impostores entre sí)
+    return np.random.default_rng(0).normal(size=(120, 400)).astype("float32")
+
+
+def test_pocas_muestras_no_entrena(rostros):
+    with pytest.raises(ValueError):
+        ProyeccionPCA.entrenar(rostros[:2], n_componentes=2)
+    with pytest.raises(ValueError):
+        ProyeccionPCA.entrenar(rostros[:MUESTRAS_POR_COMPONENTE * 16 - 1], n_componentes=16)
+
+
+def test_nunca_entrega_menos_componentes_que_los_pedidos(rostros):
+    pca = ProyeccionPCA.entrenar(rostros[:MUESTRAS_POR_COMPONENTE * 16], n_componentes=16)
+    assert pca.n_componentes == 16
+    assert pca.proyectar(rostros[0]).shape == (16,)
+
+
+def test_verificacion_detecta_un_espacio_degenerado(rostros):
+    apartados = rostros[80:]
+    sana = ProyeccionPCA.entrenar(rostros[:80], n_componentes=32)
+    assert sana.verificar_umbral(apartados, FACE_THRESHOLD) == (0.0, 0.0)
+
+    # Lo que dejaba el recorte silencioso a N componentes con N = 2
+    media = rostros[:2].mean(axis=0)
+    _, _, vt = np.linalg.svd(rostros[:2] - media, full_matrices=False)
+    original, reducida = ProyeccionPCA(media, vt[:2]).verificar_umbral(apartados, FACE_THRESHOLD)
+    assert original == 0.0
+    assert reducida > 0.3
+
+
+def test_tasa_impostores_cuenta_pares_distintos():
+    matriz = np.array([[1, 0], [1, 0.01], [0, 1]], dtype="float32")
+    assert tasa_impostores(matriz, 0.9) == pytest.approx(1 / 3)
+    assert tasa_impostores(matriz[:1], 0.9) == 0.0
+
+
+def test_el_almacen_depende_del_preprocesado(rostros, tmp_path):
+    pca = ProyeccionPCA.entrenar(rostros[:40], n_componentes=8)
+    assert pca.preproceso == FACE_TEMPLATE_VERSION
+    v1 = ProyeccionPCA(pca.media, pca.componentes, VERSION_INICIAL)
+    assert v1.version != pca.version
+    assert v1.nombre_store() == f"face_templates_{v1.version}"
+    assert pca.nombre_store() == f"face_templates_{FACE_TEMPLATE_VERSION}_{pca.version}"
+
+    ruta = str(tmp_path / "face_pca.npz")
+    pca.guardar(ruta)
+    cargada = ProyeccionPCA.cargar(ruta)
+    assert (cargada.preproceso, cargada.version) == (pca.preproceso, pca.version)
+
+    # Las guardadas antes de versionar el preprocesado se entrenaron con v1
+    with open(ruta, "wb") as f:
+        np.savez(f, media=pca.media, componentes=pca.componentes)
+    assert ProyeccionPCA.cargar(ruta).preproceso == VERSION_INICIAL
@@ -0,0 +1,47 @@
+# test_face_shared.py
+import numpy as np
+
+from face_index import FaceIndex
+from face_shared import FaceIndexCompartido
+
+DIM = 32
+
+
+def _vec(semilla):
+    return np.random.default_rng(semilla).normal(size=DIM).astype("float32")
+
+
+def test_otro_proceso_ve_altas_y_actualizaciones(tmp_path):
+    escritor = FaceIndexCompartido(str(tmp_path))
+    escritor.cargar([("a@x.com", _vec(1)), ("b@x.com", _vec(2))])
+    lector = FaceIndexCompartido(str(tmp_path))
+    assert lector.adjuntar() and len(lector) == 2
+
+    escritor.agregar("c@x.com", _vec(3))
+    escritor.agregar("a@x.com", _vec(4))
+    assert len(lector) == 3
+    (correo, similitud), = lector.buscar(_vec(4), k=1)
+    assert correo == "a@x.com" and similitud > 0.999
+
+
+def test_consulta_que_cruza_una_reescritura_se_repite(tmp_path, monkeypatch):
+    escritor = FaceIndexCompartido(str(tmp_path))
+    escritor.cargar([("a@x.com", _vec(1)), ("b@x.com", _vec(2))])
+    lector = FaceIndexCompartido(str(tmp_path))
+    lector.adjuntar()
+
+    original = FaceIndex.buscar
+    consultas = []
+
+    def buscar_con_escritor_concurrente(self, plantilla, k=5, nprobe=None):
+        resultado = original(self, plantilla, k=k, nprobe=nprobe)
+        if self is lector and not consultas:
+            # La fila cambia mientras el lector la estaba puntuando
+            escritor.agregar("a@x.com", _vec(5))
+        consultas.append(resultado)
+        return resultado
+
+    monkeypatch.setattr(FaceIndex, "buscar", buscar_con_escritor_concurrente)
+    (correo, similitud), = lector.buscar(_vec(5), k=1)
+    assert len(consultas) == 2
+    assert correo == "a@x.com" and similitud > 0.999
@@ -0,0 +1,91 @@
+# test_glucemia_ingesta.py
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import migraciones
+from glucemia_ingesta import LoteInvalido, PacienteNoAutorizado, ingestar
+
+AHORA = datetime(2024, 1, 21, 12, 0, 0)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conexion = sqlite3.connect(str(tmp_path / "sistema_diabetes.db"))
+    migraciones.aplicar(conexion)
+    conexion.executemany("INSERT INTO pacientes (id, nombre) VALUES (?, ?)", [(1, "Ana"), (2, "Beto")])
+    conexion.commit()
+    yield conexion
+    conexion.close()
+
+
+def _ndjson(filas):
+    return "\n".join(f if isinstance(f, str) else json.dumps(f) for f in filas).encode("utf-8")
+
+
+def _lectura(pid, fecha, nivel):
+    return {"paciente_id": pid, "fecha_medicion": fecha, "nivel_glucosa": nivel}
+
+
+def _guardadas(conn):
+    return conn.execute("SELECT paciente_id, fecha_medicion, nivel_glucosa FROM registros_glucemia "
+                        "ORDER BY paciente_id, fecha_medicion").fetchall()
+
+
+def test_duplicados_del_lote_y_de_la_base(conn):
+    lote = _ndjson([_lectura(1, "2024-01-20 08:00:00", 100),
+                    _lectura(1, "2024-01-20T08:00:00", 150),   # misma clave: gana la primera
+                    _lectura(1, "2024-01-20 08:05", 110),
+                    _lectura(2, "2024-01-20 08:00:00", 120)])
+    primero = ingestar(conn, lote, "ndjson", ahora=AHORA)
+    assert (primero["recibidas"], primero["insertadas"], primero["duplicadas"], primero["invalidas"]) == (4, 3, 1, 0)
+    assert _guardadas(conn) == [(1, "2024-01-20 08:00:00", 100.0), (1, "2024-01-20 08:05:00", 110.0),
+                                (2, "2024-01-20 08:00:00", 120.0)]
+
+    segundo = ingestar(conn, lote, "ndjson", ahora=AHORA)
+    assert (segundo["insertadas"], segundo["duplicadas"], segundo["invalidas"]) == (0, 4, 0)
+    assert len(_guardadas(conn)) == 3
+
+
+def test_filas_invalidas_se_cuentan_y_se_reportan(conn):
+    lote = _ndjson([_lectura(1, "2024-01-20 09:00:00", 100),
+                    "no es json",
+                    _lectura(1, "ayer", 100),
+                    _lectura(1, "2024-01-20 09:05:00", 900),
+                    _lectura(1, "2024-01-20 09:10:00", "alto"),
+                    _lectura(0, "2024-01-20 09:15:00", 100),
+                    _lectura(1, "2024-01-22 09:00:00", 100),     # futuro respecto a AHORA
+                    _lectura(9, "2024-01-20 09:20:00", 100)])    # paciente inexistente
+    resumen = ingestar(conn, lote, "ndjson", ahora=AHORA)
+
+    assert (resumen["recibidas"], resumen["insertadas"], resumen["invalidas"]) == (8, 1, 7)
+    motivos = {e["fila"]: e["motivo"] for e in resumen["errores"]}
+    assert motivos == {2: "fila ilegible", 3: "fecha_medicion inválida",
+                       4: "nivel_glucosa fuera de 20-600 mg/dL", 5: "nivel_glucosa no numérico",
+                       6: "paciente_id inválido", 7: "fecha_medicion en el futuro",
+                       None: "pacientes inexistentes: 9"}
+
+
+def test_csv_con_columnas_opcionales(conn):
+    lote = ("paciente_id,fecha_medicion,nivel_glucosa,dispositivo\n"
+            "2,2024-01-20 10:00:00,45,libre\n2,2024-01-20 10:05:00,abc,\n").encode("utf-8")
+    resumen = ingestar(conn, lote, "csv", ahora=AHORA)
+    assert (resumen["insertadas"], resumen["invalidas"]) == (1, 1)
+    assert conn.execute("SELECT estado, dispositivo, hora_medicion FROM registros_glucemia").fetchone() == \
+        ("crítico", "libre", "10:00")
+    with pytest.raises(LoteInvalido):
+        ingestar(conn, b"a,b\n1,2\n", "csv")
+
+
+def test_lote_con_paciente_no_autorizado_no_guarda_nada(conn):
+    lote = _ndjson([_lectura(1, "2024-01-20 11:00:00", 100), _lectura(2, "2024-01-20 11:00:00", 100)])
+    with pytest.raises(PacienteNoAutorizado):
+        ingestar(conn, lote, "ndjson", ahora=AHORA, autorizar=lambda ids: {1})
+    assert _guardadas(conn) == []
+
+
+def test_maximo_de_filas(conn):
+    with pytest.raises(LoteInvalido):
+        ingestar(conn, _ndjson([_lectura(1, "2024-01-20 11:00:00", 100)] * 3), "ndjson", max_filas=2)
@@ -0,0 +1,94 @@
+# test_glucemia_resumen.py
+import json
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import migraciones
+from glucemia_ingesta import ingestar
+from glucemia_resumen import actualizar_resumenes, leer_resumen, reconstruir, ultimo_dia
+
+TABLAS = ("glucemia_resumen_hora", "glucemia_resumen_dia")
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conexion = sqlite3.connect(str(tmp_path / "sistema_diabetes.db"))
+    migraciones.aplicar(conexion)
+    conexion.executemany("INSERT INTO pacientes (id, nombre) VALUES (?, ?)", [(1, "Ana"), (2, "Beto")])
+    # Beto tiene una meta propia: cambia los conteos bajo/en/sobre rango
+    conexion.execute("INSERT INTO metas_glucemia (paciente_id, tipo_medicion, meta_minima, meta_maxima, activo) "
+                     "VALUES (2, 'continua', 80, 140, 1)")
+    conexion.commit()
+    yield conexion
+    conexion.close()
+
+
+def _lecturas(semilla, n=600):
+    rng = np.random.default_rng(semilla)
+    inicio = np.datetime64("2024-01-18T00:00:00")
+    minutos = np.sort(rng.choice(4 * 24 * 60, size=n, replace=False))
+    return [{"paciente_id": int(rng.integers(1, 3)),
+             "fecha_medicion": str(inicio + np.timedelta64(int(m), "m")).replace("T", " "),
+             "nivel_glucosa": float(rng.integers(40, 300))} for m in minutos]
+
+
+def _tablas(conn):
+    return {t: conn.execute(f"SELECT * FROM {t} ORDER BY paciente_id, inicio").fetchall() for t in TABLAS}
+
+
+def _iguales(a, b):
+    assert a.keys() == b.keys()
+    for tabla in a:
+        assert len(a[tabla]) == len(b[tabla]), tabla
+        for fila_a, fila_b in zip(a[tabla], b[tabla]):
+            assert fila_a[:3] == fila_b[:3] and fila_a[7:] == fila_b[7:], tabla
+            assert np.allclose(fila_a[3:7], fila_b[3:7]), tabla
+
+
+def test_incremental_por_lotes_igual_a_reconstruir(conn):
+    lecturas = _lecturas(0)
+    # Lotes desordenados y solapados: los duplicados no deben sumarse dos veces
+    rng = np.random.default_rng(1)
+    for _ in range(6):
+        lote = [lecturas[i] for i in rng.choice(len(lecturas), size=200, replace=False)]
+        ingestar(conn, "\n".join(map(json.dumps, lote)).encode("utf-8"), "ndjson",
+                 ahora=datetime(2024, 2, 1), al_insertar=actualizar_resumenes)
+    incremental = _tablas(conn)
+    assert sum(fila[2] for fila in incremental["glucemia_resumen_dia"]) == \
+        conn.execute("SELECT COUNT(*) FROM registros_glucemia").fetchone()[0]
+
+    reconstruir(conn)
+    _iguales(incremental, _tablas(conn))
+
+
+def test_reconstruir_un_paciente_no_toca_a_los_demas(conn):
+    ingestar(conn, "\n".join(map(json.dumps, _lecturas(2))).encode("utf-8"), "ndjson",
+             ahora=datetime(2024, 2, 1), al_insertar=actualizar_resumenes)
+    antes = _tablas(conn)
+    conn.execute("DELETE FROM registros_glucemia WHERE paciente_id = 1")
+    reconstruir(conn, paciente_id=1)
+    despues = _tablas(conn)
+    for tabla in TABLAS:
+        assert [f for f in despues[tabla] if f[0] == 1] == []
+        assert [f for f in despues[tabla] if f[0] == 2] == [f for f in antes[tabla] if f[0] == 2]
+
+
+def test_leer_resumen_coincide_con_las_lecturas(conn):
+    lecturas = _lecturas(3)
+    ingestar(conn, "\n".join(map(json.dumps, lecturas)).encode("utf-8"), "ndjson",
+             ahora=datetime(2024, 2, 1), al_insertar=actualizar_resumenes)
+    nivel = np.array([l["nivel_glucosa"] for l in lecturas if l["paciente_id"] == 2])
+
+    datos = leer_resumen(conn, 2, "2024-01-18 00:00:00", "2024-01-22 00:00:00", "dia")
+    total = datos["total"]
+    assert total["n"] == len(nivel)
+    assert total["media"] == pytest.approx(nivel.mean())
+    assert total["desviacion"] == pytest.approx(nivel.std())
+    assert (total["minimo"], total["maximo"]) == (nivel.min(), nivel.max())
+    assert total["tiempo_bajo"] == pytest.approx(np.mean(nivel < 80))
+    assert total["tiempo_alto"] == pytest.approx(np.mean(nivel > 140))
+    assert datos["inicio"] == [f"2024-01-{d} 00:00:00" for d in range(18, 22)]
+    assert ultimo_dia(conn, 2) == "2024-01-21 00:00:00"
@@ -0,0 +1,103 @@
+# test_glucemia_serie.py
+import json
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import migraciones
+from glucemia_ingesta import ingestar
+from glucemia_resumen import actualizar_resumenes
+from glucemia_serie import elegir_fuente, estado_periodo, etag, lttb, serie
+
+
+def _lttb_referencia(x, y, puntos):
+    """Versión escalar del algoritmo, intervalo por intervalo"""
+    n = len(x)
+    bordes = np.linspace(1, n - 1, puntos - 1).astype("int64")
+    elegidos, a = [0], 0
+    for i in range(puntos - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        if i + 2 < len(bordes):
+            sig = slice(bordes[i + 1], bordes[i + 2])
+            cx, cy = np.mean(x[sig]), np.mean(y[sig])
+        else:
+            cx, cy = x[-1], y[-1]
+        areas = [abs((x[a] - cx) * (y[j] - y[a]) - (x[a] - x[j]) * (cy - y[a])) for j in range(ini, fin)]
+        a = ini + int(np.argmax(areas))
+        elegidos.append(a)
+    return np.array(elegidos + [n - 1])
+
+
+@pytest.mark.parametrize("n, puntos", [(0, 10), (1, 10), (2, 10), (5, 5), (5, 9)])
+def test_series_cortas_se_devuelven_completas(n, puntos):
+    assert lttb(np.arange(n), np.arange(n), puntos).tolist() == list(range(n))
+
+
+@pytest.mark.parametrize("puntos, esperado", [(2, [0, 9]), (1, [0]), (0, [])])
+def test_menos_de_tres_puntos_solo_extremos(puntos, esperado):
+    assert lttb(np.arange(10), np.arange(10), puntos).tolist() == esperado
+
+
+@pytest.mark.parametrize("n, puntos", [(10, 3), (11, 4), (100, 7), (1000, 300), (1001, 1000)])
+def test_un_punto_por_intervalo_con_extremos(n, puntos):
+    rng = np.random.default_rng(n)
+    x = np.cumsum(rng.integers(1, 600, size=n))
+    y = rng.normal(140, 40, size=n)
+    elegidos = lttb(x, y, puntos)
+
+    assert len(elegidos) == puntos
+    assert elegidos[0] == 0 and elegidos[-1] == n - 1
+    assert np.all(np.diff(elegidos) > 0)
+    # Cada punto interior cae en su intervalo, incluidos los bordes del primero y el último
+    bordes = np.linspace(1, n - 1, puntos - 1).astype("int64")
+    assert np.all((elegidos[1:-1] >= bordes[:-1]) & (elegidos[1:-1] < bordes[1:]))
+    assert elegidos.tolist() == _lttb_referencia(x, y, puntos).tolist()
+
+
+def test_conserva_picos_e_hipoglucemias():
+    y = np.full(2000, 120.0)
+    y[700], y[1500] = 320.0, 45.0
+    elegidos = lttb(np.arange(2000), y, 50)
+    assert 700 in elegidos and 1500 in elegidos
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conexion = sqlite3.connect(str(tmp_path / "sistema_diabetes.db"))
+    migraciones.aplicar(conexion)
+    conexion.execute("INSERT INTO pacientes (id, nombre) VALUES (1, 'Ana')")
+    inicio = np.datetime64("2024-01-20T00:00:00")
+    lote = [{"paciente_id": 1, "fecha_medicion": str(inicio + np.timedelta64(5 * i, "m")).replace("T", " "),
+             "nivel_glucosa": 100 + (i % 50)} for i in range(288 * 2)]
+    ingestar(conexion, "\n".join(map(json.dumps, lote)).encode("utf-8"), "ndjson",
+             ahora=datetime(2024, 2, 1), al_insertar=actualizar_resumenes)
+    yield conexion
+    conexion.close()
+
+
+def test_serie_de_lecturas_y_de_promedios(conn):
+    desde, hasta = "2024-01-20 00:00:00", "2024-01-22 00:00:00"
+    lecturas = serie(conn, 1, desde, hasta, 100, "lecturas")
+    assert (lecturas["originales"], len(lecturas["valores"])) == (576, 100)
+    assert lecturas["fechas"][0] == "2024-01-20 00:00" and lecturas["fechas"][-1] == "2024-01-21 23:55"
+
+    horas = serie(conn, 1, desde, hasta, 100, "hora")
+    assert horas["originales"] == 48 and len(horas["valores"]) == 48
+    # Medio intervalo: el hasta es exclusivo
+    assert serie(conn, 1, desde, "2024-01-20 12:00:00", 1000, "lecturas")["originales"] == 144
+
+
+def test_etag_cambia_con_lecturas_nuevas(conn):
+    desde, hasta = "2024-01-20 00:00:00", "2024-01-22 00:00:00"
+    estado = estado_periodo(conn, 1, desde, hasta)
+    assert estado[0] == 576
+    antes = etag(1, desde, hasta, 300, "lecturas", estado)
+    assert antes == etag(1, desde, hasta, 300, "lecturas", estado_periodo(conn, 1, desde, hasta))
+
+    ingestar(conn, json.dumps({"paciente_id": 1, "fecha_medicion": "2024-01-21 10:01:00",
+                               "nivel_glucosa": 99}).encode("utf-8"), "ndjson",
+             ahora=datetime(2024, 2, 1), al_insertar=actualizar_resumenes)
+    assert etag(1, desde, hasta, 300, "lecturas", estado_periodo(conn, 1, desde, hasta)) != antes
+    assert elegir_fuente("auto", 576, 1000) == "lecturas" and elegir_fuente("auto", 576, 500) == "hora"
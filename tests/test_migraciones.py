@@ -0,0 +1,76 @@
+# test_migraciones.py
+import sqlite3
+
+import pytest
+
+import migraciones
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conexion = sqlite3.connect(str(tmp_path / "sistema_diabetes.db"))
+    yield conexion
+    conexion.close()
+
+
+def _esquema(conexion):
+    return conexion.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+
+
+def _problemas(conexion):
+    return [(nombre, detalle, problema) for nombre, detalle, problema in migraciones.verificar_planes(conexion)
+            if problema]
+
+
+def test_base_nueva_llega_a_la_ultima_version(conn):
+    hechas = migraciones.aplicar(conn)
+
+    assert hechas == [version for version, _, _ in migraciones.MIGRACIONES]
+    assert migraciones.pendientes(conn) == []
+
+
+def test_consultas_criticas_usan_sus_indices(conn):
+    migraciones.aplicar(conn)
+
+    assert _problemas(conn) == []
+
+
+def test_consultas_criticas_usan_sus_indices_con_datos(conn):
+    # Con estadísticas de una tabla poblada el planificador podría preferir otro camino
+    migraciones.aplicar(conn)
+    conn.executemany("INSERT INTO pacientes (id, nombre) VALUES (?, ?)", [(i, f"P{i}") for i in range(1, 21)])
+    conn.executemany(
+        "INSERT INTO registros_glucemia (paciente_id, nivel_glucosa, fecha_medicion) VALUES (?, ?, ?)",
+        [(p, 100 + h, f"2024-01-{d:02d} {h:02d}:00:00") for p in range(1, 21) for d in range(1, 29) for h in range(24)])
+    conn.execute("ANALYZE")
+    conn.commit()
+
+    assert _problemas(conn) == []
+
+
+def test_reaplicar_no_hace_nada(conn):
+    migraciones.aplicar(conn)
+    antes = _esquema(conn)
+    registro = conn.execute("SELECT version, nombre, fecha_aplicacion FROM migraciones ORDER BY version").fetchall()
+
+    assert migraciones.aplicar(conn) == []
+    assert _esquema(conn) == antes
+    assert conn.execute("SELECT version, nombre, fecha_aplicacion FROM migraciones ORDER BY version").fetchall() == registro
+
+
+def test_base_antigua_se_completa(conn):
+    # Tablas como las dejaban versiones anteriores de crear-db.py: menos columnas y lecturas repetidas
+    conn.execute("CREATE TABLE alertas (id INTEGER PRIMARY KEY AUTOINCREMENT, paciente_id INTEGER, mensaje TEXT, "
+                 "estado TEXT DEFAULT 'pendiente')")
+    conn.execute("CREATE TABLE registros_glucemia (id INTEGER PRIMARY KEY AUTOINCREMENT, paciente_id INTEGER, "
+                 "nivel_glucosa REAL, fecha_medicion TIMESTAMP)")
+    conn.executemany("INSERT INTO registros_glucemia (paciente_id, nivel_glucosa, fecha_medicion) VALUES (?, ?, ?)",
+                     [(1, 120, "2024-01-15 08:00:00")] * 3 + [(1, 140, "2024-01-15 12:00:00")])
+    conn.commit()
+
+    migraciones.aplicar(conn)
+
+    assert "prioridad" in migraciones._columnas(conn, "alertas")
+    assert conn.execute("SELECT COUNT(*) FROM registros_glucemia").fetchone()[0] == 2
+    assert conn.execute("SELECT SUM(n) FROM glucemia_resumen_dia").fetchone()[0] == 2
+    assert _problemas(conn) == []
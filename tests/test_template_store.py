@@ -0,0 +1,133 @@
+# test_template_store.py
+import os
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import template_store
+from template_store import TemplateStore
+
+DIM = 16
+
+
+def _vec(valor):
+    return np.full(DIM, valor, dtype="float32")
+
+
+@pytest.fixture
+def carpeta(tmp_path):
+    return str(tmp_path)
+
+
+def _reabrir(store):
+    return TemplateStore(store.carpeta, store.nombre)
+
+
+def test_agregar_reemplazar_y_eliminar_sobreviven_a_reabrir(carpeta):
+    store = TemplateStore(carpeta, "face_templates")
+    store.agregar("a", _vec(1))
+    store.agregar("b", _vec(2))
+    store.agregar("a", _vec(3))
+    assert store.eliminar("b")
+    assert not store.eliminar("b")
+
+    otro = _reabrir(store)
+    assert len(otro) == 1
+    assert np.array_equal(otro.obtener("a"), _vec(3))
+    assert otro.obtener("b") is None
+
+
+def test_dimension_distinta_se_rechaza(carpeta):
+    store = TemplateStore(carpeta, "face_templates")
+    store.agregar("a", _vec(1))
+    with pytest.raises(ValueError):
+        store.agregar("b", np.ones(DIM + 1, dtype="float32"))
+
+
+def test_crc_invalido_solo_pierde_su_clave(carpeta):
+    store = TemplateStore(carpeta, "face_templates")
+    for i in range(3):
+        store.agregar(f"k{i}", _vec(i))
+    # Vector dañado en disco del slot 1
+    with open(store._dat_path(), "r+b") as f:
+        f.seek(1 * 4 * DIM)
+        f.write(_vec(99).tobytes())
+
+    otro = _reabrir(store)
+    assert sorted(k for k, _ in otro.items()) == ["k0", "k2"]
+    # El slot dañado no se reutiliza: una alta nueva no pisa registros del índice
+    assert otro.agregar("k3", _vec(3)) == 3
+    assert np.array_equal(_reabrir(store).obtener("k3"), _vec(3))
+
+
+def test_dat_mas_corto_que_el_indice(carpeta):
+    store = TemplateStore(carpeta, "face_templates")
+    for i in range(5):
+        store.agregar(f"k{i}", _vec(i))
+    os.truncate(store._dat_path(), 3 * 4 * DIM)
+
+    otro = _reabrir(store)
+    assert sorted(k for k, _ in otro.items()) == ["k0", "k1", "k2"]
+    otro.agregar("nueva", _vec(7))
+    final = _reabrir(store)
+    assert len(final) == 4
+    assert np.array_equal(final.obtener("nueva"), _vec(7))
+
+
+def test_linea_incompleta_de_escritor_caido(carpeta):
+    store = TemplateStore(carpeta, "face_templates")
+    store.agregar("a", _vec(1))
+    # Vector escrito pero el proceso murió a mitad de la línea del .idx
+    with open(store._dat_path(), "ab") as f:
+        f.write(_vec(5).tobytes())
+    with open(store.idx_path, "ab") as f:
+        f.write(b"rota 1 12")
+
+    otro = _reabrir(store)
+    assert list(k for k, _ in otro.items()) == ["a"]
+    # El slot huérfano se reutiliza y la cola rota se descarta
+    assert otro.agregar("b", _vec(2)) == 1
+    final = _reabrir(store)
+    assert sorted(k for k, _ in final.items()) == ["a", "b"]
+    assert np.array_equal(final.obtener("b"), _vec(2))
+
+
+def test_compactar_conserva_vigentes_y_borra_la_generacion_vieja(carpeta):
+    store = TemplateStore(carpeta, "face_templates")
+    for i in range(4):
+        store.agregar(f"k{i}", _vec(i))
+    store.eliminar("k1")
+    store.agregar("k2", _vec(20))
+    viejo = store._dat_path()
+
+    assert store.compactar() == 3
+    assert not os.path.exists(viejo)
+    final = _reabrir(store)
+    assert final.generacion == 1
+    assert os.path.getsize(final._dat_path()) == 3 * 4 * DIM
+    assert np.array_equal(final.obtener("k2"), _vec(20))
+    assert final.obtener("k1") is None
+
+
+def _escritor(carpeta, w, n):
+    store = TemplateStore(carpeta, "face_templates")
+    for i in range(n):
+        store.agregar(f"w{w}_{i}", _vec(w * 1000 + i))
+
+
+@pytest.mark.skipif(template_store.fcntl is None, reason="requiere fcntl")
+def test_escritores_en_varios_procesos(carpeta):
+    TemplateStore(carpeta, "face_templates").agregar("base", _vec(-1))
+    ctx = multiprocessing.get_context("fork")
+    procesos = [ctx.Process(target=_escritor, args=(carpeta, w, 50)) for w in range(3)]
+    for p in procesos:
+        p.start()
+    for p in procesos:
+        p.join()
+
+    assert [p.exitcode for p in procesos] == [0, 0, 0]
+    final = TemplateStore(carpeta, "face_templates")
+    assert len(final) == 151
+    assert all(np.array_equal(final.obtener(f"w{w}_{i}"), _vec(w * 1000 + i))
+               for w in range(3) for i in range(50))
@@ -0,0 +1,76 @@
+# test_vinculos_clinicos.py
+import sqlite3
+
+import bcrypt
+import pytest
+
+import migraciones
+from vinculos_clinicos import (VinculoInvalido, canjear_codigo, generar_codigo, paciente_vinculado,
+                               pacientes_permitidos, vincular_clinico)
+
+APP_MEDICO, APP_ADMIN, APP_PACIENTE, APP_INTRUSO = 10, 11, 12, 13
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conexion = sqlite3.connect(str(tmp_path / "sistema_diabetes.db"))
+    conexion.row_factory = sqlite3.Row
+    migraciones.aplicar(conexion)
+    hash_pw = bcrypt.hashpw(b"secreta", bcrypt.gensalt(rounds=4))
+    conexion.executemany("INSERT INTO usuarios (id, correo, password, nombre, rol) VALUES (?, ?, ?, ?, ?)",
+                         [(1, "medico@clinica.com", hash_pw, "Médico", "medico"),
+                          (2, "admin@clinica.com", hash_pw, "Admin", "admin")])
+    conexion.executemany("INSERT INTO pacientes (id, nombre, email, medico_asignado) VALUES (?, ?, ?, ?)",
+                         [(1, "Ana", "ana@correo.com", 1), (2, "Beto", "beto@correo.com", 2)])
+    conexion.commit()
+    yield conexion
+    conexion.close()
+
+
+def test_sin_vinculo_no_hay_acceso_aunque_coincida_el_correo(conn):
+    # El correo de la sesión ya no cuenta: pacientes.email y usuarios.correo son solo datos
+    assert pacientes_permitidos(conn, APP_INTRUSO, [1, 2]) == set()
+    assert paciente_vinculado(conn, APP_INTRUSO) is None
+
+
+def test_personal_clinico_se_vincula_con_sus_credenciales(conn):
+    assert vincular_clinico(conn, APP_MEDICO, "medico@clinica.com", "secreta")["rol"] == "medico"
+    assert pacientes_permitidos(conn, APP_MEDICO, [1, 2]) == {1}
+    vincular_clinico(conn, APP_ADMIN, "admin@clinica.com", "secreta")
+    assert pacientes_permitidos(conn, APP_ADMIN, [1, 2, 99]) == {1, 2, 99}
+
+
+def test_contrasena_erronea_cuenta_intentos_y_bloquea(conn):
+    for _ in range(3):
+        with pytest.raises(VinculoInvalido):
+            vincular_clinico(conn, APP_INTRUSO, "medico@clinica.com", "adivinanza", max_intentos=3)
+    # Bloqueada: ni la contraseña correcta vincula, y los vínculos previos dejan de valer
+    with pytest.raises(VinculoInvalido):
+        vincular_clinico(conn, APP_MEDICO, "medico@clinica.com", "secreta", max_intentos=3)
+    assert pacientes_permitidos(conn, APP_INTRUSO, [1]) == set()
+
+
+def test_paciente_se_vincula_con_un_codigo_de_un_solo_uso(conn):
+    vincular_clinico(conn, APP_MEDICO, "medico@clinica.com", "secreta")
+    with pytest.raises(VinculoInvalido):
+        generar_codigo(conn, APP_MEDICO, 2)  # no es su paciente
+    with pytest.raises(VinculoInvalido):
+        generar_codigo(conn, APP_INTRUSO, 1)
+    codigo = generar_codigo(conn, APP_MEDICO, 1)
+
+    assert canjear_codigo(conn, APP_PACIENTE, codigo) == 1
+    assert pacientes_permitidos(conn, APP_PACIENTE, [1, 2]) == {1}
+    assert paciente_vinculado(conn, APP_PACIENTE) == 1
+    with pytest.raises(VinculoInvalido):
+        canjear_codigo(conn, APP_INTRUSO, codigo)
+    # Un paciente vinculado no genera códigos para su propio registro
+    with pytest.raises(VinculoInvalido):
+        generar_codigo(conn, APP_PACIENTE, 1)
+
+
+def test_codigo_vencido_no_vincula(conn):
+    vincular_clinico(conn, APP_ADMIN, "admin@clinica.com", "secreta")
+    codigo = generar_codigo(conn, APP_ADMIN, 2, vigencia_seg=0)
+    with pytest.raises(VinculoInvalido):
+        canjear_codigo(conn, APP_PACIENTE, codigo)
+    assert pacientes_permitidos(conn, APP_PACIENTE, [2]) == set()
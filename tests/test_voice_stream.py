@@ -0,0 +1,65 @@
+# test_voice_stream.py
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from voice_engine import AudioInvalido, MotorVoz, leer_wav
+from voice_stream import ExtractorVozIncremental, decidir
+
+UMBRAL, MARGEN = 0.8, 0.1
+
+
+def _voz(segundos=1.5, frecuencia=16000):
+    t = np.arange(int(segundos * frecuencia)) / frecuencia
+    rng = np.random.default_rng(0)
+    return (0.5 * np.sin(2 * np.pi * 220 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+            + 0.05 * rng.normal(size=len(t))).astype("float32")
+
+
+def test_decidir_espera_las_confirmaciones():
+    assert decidir([("a", 0.95), ("a", 0.95)], UMBRAL, MARGEN, confirmaciones=3) is None
+
+
+def test_decidir_acepta_solo_con_el_mismo_candidato_sobre_el_umbral():
+    assert decidir([("b", 0.1), ("a", 0.9), ("a", 0.85), ("a", 0.95)], UMBRAL, MARGEN, 3) == "aceptar"
+    assert decidir([("a", 0.9), ("b", 0.85), ("a", 0.95)], UMBRAL, MARGEN, 3) is None
+    assert decidir([("a", 0.9), ("a", 0.8), ("a", 0.95)], UMBRAL, MARGEN, 3) is None
+    assert decidir([(None, 0.9), (None, 0.9)], UMBRAL, MARGEN, 2) is None
+
+
+def test_decidir_rechaza_solo_con_todos_bajo_el_margen():
+    assert decidir([("a", 0.7), (None, 0.2), ("b", 0.69)], UMBRAL, MARGEN, 3) == "rechazar"
+    assert decidir([("a", 0.7), ("b", 0.75), ("b", 0.6)], UMBRAL, MARGEN, 3) is None
+
+
+@pytest.mark.parametrize("fragmento", [160, 1000, 4097])
+def test_extraccion_por_fragmentos_igual_a_la_grabacion_completa(fragmento):
+    motor = MotorVoz()
+    senal = _voz()
+    extractor = ExtractorVozIncremental(motor, max_segundos=10.0)
+    for i in range(0, len(senal), fragmento):
+        extractor.agregar(senal[i:i + fragmento])
+    assert np.allclose(extractor.plantilla(), motor.plantilla(senal), atol=1e-5)
+
+
+def test_extractor_no_pasa_del_maximo():
+    motor = MotorVoz()
+    extractor = ExtractorVozIncremental(motor, max_segundos=0.5)
+    extractor.agregar(_voz(2.0))
+    assert extractor.lleno and extractor.n_tramas == extractor.max_tramas
+    assert extractor.agregar(_voz(0.5)) == 0
+
+
+def test_wav_vacio_o_cortado_trae_mensaje():
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(np.zeros(160, dtype="<i2").tobytes())
+    assert len(leer_wav(buf.getvalue())[0]) == 160
+    for cuerpo in (b"", buf.getvalue()[:20]):
+        with pytest.raises(AudioInvalido, match="WAV no válido: .+"):
+            leer_wav(cuerpo)
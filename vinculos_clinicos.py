@@ -0,0 +1,129 @@
+# vinculos_clinicos.py
+import hashlib
+import secrets
+import bcrypt
+
+# ==========================================
+# 🔗 VÍNCULOS ENTRE CUENTAS DE LA APP Y LA BASE CLÍNICA
+# ==========================================
+# Cualquiera puede registrarse en la app con cualquier correo, así que el
+# correo de la sesión no dice quién es en sistema_diabetes.db. Cada cuenta de
+# la app (usuarios.id de la base de la app) se vincula de forma explícita:
+#
+#   personal clínico -> demostrando sus credenciales de la base clínica
+#                       (mismo correo y contraseña bcrypt; los fallos cuentan
+#                       en intentos_login y bloquean la cuenta clínica)
+#   paciente         -> canjeando un código de un solo uso que genera su
+#                       médico asignado o un administrador ya vinculados
+#
+# Con el vínculo, un administrador ve a todos los pacientes, un médico a los
+# que tiene asignados y un paciente solo sus propias lecturas.
+
+ROL_ADMIN = "admin"
+
+
+class VinculoInvalido(ValueError):
+    """Credenciales o código de vinculación no válidos"""
+
+
+def _hash_codigo(codigo):
+    return hashlib.sha256(codigo.strip().encode("utf-8")).hexdigest()
+
+
+def vincular_clinico(conn, app_usuario_id, correo, password, max_intentos=5):
+    """Vincula la cuenta de la app al usuario clínico si la contraseña es correcta
+
+    Devuelve {"id", "nombre", "rol"} del usuario clínico o lanza VinculoInvalido.
+    """
+    clinico = conn.execute("SELECT id, nombre, rol, password, COALESCE(activo, 1) AS activo, "
+                           "COALESCE(bloqueado, 0) AS bloqueado FROM usuarios WHERE correo = ?",
+                           (correo,)).fetchone()
+    if clinico is None or not clinico["activo"] or clinico["bloqueado"]:
+        raise VinculoInvalido("Credenciales clínicas incorrectas o cuenta bloqueada")
+    guardada = clinico["password"]
+    guardada = guardada.encode("utf-8") if isinstance(guardada, str) else bytes(guardada)
+    try:
+        correcta = bcrypt.checkpw(password.encode("utf-8"), guardada)
+    except ValueError:
+        correcta = False
+    if not correcta:
+        conn.execute("UPDATE usuarios SET intentos_login = COALESCE(intentos_login, 0) + 1, "
+                     "bloqueado = CASE WHEN COALESCE(intentos_login, 0) + 1 >= ? THEN 1 ELSE bloqueado END "
+                     "WHERE id = ?", (int(max_intentos), clinico["id"]))
+        conn.commit()
+        raise VinculoInvalido("Credenciales clínicas incorrectas o cuenta bloqueada")
+    conn.execute("UPDATE usuarios SET intentos_login = 0, ultimo_login = CURRENT_TIMESTAMP WHERE id = ?",
+                 (clinico["id"],))
+    conn.execute("INSERT OR IGNORE INTO vinculos_clinicos (app_usuario_id, clinico_id, verificado_por) "
+                 "VALUES (?, ?, 'credenciales')", (int(app_usuario_id), clinico["id"]))
+    conn.commit()
+    return {"id": clinico["id"], "nombre": clinico["nombre"], "rol": clinico["rol"]}
+
+
+def clinicos_vinculados(conn, app_usuario_id):
+    """[(id, rol)] del personal clínico activo vinculado a la cuenta"""
+    return [(fila[0], fila[1]) for fila in conn.execute(
+        "SELECT u.id, u.rol FROM vinculos_clinicos v JOIN usuarios u ON u.id = v.clinico_id "
+        "WHERE v.app_usuario_id = ? AND COALESCE(u.activo, 1) = 1 AND COALESCE(u.bloqueado, 0) = 0",
+        (int(app_usuario_id),))]
+
+
+def paciente_vinculado(conn, app_usuario_id):
+    """Id del paciente vinculado a la cuenta (el primero), o None"""
+    fila = conn.execute("SELECT paciente_id FROM vinculos_clinicos WHERE app_usuario_id = ? "
+                        "AND paciente_id IS NOT NULL ORDER BY id LIMIT 1", (int(app_usuario_id),)).fetchone()
+    return fila[0] if fila else None
+
+
+def pacientes_permitidos(conn, app_usuario_id, ids, solo_clinicos=False):
+    """Subconjunto de ids cuyas lecturas puede cargar o consultar la cuenta
+
+    Con solo_clinicos=True no cuentan los vínculos de paciente (p. ej. para
+    generar códigos de vinculación).
+    """
+    ids = sorted({int(i) for i in ids})
+    clinicos = clinicos_vinculados(conn, app_usuario_id)
+    if any(rol == ROL_ADMIN for _, rol in clinicos):
+        return set(ids)
+    medicos = [i for i, _ in clinicos] or [None]
+    propios = set() if solo_clinicos else {fila[0] for fila in conn.execute(
+        "SELECT paciente_id FROM vinculos_clinicos WHERE app_usuario_id = ? AND paciente_id IS NOT NULL",
+        (int(app_usuario_id),))}
+    permitidos = {i for i in ids if i in propios}
+    for i in range(0, len(ids), 500):
+        parte = ids[i:i + 500]
+        permitidos.update(fila[0] for fila in conn.execute(
+            f"SELECT id FROM pacientes WHERE id IN ({','.join('?' * len(parte))}) "
+            f"AND medico_asignado IN ({','.join('?' * len(medicos))})", (*parte, *medicos)))
+    return permitidos
+
+
+def generar_codigo(conn, app_usuario_id, paciente_id, vigencia_seg=86400):
+    """Código de un solo uso para que el paciente vincule su cuenta
+
+    Solo lo genera personal clínico con acceso al paciente; se guarda su hash.
+    """
+    if int(paciente_id) not in pacientes_permitidos(conn, app_usuario_id, [paciente_id], solo_clinicos=True):
+        raise VinculoInvalido("Sin permiso para vincular a este paciente")
+    codigo = secrets.token_urlsafe(9)
+    conn.execute("INSERT INTO codigos_vinculo (codigo_hash, paciente_id, creado_por, expira) "
+                 "VALUES (?, ?, ?, datetime('now', ?))",
+                 (_hash_codigo(codigo), int(paciente_id), int(app_usuario_id), f"+{int(vigencia_seg)} seconds"))
+    conn.commit()
+    return codigo
+
+
+def canjear_codigo(conn, app_usuario_id, codigo):
+    """Vincula la cuenta al paciente del código (vigente y sin usar); devuelve su id"""
+    cur = conn.execute("UPDATE codigos_vinculo SET usado_por = ?, fecha_uso = CURRENT_TIMESTAMP "
+                       "WHERE codigo_hash = ? AND usado_por IS NULL AND expira > datetime('now')",
+                       (int(app_usuario_id), _hash_codigo(codigo)))
+    if cur.rowcount != 1:
+        conn.rollback()
+        raise VinculoInvalido("Código de vinculación inválido, vencido o ya usado")
+    paciente_id = conn.execute("SELECT paciente_id FROM codigos_vinculo WHERE codigo_hash = ?",
+                               (_hash_codigo(codigo),)).fetchone()[0]
+    conn.execute("INSERT OR IGNORE INTO vinculos_clinicos (app_usuario_id, paciente_id, verificado_por) "
+                 "VALUES (?, ?, 'codigo')", (int(app_usuario_id), paciente_id))
+    conn.commit()
+    return paciente_id
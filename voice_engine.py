@@ -0,0 +1,261 @@
+# voice_engine.py
+import io
+import wave
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+# ==========================================
+# 🎙️ MOTOR DE VERIFICACIÓN DE VOZ (VECTORIZADO)
+# ==========================================
+# Todo el audio se procesa por lotes, sin bucles de Python por trama:
+#   señal -> preénfasis -> tramas (vista con strides, sin copiar) -> ventana
+#   -> una sola rFFT por lote -> banco mel (producto de matrices) -> log
+#   -> DCT (producto de matrices) -> MFCC
+# La plantilla de voz es la media y la desviación de los MFCC (con lifter)
+# de las tramas con voz (energía cercana a la máxima de la grabación),
+# normalizada. Sin más, todas las voces comparten la inclinación espectral y
+# quedan muy parecidas entre sí; con un centro (media de las plantillas
+# enroladas, ver `python voice_engine.py centro`) se resta esa parte común
+# antes del coseno.
+#
+# Las plantillas antiguas (voice_template_*.npy, 1025 valores) son el módulo
+# de la rFFT de 2048 puntos de los primeros 2048 muestras; se siguen
+# calculando con plantilla_espectral() para comparar contra ellas.
+
+FRECUENCIA = 16000
+N_FFT_ESPECTRAL = 2048
+VERSION_ESPECTRAL = "v1"
+VERSION_MFCC = "v2"
+
+
+class AudioInvalido(ValueError):
+    """El cuerpo no es un WAV PCM utilizable"""
+
+
+def leer_wav(origen):
+    """Señal mono float32 en [-1, 1] y su frecuencia desde una ruta o bytes WAV PCM"""
+    try:
+        with wave.open(io.BytesIO(origen) if isinstance(origen, (bytes, bytearray)) else origen, "rb") as w:
+            canales, ancho, frecuencia = w.getnchannels(), w.getsampwidth(), w.getframerate()
+            datos = w.readframes(w.getnframes())
+    except (wave.Error, EOFError) as e:
+        # EOFError de un archivo vacío o cortado no trae mensaje
+        raise AudioInvalido(f"WAV no válido: {str(e) or 'archivo vacío o incompleto'}")
+    if ancho == 1:
+        senal = (np.frombuffer(datos, dtype="uint8").astype("float32") - 128.0) / 128.0
+    elif ancho == 2:
+        senal = np.frombuffer(datos, dtype="<i2").astype("float32") / 32768.0
+    elif ancho == 3:
+        # 24 bits: se arma un int32 con los 3 bytes y se extiende el signo
+        b = np.frombuffer(datos[: len(datos) - len(datos) % 3], dtype="uint8").reshape(-1, 3).astype("int32")
+        enteros = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        senal = (np.where(enteros >= 1 << 23, enteros - (1 << 24), enteros) / 8388608.0).astype("float32")
+    elif ancho == 4:
+        senal = np.frombuffer(datos, dtype="<i4").astype("float32") / 2147483648.0
+    else:
+        raise AudioInvalido(f"Ancho de muestra de {ancho} bytes no soportado")
+    if canales > 1:
+        senal = senal[: len(senal) - len(senal) % canales].reshape(-1, canales).mean(axis=1)
+    return senal, frecuencia
+
+
+def remuestrear(senal, origen, destino):
+    """Cambia la frecuencia de muestreo con una rFFT y una irFFT (limitado en banda)
+
+    Al bajar de frecuencia se descartan los bins por encima del nuevo Nyquist,
+    así que no hay aliasing; al subir se rellenan con ceros.
+    """
+    senal = np.asarray(senal, dtype="float64")
+    if origen == destino or len(senal) == 0:
+        return senal.astype("float32")
+    n = int(round(len(senal) * destino / origen))
+    espectro = np.fft.rfft(senal)
+    bins = n // 2 + 1
+    if bins <= len(espectro):
+        espectro = espectro[:bins]
+    else:
+        espectro = np.concatenate([espectro, np.zeros(bins - len(espectro), dtype=espectro.dtype)])
+    return (np.fft.irfft(espectro, n) * (n / len(senal))).astype("float32")
+
+
+def normalizar_audio(senal, pico=0.95):
+    """Quita la componente continua y lleva el pico a `pico` (micrófonos con distinta ganancia)"""
+    senal = np.asarray(senal, dtype="float32")
+    if len(senal) == 0:
+        return senal
+    senal = senal - senal.mean()
+    maximo = float(np.abs(senal).max())
+    return senal * (pico / maximo) if maximo > 0 else senal
+
+
+def preparar_audio(origen, frecuencia=FRECUENCIA, max_segundos=None):
+    """WAV (ruta o bytes) -> señal mono normalizada a `frecuencia`, lista para el motor"""
+    senal, fr = leer_wav(origen)
+    if max_segundos and len(senal) > max_segundos * fr:
+        raise AudioInvalido(f"La grabación dura más de {max_segundos} s")
+    return normalizar_audio(remuestrear(senal, fr, frecuencia))
+
+
+def enmarcar(senal, largo, salto):
+    """Tramas (n, largo) como vista con strides sobre la señal, sin copiar"""
+    senal = np.ascontiguousarray(senal)
+    n = 1 + (len(senal) - largo) // salto if len(senal) >= largo else 0
+    paso = senal.strides[0]
+    return as_strided(senal, shape=(n, largo), strides=(salto * paso, paso), writeable=False)
+
+
+def banco_mel(frecuencia, n_fft, n_mels, fmin=20.0, fmax=None):
+    """Matriz (n_fft/2+1, n_mels) de filtros triangulares en escala mel"""
+    fmax = fmax or frecuencia / 2
+    mel = lambda hz: 2595.0 * np.log10(1.0 + hz / 700.0)
+    hz = lambda m: 700.0 * (10.0 ** (m / 2595.0) - 1.0)
+    bordes = hz(np.linspace(mel(fmin), mel(fmax), n_mels + 2))
+    bins = np.linspace(0, frecuencia / 2, n_fft // 2 + 1)[:, None]
+    izq, centro, der = bordes[:-2], bordes[1:-1], bordes[2:]
+    subida = (bins - izq) / (centro - izq)
+    bajada = (der - bins) / (der - centro)
+    return np.maximum(0.0, np.minimum(subida, bajada)).astype("float32")
+
+
+def matriz_dct(n_mfcc, n_mels):
+    """DCT-II ortonormal (n_mels, n_mfcc) para aplicar con un producto de matrices"""
+    n = np.arange(n_mels)[:, None]
+    k = np.arange(n_mfcc)[None, :]
+    dct = np.cos(np.pi / n_mels * (n + 0.5) * k) * np.sqrt(2.0 / n_mels)
+    dct[:, 0] /= np.sqrt(2.0)
+    return dct.astype("float32")
+
+
+def plantilla_espectral(senal):
+    """Plantilla del formato anterior: |rFFT(2048)| de los primeros 2048 muestras, norma 1"""
+    espectro = np.abs(np.fft.rfft(np.asarray(senal, dtype="float32"), N_FFT_ESPECTRAL)).astype("float32")
+    norma = np.linalg.norm(espectro)
+    return espectro / norma if norma else None
+
+
+class MotorVoz:
+    """Extracción de plantillas MFCC por lotes con matrices precalculadas"""
+
+    def __init__(self, frecuencia=FRECUENCIA, trama_ms=25, salto_ms=10, n_fft=512,
+                 n_mels=40, n_mfcc=20, preenfasis=0.97, umbral_voz_db=35.0):
+        self.frecuencia = frecuencia
+        self.largo = int(frecuencia * trama_ms / 1000)
+        self.salto = int(frecuencia * salto_ms / 1000)
+        self.n_fft = n_fft
+        self.n_mfcc = n_mfcc
+        self.preenfasis = preenfasis
+        # Tramas a más de umbral_voz_db por debajo de la más fuerte se tratan como silencio
+        self.umbral_voz_db = umbral_voz_db
+        # La rFFT de NumPy es más rápida en float64; el resto va en float32
+        self._ventana = np.hamming(self.largo)
+        self._mel = banco_mel(frecuencia, n_fft, n_mels)
+        self._dct = matriz_dct(n_mfcc, n_mels)
+        # Lifter sinusoidal: da más peso a los coeficientes medios (timbre)
+        k = np.arange(1, n_mfcc)
+        self._lifter = (1 + (n_mfcc + 2) / 2 * np.sin(np.pi * k / (n_mfcc + 2))).astype("float32")
+        self.centro = None
+
+    @property
+    def dim(self):
+        # Media y desviación de c1..c(n_mfcc-1); c0 (energía) depende del volumen
+        return 2 * (self.n_mfcc - 1)
+
+    def _tramas(self, senal):
+        senal = np.asarray(senal, dtype="float64")
+        if len(senal) < self.largo:
+            return np.empty((0, self.largo))
+        enfatizada = np.empty_like(senal)
+        enfatizada[0] = senal[0]
+        np.subtract(senal[1:], self.preenfasis * senal[:-1], out=enfatizada[1:])
+        return enmarcar(enfatizada, self.largo, self.salto)
+
+    def mfcc(self, tramas):
+        """(n, n_mfcc) MFCC y (n,) energía log-mel de un bloque de tramas"""
+        potencia = np.abs(np.fft.rfft(tramas * self._ventana, self.n_fft, axis=1)) ** 2
+        log_mel = np.log(potencia.astype("float32") @ self._mel + 1e-10)
+        return log_mel @ self._dct, log_mel.max(axis=1)
+
+    def plantillas(self, senales):
+        """Plantillas normalizadas (len(senales), dim); fila de ceros si no hay voz
+
+        Las tramas de todas las señales se concatenan y pasan juntas por una
+        sola rFFT; las estadísticas por señal se reducen con np.add.reduceat.
+        """
+        tramas = [self._tramas(s) for s in senales]
+        conteos = np.array([len(t) for t in tramas])
+        salida = np.zeros((len(senales), self.dim), dtype="float32")
+        validas = np.flatnonzero(conteos)
+        if len(validas) == 0:
+            return salida
+
+        coef, energia = self.mfcc(np.concatenate([tramas[i] for i in validas]))
+        salida[validas] = self.agregar_tramas(coef, energia, conteos[validas])
+        return salida
+
+    def umbral_voz(self, energia_maxima):
+        """Energía log-mel mínima para considerar que una trama tiene voz"""
+        return energia_maxima - self.umbral_voz_db / (10 / np.log(10))
+
+    def agregar_tramas(self, coef, energia, conteos):
+        """Plantillas normalizadas a partir de MFCC ya calculados, `conteos` tramas por señal"""
+        conteos = np.asarray(conteos)
+        inicios = np.concatenate(([0], np.cumsum(conteos)[:-1]))
+        duenio = np.repeat(np.arange(len(conteos)), conteos)
+
+        # Detección de voz por energía relativa a la trama más fuerte de cada señal
+        maximos = np.maximum.reduceat(energia, inicios)
+        pesos = (energia >= self.umbral_voz(maximos)[duenio]).astype("float32")
+        n_voz = np.add.reduceat(pesos, inicios)[:, None]
+
+        coef = coef[:, 1:] * self._lifter
+        media = np.add.reduceat(coef * pesos[:, None], inicios) / n_voz
+        cuadrados = np.add.reduceat(coef * coef * pesos[:, None], inicios) / n_voz
+        desviacion = np.sqrt(np.maximum(cuadrados - media * media, 0.0))
+
+        vecs = np.hstack([media, desviacion]).astype("float32")
+        normas = np.linalg.norm(vecs, axis=1, keepdims=True)
+        return np.where(normas > 0, vecs / np.maximum(normas, 1e-12), 0.0).astype("float32")
+
+    def plantilla(self, senal):
+        """Plantilla MFCC normalizada de una señal, o None si no contiene voz"""
+        vec = self.plantillas([senal])[0]
+        return vec if np.any(vec) else None
+
+    def para_indice(self, plantilla):
+        """Plantilla guardada -> espacio de comparación (restando el centro si hay)"""
+        vec = np.asarray(plantilla, dtype="float32").ravel()
+        if self.centro is not None and vec.shape == self.centro.shape:
+            vec = vec - self.centro
+        norma = np.linalg.norm(vec)
+        return vec / norma if norma else None
+
+    def cargar_centro(self, path):
+        """Centro guardado con `python voice_engine.py centro`; False si no existe o no cuadra"""
+        try:
+            centro = np.load(path).astype("float32")
+        except (OSError, ValueError):
+            return False
+        if centro.shape != (self.dim,):
+            print(f"⚠️  Centro de voz {path} con dimensión {centro.shape}, se esperaba ({self.dim},)")
+            return False
+        self.centro = centro
+        return True
+
+
+def calcular_centro(plantillas):
+    """Media de las plantillas MFCC enroladas (la parte común a todas las voces)"""
+    return np.mean(np.asarray(list(plantillas), dtype="float32"), axis=0)
+
+
+if __name__ == "__main__":
+    # python voice_engine.py centro   -> recalcula el centro con las plantillas enroladas
+    import sys
+    from app import VOICE_STORE_MFCC, VOICE_CENTRO_PATH
+
+    if sys.argv[1:] != ["centro"]:
+        raise SystemExit("Uso: python voice_engine.py centro")
+    if len(VOICE_STORE_MFCC) < 2:
+        raise SystemExit("⚠️  Se necesitan al menos 2 plantillas de voz MFCC para calcular el centro")
+    np.save(VOICE_CENTRO_PATH, calcular_centro(vec for _, vec in VOICE_STORE_MFCC.items()))
+    print(f"🎯 Centro de voz calculado con {len(VOICE_STORE_MFCC)} plantillas: {VOICE_CENTRO_PATH}. "
+          f"Reinicia los workers")
@@ -0,0 +1,202 @@
+# voice_stream.py
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+import numpy as np
+
+from biometric_pool import ColaBiometricaLlena
+from voice_engine import enmarcar, plantilla_espectral, N_FFT_ESPECTRAL
+
+# ==========================================
+# 📡 VOZ POR FRAGMENTOS (EXTRACCIÓN INCREMENTAL)
+# ==========================================
+# El navegador envía el audio en fragmentos PCM mientras el usuario habla.
+# Cada fragmento se pre-enfatiza y se enmarca en cuanto llega (overlap-save:
+# las muestras que no completan una trama se guardan para el siguiente), así
+# que al recibir el último solo queda reducir los MFCC ya calculados. El
+# resultado es idéntico a MotorVoz.plantilla() sobre la grabación completa.
+
+
+class FragmentoFueraDeOrden(Exception):
+    """El número de fragmento no es el que espera la sesión"""
+
+    def __init__(self, esperado):
+        super().__init__(f"Se esperaba el fragmento {esperado}")
+        self.esperado = esperado
+
+
+class ExtractorVozIncremental:
+    """MFCC por tramas de una grabación que llega por partes, con memoria acotada"""
+
+    def __init__(self, motor, max_segundos=10.0):
+        self.motor = motor
+        max_muestras = int(max_segundos * motor.frecuencia)
+        self.max_tramas = max(0, 1 + (max_muestras - motor.largo) // motor.salto)
+        # Buffers preasignados: la memoria por sesión no crece con el audio
+        self._coef = np.empty((self.max_tramas, motor.n_mfcc), dtype="float32")
+        self._energia = np.empty(self.max_tramas, dtype="float32")
+        self.n_tramas = 0
+        self.muestras = 0
+        self._resto = np.empty(0)
+        self._anterior = None
+        self._inicio = np.empty(0, dtype="float32")
+
+    @property
+    def lleno(self):
+        return self.n_tramas >= self.max_tramas
+
+    @property
+    def segundos(self):
+        return self.muestras / self.motor.frecuencia
+
+    @property
+    def bytes_reservados(self):
+        return self._coef.nbytes + self._energia.nbytes + self._resto.nbytes + self._inicio.nbytes
+
+    def agregar(self, muestras):
+        """Procesa un fragmento (float en [-1, 1]); devuelve cuántas tramas nuevas salieron"""
+        x = np.asarray(muestras, dtype="float64")
+        if len(x) == 0 or self.lleno:
+            return 0
+        motor = self.motor
+        if len(self._inicio) < N_FFT_ESPECTRAL:
+            self._inicio = np.concatenate([self._inicio, x[:N_FFT_ESPECTRAL - len(self._inicio)]]).astype("float32")
+
+        # Preénfasis continuo entre fragmentos
+        enfatizada = np.empty_like(x)
+        enfatizada[0] = x[0] if self._anterior is None else x[0] - motor.preenfasis * self._anterior
+        np.subtract(x[1:], motor.preenfasis * x[:-1], out=enfatizada[1:])
+        self._anterior = x[-1]
+        self.muestras += len(x)
+
+        buf = np.concatenate([self._resto, enfatizada])
+        tramas = enmarcar(buf, motor.largo, motor.salto)
+        n = min(len(tramas), self.max_tramas - self.n_tramas)
+        if n:
+            coef, energia = motor.mfcc(tramas[:n])
+            self._coef[self.n_tramas:self.n_tramas + n] = coef
+            self._energia[self.n_tramas:self.n_tramas + n] = energia
+            self.n_tramas += n
+        # Overlap-save: la próxima trama empieza en n * salto
+        self._resto = np.empty(0) if self.lleno else buf[n * motor.salto:].copy()
+        return n
+
+    def segundos_voz(self):
+        """Duración de las tramas con voz hasta ahora"""
+        if not self.n_tramas:
+            return 0.0
+        energia = self._energia[:self.n_tramas]
+        voz = np.count_nonzero(energia >= self.motor.umbral_voz(energia.max()))
+        return voz * self.motor.salto / self.motor.frecuencia
+
+    def plantilla(self):
+        """Plantilla MFCC de lo recibido hasta ahora, o None si aún no hay voz"""
+        if not self.n_tramas:
+            return None
+        vec = self.motor.agregar_tramas(self._coef[:self.n_tramas], self._energia[:self.n_tramas],
+                                        [self.n_tramas])[0]
+        return vec if np.any(vec) else None
+
+    def plantilla_espectral(self):
+        return plantilla_espectral(self._inicio) if len(self._inicio) else None
+
+
+def decidir(historial, umbral, margen, confirmaciones):
+    """"aceptar", "rechazar" o None según los últimos puntajes parciales
+
+    historial: (correo candidato o None, similitud) en orden de llegada. Se
+    acepta cuando las últimas `confirmaciones` superan el umbral con el mismo
+    candidato y se rechaza cuando todas quedan al menos `margen` por debajo.
+    """
+    if len(historial) < confirmaciones:
+        return None
+    ultimos = list(historial)[-confirmaciones:]
+    candidatos = {c for c, _ in ultimos}
+    if len(candidatos) == 1 and None not in candidatos and all(s > umbral for _, s in ultimos):
+        return "aceptar"
+    if all(s <= umbral - margen for _, s in ultimos):
+        return "rechazar"
+    return None
+
+
+class SesionVoz:
+    def __init__(self, correo, extractor):
+        self.id = uuid.uuid4().hex
+        self.correo = correo
+        self.extractor = extractor
+        self.lock = threading.Lock()
+        self.siguiente = 0
+        self.historial = deque(maxlen=8)
+        self.ultimo_acceso = time.monotonic()
+
+
+class SesionesVoz:
+    """Sesiones de verificación por fragmentos con cupo fijo y expulsión por inactividad"""
+
+    def __init__(self, motor, max_sesiones=100, inactividad_seg=30.0, max_segundos=10.0, retry_after=2):
+        self.motor = motor
+        self.max_sesiones = max_sesiones
+        self.inactividad_seg = inactividad_seg
+        self.max_segundos = max_segundos
+        self.retry_after = retry_after
+        self._sesiones = OrderedDict()
+        self._lock = threading.Lock()
+        self.contadores = {"creadas": 0, "expulsadas": 0, "rechazadas": 0,
+                           "decisiones_temprana": 0, "decisiones_final": 0}
+
+    def _purgar(self, ahora):
+        # Ordenadas por último acceso: basta revisar desde la más antigua
+        while self._sesiones:
+            sesion = next(iter(self._sesiones.values()))
+            if ahora - sesion.ultimo_acceso < self.inactividad_seg:
+                break
+            self._sesiones.popitem(last=False)
+            self.contadores["expulsadas"] += 1
+
+    def purgar(self):
+        with self._lock:
+            antes = len(self._sesiones)
+            self._purgar(time.monotonic())
+            return antes - len(self._sesiones)
+
+    def crear(self, correo=None):
+        """Nueva sesión; ColaBiometricaLlena si no hay cupo ni sesiones inactivas"""
+        with self._lock:
+            self._purgar(time.monotonic())
+            if len(self._sesiones) >= self.max_sesiones:
+                self.contadores["rechazadas"] += 1
+                raise ColaBiometricaLlena(self.retry_after)
+            sesion = SesionVoz(correo, ExtractorVozIncremental(self.motor, self.max_segundos))
+            self._sesiones[sesion.id] = sesion
+            self.contadores["creadas"] += 1
+            return sesion
+
+    def obtener(self, sesion_id):
+        """Sesión activa (renovando su último acceso) o None si no existe o expiró"""
+        with self._lock:
+            ahora = time.monotonic()
+            self._purgar(ahora)
+            sesion = self._sesiones.get(sesion_id)
+            if sesion is not None:
+                sesion.ultimo_acceso = ahora
+                self._sesiones.move_to_end(sesion_id)
+            return sesion
+
+    def cerrar(self, sesion_id, decision=None):
+        """Quita la sesión; `decision` ("temprana" o "final") solo alimenta las estadísticas"""
+        with self._lock:
+            if self._sesiones.pop(sesion_id, None) is not None and decision:
+                self.contadores[f"decisiones_{decision}"] += 1
+
+    def __len__(self):
+        return len(self._sesiones)
+
+    def estadisticas(self):
+        with self._lock:
+            self._purgar(time.monotonic())
+            datos = dict(self.contadores)
+            datos["activas"] = len(self._sesiones)
+            datos["max_sesiones"] = self.max_sesiones
+            datos["memoria_kb"] = round(sum(s.extractor.bytes_reservados for s in self._sesiones.values()) / 1024, 1)
+        return datos